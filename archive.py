@@ -0,0 +1,159 @@
+"""
+Cold archive for completed todos and past events
+
+A retention sweep moves todos completed more than ARCHIVE_TODO_AFTER_DAYS
+ago, and events due before today, out of the hot store into append-only
+gzip JSON Lines files, one per month (data/archive/2026-10.jsonl.gz, by
+completion date for todos and due date for events). Each append adds a new
+gzip member, which gzip readers treat as one continuous stream. /archive
+streams a user's entries back, newest month first.
+
+Items are written to the archive before they are deleted from the hot
+store; if the bot stops in between, the next sweep archives them again and
+readers drop the duplicate. Item IDs are never reused (backends persist
+their ID marks), and readers also key entries on created_at.
+
+The scan for expired items and the gzip append run in a worker thread; the
+removals go through DataManager on the event loop, like every other change.
+"""
+
+import asyncio
+import gzip
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from telegram.ext import ContextTypes
+
+from config import ARCHIVE_DIR, ARCHIVE_TODO_AFTER_DAYS
+from data_storage import DataManager, data_manager
+from metrics import ARCHIVED
+from models import Item
+
+def archived_ts(item: Item) -> float:
+    """When a todo was completed or an event was due (what it is archived under)"""
+    ts = item.completed_at if item.type == "todo" else item.due_ts
+    return ts if ts is not None else item.created_at
+
+def archive_month(item: Item) -> str:
+    return datetime.fromtimestamp(archived_ts(item)).strftime("%Y-%m")
+
+class ItemArchive:
+    def __init__(self, root: str):
+        self.root = root
+        self._lock = threading.Lock()
+
+    def month_path(self, month: str) -> str:
+        return os.path.join(self.root, f"{month}.jsonl.gz")
+
+    def months(self) -> List[str]:
+        """Archived months, newest first"""
+        if not os.path.isdir(self.root):
+            return []
+        suffix = ".jsonl.gz"
+        return sorted((name[:-len(suffix)] for name in os.listdir(self.root) if name.endswith(suffix)), reverse=True)
+
+    def append(self, entries: List[Tuple[str, Item]]):
+        """Append (collection, item) entries to their month files, durably"""
+        by_month: Dict[str, List[str]] = {}
+        archived_at = int(time.time())
+        for collection, item in entries:
+            # user_id right after collection lets readers skip other users' lines cheaply
+            record = {"collection": collection, "user_id": item.user_id, "archived_at": archived_at, **item.to_dict()}
+            by_month.setdefault(archive_month(item), []).append(json.dumps(record, ensure_ascii=False))
+
+        with self._lock:
+            os.makedirs(self.root, exist_ok=True)
+            for month, lines in by_month.items():
+                with open(self.month_path(month), "ab") as raw:
+                    with gzip.GzipFile(fileobj=raw, mode="ab") as archive:
+                        archive.write(("\n".join(lines) + "\n").encode("utf-8"))
+                    raw.flush()
+                    os.fsync(raw.fileno())
+
+    def iter_user_items(self, user_id: int, month: Optional[str] = None) -> Iterator[Tuple[str, List[Tuple[str, Item]]]]:
+        """
+        Yield (month, [(collection, item), ...]) for one user, newest month first
+        Each file is decompressed as a stream; nothing else is kept in memory
+        """
+        marker = f'"user_id": {user_id},'
+        for current in ([month] if month else self.months()):
+            path = self.month_path(current)
+            if not os.path.exists(path):
+                continue
+            entries = {}
+            with gzip.open(path, "rt", encoding="utf-8") as archive:
+                for line in archive:
+                    if marker not in line:
+                        continue
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue  # Torn write at the end of a member
+                    if record.get("user_id") != user_id:
+                        continue
+                    # A re-archived item replaces its earlier copy
+                    key = (record["collection"], record["id"], record.get("created_at"))
+                    entries[key] = (record["collection"], Item.from_dict(record))
+            if entries:
+                yield current, list(entries.values())
+
+def _cutoffs(now: float) -> Tuple[float, float]:
+    """(todo cutoff, event cutoff): completed before / due before these are expired"""
+    today = datetime.fromtimestamp(now).replace(hour=0, minute=0, second=0, microsecond=0)
+    return now - ARCHIVE_TODO_AFTER_DAYS * 86400, today.timestamp()
+
+def _expired_collection(item: Item, todo_cutoff: float, event_cutoff: float) -> Optional[str]:
+    if item.type == "todo" and item.completed and (item.completed_at or item.created_at) < todo_cutoff:
+        return "todos"
+    if item.type == "event" and item.due_ts is not None and item.due_ts < event_cutoff:
+        return "events"
+    return None
+
+def find_expired(manager: DataManager, now: Optional[float] = None) -> List[Tuple[str, Item]]:
+    """Completed todos past the retention period and events due before today"""
+    cutoffs = _cutoffs(time.time() if now is None else now)
+    expired = []
+    for item in manager.iter_all_items():
+        collection = _expired_collection(item, *cutoffs)
+        if collection:
+            expired.append((collection, item))
+    return expired
+
+async def run_retention(manager: DataManager = data_manager, archive: Optional[ItemArchive] = None,
+                        now: Optional[float] = None) -> Dict[str, int]:
+    """Move expired items to the archive; returns counts per collection"""
+    archive = archive or item_archive
+    now = time.time() if now is None else now
+    # The scan reads every stored item (files, a full SELECT or HTTP pages)
+    expired = await asyncio.to_thread(find_expired, manager, now)
+    if not expired:
+        return {}
+    await asyncio.to_thread(archive.append, expired)
+    counts: Dict[str, int] = {}
+    cutoffs = _cutoffs(now)
+    # The scan may be stale (e.g. a todo reopened since), so the item DataManager
+    # holds now is checked again; the archived copy is then just an extra entry
+    still_expired = lambda current: _expired_collection(current, *cutoffs) is not None
+    for collection, item in expired:
+        if manager.remove_item(collection, item.user_id, item.id, only_if=still_expired):
+            counts[collection] = counts.get(collection, 0) + 1
+            ARCHIVED.inc(collection)
+    return counts
+
+async def retention_job(context: ContextTypes.DEFAULT_TYPE):
+    """JobQueue callback"""
+    try:
+        counts = await run_retention()
+    except Exception as e:
+        print(f"Archive error: {e}")
+        return
+    if counts:
+        summary = ", ".join(f"{count} {name}" for name, count in counts.items())
+        print(f"📦 Archived {summary}")
+
+# Global instance
+item_archive = ItemArchive(ARCHIVE_DIR)
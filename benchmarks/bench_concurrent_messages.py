@@ -0,0 +1,118 @@
+"""
+Throughput of handle_message with N concurrent users against a slow, stubbed Gemini model.
+
+Compares the old blocking path (synchronous generate_content called from the
+handler, which serializes every user behind the event loop) with the async
+path (generate_content_async), with and without request coalescing.
+
+Usage:
+    python benchmarks/bench_concurrent_messages.py --users 50 --latency 0.3
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import re
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "benchmark")
+os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+
+# Keep benchmark data out of the real data/ directory
+os.chdir(tempfile.mkdtemp(prefix="todolist-bench-"))
+
+import gemini_service  # noqa: E402
+import handlers  # noqa: E402
+
+MESSAGES = [
+    "ghi nhớ mua sữa",
+    "ý tưởng app mới",
+    "nhớ gọi mẹ",
+    "đọc sách về thiết kế",
+]
+
+class StubResponse:
+    def __init__(self, text):
+        self.text = text
+
+class SlowModel:
+    """Stand-in for genai.GenerativeModel with a fixed round-trip latency"""
+
+    def __init__(self, latency):
+        self.latency = latency
+        self.calls = 0
+
+    def _reply(self, prompt):
+        self.calls += 1
+        analysis = {"type": "idea", "has_time": False, "datetime": None, "display_time": "", "parsed_text": "x"}
+        indexes = re.findall(r'^\[(\d+)\] ', prompt, re.MULTILINE)
+        if indexes:
+            # Batched prompt: one array element per message
+            return StubResponse(json.dumps([{"index": int(i), **analysis} for i in indexes]))
+        return StubResponse(json.dumps(analysis))
+
+    def generate_content(self, prompt, **kwargs):
+        time.sleep(self.latency)
+        return self._reply(prompt)
+
+    async def generate_content_async(self, prompt, **kwargs):
+        await asyncio.sleep(self.latency)
+        return self._reply(prompt)
+
+class FakeUser:
+    def __init__(self, user_id):
+        self.id = user_id
+
+class FakeMessage:
+    def __init__(self, text):
+        self.text = text
+
+    async def reply_text(self, text, **kwargs):
+        pass
+
+class FakeUpdate:
+    def __init__(self, user_id, text):
+        self.effective_user = FakeUser(user_id)
+        self.message = FakeMessage(text)
+
+async def blocking_handler(update, context):
+    """The pre-async handler body: a synchronous Gemini call on the event loop"""
+    gemini_service.analyze_message(update.message.text)
+
+async def run(handler, users):
+    updates = [FakeUpdate(user_id, MESSAGES[user_id % len(MESSAGES)]) for user_id in range(users)]
+    start = time.perf_counter()
+    await asyncio.gather(*(handler(update, None) for update in updates))
+    return time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.3, help="stubbed Gemini latency in seconds")
+    args = parser.parse_args()
+
+    # Measure the network path, not the local classifier or the analysis cache
+    gemini_service.LOCAL_CLASSIFIER_THRESHOLD = float("inf")
+    gemini_service.analysis_cache.max_size = 0
+
+    unbatched = gemini_service.RequestCoalescer(0, 1)
+    batched = gemini_service.coalescer
+    for name, handler, coalescer in (
+        ("blocking", blocking_handler, unbatched),
+        ("async", handlers.handle_message, unbatched),
+        ("batched", handlers.handle_message, batched),
+    ):
+        gemini_service.model = SlowModel(args.latency)
+        gemini_service.coalescer = coalescer
+        elapsed = asyncio.run(run(handler, args.users))
+        print(f"{name:>9}: {args.users} users in {elapsed:.2f}s "
+              f"({args.users / elapsed:.1f} msg/s, {elapsed / args.users * 1000:.0f} ms/msg, "
+              f"{gemini_service.model.calls} Gemini calls)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Memory per item: legacy nested dicts vs the slotted Item model.
+
+Builds N items in the old dict-with-time_info format and, in a separate
+process, the same N items as models.Item, and reports the RSS growth of
+each. Every process starts from the same baseline, so the difference is
+the cost of the item representation alone.
+
+Usage:
+    python benchmarks/bench_item_memory.py --items 1000000
+"""
+
+import argparse
+import gc
+import os
+import subprocess
+import sys
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+USERS = 1000
+START = datetime(2030, 1, 1, 9, 0)
+
+def rss_bytes():
+    """Resident set size of this process (Linux)"""
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+def build_dicts(count):
+    items = []
+    for n in range(count):
+        due = START + timedelta(hours=n % 5000)
+        text = f"task {n}"
+        items.append({
+            "id": n + 1,
+            "user_id": 100000000 + n % USERS,
+            "text": text,
+            "time_info": {
+                "has_time": True,
+                "datetime": due.strftime("%Y-%m-%d %H:%M"),
+                "display_time": f"thứ 2 ngày {due.strftime('%d/%m')}",
+                "parsed_text": text,
+                "original_time_expression": ""
+            },
+            "due_ts": due.timestamp(),
+            "created_at": datetime.now().isoformat(),
+            "completed": False,
+            "type": "todo"
+        })
+    return items
+
+def build_items(count):
+    from models import Item
+    items = []
+    for n in range(count):
+        due = START + timedelta(hours=n % 5000)
+        items.append(Item(n + 1, 100000000 + n % USERS, "todo", f"task {n}", int(due.timestamp())))
+    return items
+
+def measure(kind, count):
+    gc.collect()
+    before = rss_bytes()
+    items = (build_dicts if kind == "dict" else build_items)(count)
+    gc.collect()
+    grown = rss_bytes() - before
+    print(f"{kind:5}: {grown / 2**20:8.1f} MiB for {len(items):,} items ({grown / len(items):6.0f} B/item)")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--items", type=int, default=1_000_000)
+    parser.add_argument("--kind", choices=["dict", "item"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.kind:
+        measure(args.kind, args.items)
+        return
+    # One fresh interpreter per representation so RSS isn't shared
+    for kind in ("dict", "item"):
+        subprocess.run([sys.executable, __file__, "--items", str(args.items), "--kind", kind], check=True)
+
+if __name__ == "__main__":
+    main()
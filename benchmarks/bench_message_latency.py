@@ -0,0 +1,85 @@
+"""
+Per-message Gemini latency: separate time + classification prompts vs one structured call.
+
+The "before" path replays the previous flow: a time-parsing prompt whenever the
+local parser finds no time, followed by a classification prompt. The "after"
+path is analyze_message, which needs at most one round trip.
+
+Usage:
+    python benchmarks/bench_message_latency.py --latency 0.3
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "benchmark")
+os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+
+# Keep benchmark data out of the real data/ directory
+os.chdir(tempfile.mkdtemp(prefix="todolist-bench-"))
+
+import gemini_service  # noqa: E402
+
+MESSAGES = [
+    "event thứ 6 thợ lắp đồ",
+    "meeting ngày 19/10 lúc 14h30",
+    "todo dọn nhà 5h",
+    "làm bài tập ngày mai",
+    "ghi nhớ mua sữa",
+    "ý tưởng app mới",
+    "nhớ gọi mẹ",
+    "cuộc họp mai 9h sáng",
+]
+
+class StubResponse:
+    def __init__(self, text):
+        self.text = text
+
+class SlowModel:
+    """Stand-in for genai.GenerativeModel with a fixed round-trip latency"""
+
+    def __init__(self, latency):
+        self.latency = latency
+        self.calls = 0
+
+    def generate_content(self, prompt):
+        time.sleep(self.latency)
+        self.calls += 1
+        return StubResponse('{"type": "idea", "has_time": false, "datetime": null, '
+                            '"display_time": "", "parsed_text": "x"}')
+
+def two_call_flow(text):
+    """Previous flow: optional time prompt, then classification prompt"""
+    if not gemini_service.fallback_time_parse(text)["has_time"]:
+        gemini_service.model.generate_content("time: " + text)
+    gemini_service.model.generate_content("classify: " + text)
+
+def measure(name, func):
+    stub = SlowModel(gemini_service.model.latency)
+    gemini_service.model = stub
+    start = time.perf_counter()
+    for text in MESSAGES:
+        func(text)
+    elapsed = time.perf_counter() - start
+    print(f"{name:>7}: {elapsed / len(MESSAGES) * 1000:.0f} ms/msg, "
+          f"{stub.calls / len(MESSAGES):.2f} Gemini calls/msg")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--latency", type=float, default=0.3, help="stubbed Gemini latency in seconds")
+    args = parser.parse_args()
+
+    gemini_service.model = SlowModel(args.latency)
+    # Measure the network path, not the local classifier or the analysis cache
+    gemini_service.LOCAL_CLASSIFIER_THRESHOLD = float("inf")
+    gemini_service.analysis_cache.max_size = 0
+    measure("before", two_call_flow)
+    measure("after", gemini_service.analyze_message)
+
+if __name__ == "__main__":
+    main()
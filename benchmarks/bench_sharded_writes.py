@@ -0,0 +1,76 @@
+"""
+Cost of one save vs number of users: shared JSON files vs per-user shards.
+
+Seeds USERS users with ITEMS todos each directly on disk, then times
+DataManager.add_todo for random users. With the "json" backend every save
+rewrites todos.json for all users; with "sharded" it rewrites only that
+user's file, so the cost should stay flat as USERS grows.
+
+Usage:
+    python benchmarks/bench_sharded_writes.py --users 100 1000 10000 --items 20
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "benchmark")
+os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+
+from data_storage import DataManager  # noqa: E402
+from models import Item  # noqa: E402
+from sharded_storage import ShardedJsonBackend  # noqa: E402
+from storage_backends import JsonFileBackend, save_json_file  # noqa: E402
+
+def seed_items(users, items_per_user):
+    item_id = 1
+    for user_id in range(1, users + 1):
+        todos = []
+        for n in range(items_per_user):
+            todos.append(Item(item_id, user_id, "todo", f"việc {n}").to_dict())
+            item_id += 1
+        yield user_id, todos
+
+def json_backend(directory, users, items_per_user):
+    files = {name: os.path.join(directory, f"{name}.json") for name in ("events", "todos", "ideas")}
+    save_json_file(files["todos"], [todo for _, todos in seed_items(users, items_per_user) for todo in todos])
+    return JsonFileBackend(files)
+
+def sharded_backend(directory, users, items_per_user):
+    backend = ShardedJsonBackend(os.path.join(directory, "users"))
+    for user_id, todos in seed_items(users, items_per_user):
+        save_json_file(backend.user_path(user_id), {"events": [], "todos": todos, "ideas": []})
+    save_json_file(os.path.join(directory, "users", "ids.json"), {"todos": users * items_per_user})
+    return ShardedJsonBackend(os.path.join(directory, "users"))
+
+def time_saves(backend, users, writes):
+    manager = DataManager(backend)
+    user_ids = [random.randint(1, users) for _ in range(writes)]
+    for user_id in set(user_ids):
+        manager.get_user_todos(user_id)  # Index outside the timed loop
+    start = time.perf_counter()
+    for user_id in user_ids:
+        manager.add_todo(user_id, "mua sữa", {"has_time": False})
+    return (time.perf_counter() - start) / writes
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--users", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--items", type=int, default=20, help="todos per user")
+    parser.add_argument("--writes", type=int, default=50)
+    args = parser.parse_args()
+
+    print(f"{'users':>8} {'json ms/save':>14} {'sharded ms/save':>16}")
+    for users in args.users:
+        with tempfile.TemporaryDirectory(prefix="todolist-shards-") as directory:
+            json_ms = time_saves(json_backend(directory, users, args.items), users, args.writes) * 1000
+            sharded_ms = time_saves(sharded_backend(directory, users, args.items), users, args.writes) * 1000
+        print(f"{users:>8} {json_ms:>14.2f} {sharded_ms:>16.2f}")
+
+if __name__ == "__main__":
+    main()
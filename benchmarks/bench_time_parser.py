@@ -0,0 +1,161 @@
+"""
+Throughput of the local Vietnamese time parser: the previous regex chain vs time_tokenizer.
+
+The previous parser (kept here verbatim as legacy_time_parse) runs up to a
+dozen re.search/re.sub calls per message and stops at the first kind of
+expression it finds; parse_time scans once and combines every token.
+"cold" bypasses the per-day parse cache, "cached" is a repeated phrase.
+The corpus is benchmarks/time_messages.txt, one message per line.
+
+Also lists the messages where the two parsers disagree on the datetime.
+
+Usage:
+    python benchmarks/bench_time_parser.py --rounds 200
+"""
+
+import argparse
+import os
+import re
+import sys
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import time_tokenizer  # noqa: E402
+from time_tokenizer import parse_time, weekday_name  # noqa: E402
+
+CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "time_messages.txt")
+
+def get_next_weekday(weekday):
+    current = datetime.now()
+    days_ahead = weekday - current.weekday()
+    if days_ahead <= 0:
+        days_ahead += 7
+    return current + timedelta(days=days_ahead)
+
+def legacy_time_parse(text):
+    """The fallback_time_parse that time_tokenizer replaced"""
+    has_time = False
+    parsed_text = text
+    display_time = ""
+    datetime_str = None
+    
+    current_date = datetime.now()
+    
+    text_lower = text.lower().strip()
+    
+    weekday_match = re.search(r'thứ\s+([2-7])', text_lower)
+    if weekday_match:
+        weekday_num = int(weekday_match.group(1)) - 2
+        next_date = get_next_weekday(weekday_num)
+        
+        has_time = True
+        datetime_str = next_date.strftime("%Y-%m-%d 09:00")
+        display_time = f"{weekday_name(weekday_num)} ngày {next_date.strftime('%d/%m')}"
+        parsed_text = re.sub(r'thứ\s+[2-7]', '', text, flags=re.IGNORECASE).strip()
+    
+    elif re.search(r'chủ\s*nhật', text_lower):
+        next_date = get_next_weekday(6)
+        has_time = True
+        datetime_str = next_date.strftime("%Y-%m-%d 09:00")
+        display_time = f"chủ nhật ngày {next_date.strftime('%d/%m')}"
+        parsed_text = re.sub(r'chủ\s*nhật', '', text, flags=re.IGNORECASE).strip()
+    
+    date_match = re.search(r'(?:ngày\s+)?(\d{1,2})/(\d{1,2})(?:/(\d{4}))?', text)
+    if date_match:
+        day = int(date_match.group(1))
+        month = int(date_match.group(2))
+        year = int(date_match.group(3)) if date_match.group(3) else current_date.year
+        
+        try:
+            target_date = datetime(year, month, day)
+            if target_date.date() < current_date.date():
+                target_date = datetime(year + 1, month, day)
+            
+            has_time = True
+            datetime_str = target_date.strftime("%Y-%m-%d 09:00")
+            weekday_vn = weekday_name(target_date.weekday())
+            display_time = f"{weekday_vn} ngày {target_date.strftime('%d/%m')}"
+            parsed_text = re.sub(r'(?:ngày\s+)?\d{1,2}/\d{1,2}(?:/\d{4})?', '', text).strip()
+        except ValueError:
+            pass
+    
+    elif re.search(r'\d{1,2}h(?:\d{2})?', text_lower):
+        time_match = re.search(r'(\d{1,2})h(\d{2})?(?:\s*(sáng|chiều|tối))?', text_lower)
+        if time_match:
+            hour = int(time_match.group(1))
+            minute = int(time_match.group(2)) if time_match.group(2) else 0
+            period = time_match.group(3)
+            
+            if period == 'chiều' and hour < 12:
+                hour += 12
+            elif period == 'tối' and hour < 12:
+                hour += 12
+            
+            has_time = True
+            datetime_str = current_date.strftime(f"%Y-%m-%d {hour:02d}:{minute:02d}")
+            display_time = f"hôm nay {hour:02d}:{minute:02d}"
+            parsed_text = re.sub(r'\d{1,2}h(?:\d{2})?(?:\s*(?:sáng|chiều|tối))?', '', text, flags=re.IGNORECASE).strip()
+    
+    elif re.search(r'(?:ngày\s+)?mai', text_lower):
+        tomorrow = current_date + timedelta(days=1)
+        has_time = True
+        datetime_str = tomorrow.strftime("%Y-%m-%d 09:00")
+        weekday_vn = weekday_name(tomorrow.weekday())
+        display_time = f"{weekday_vn} ngày {tomorrow.strftime('%d/%m')} (mai)"
+        parsed_text = re.sub(r'(?:ngày\s+)?mai', '', text, flags=re.IGNORECASE).strip()
+    
+    elif re.search(r'hôm\s+nay', text_lower):
+        has_time = True
+        datetime_str = current_date.strftime("%Y-%m-%d 09:00")
+        display_time = "hôm nay"
+        parsed_text = re.sub(r'hôm\s+nay', '', text, flags=re.IGNORECASE).strip()
+    
+    parsed_text = re.sub(r'\s+', ' ', parsed_text).strip()
+    
+    return {
+        "has_time": has_time,
+        "datetime": datetime_str,
+        "display_time": display_time,
+        "parsed_text": parsed_text,
+        "original_time_expression": ""
+    }
+
+def throughput(parse, messages, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for message in messages:
+            parse(message)
+    return rounds * len(messages) / (time.perf_counter() - start)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+
+    with open(CORPUS, encoding="utf-8") as f:
+        messages = [line.strip() for line in f if line.strip()]
+
+    table = time_tokenizer.day_table()
+
+    def cold(message):
+        return time_tokenizer._parse(table, time_tokenizer.normalize(message))
+
+    legacy = throughput(legacy_time_parse, messages, args.rounds)
+    uncached = throughput(cold, messages, args.rounds)
+    cached = throughput(parse_time, messages, args.rounds)
+    print(f"{len(messages)} messages x {args.rounds} rounds")
+    print(f"legacy regex chain       : {legacy:10,.0f} msg/s")
+    print(f"time_tokenizer (cold)    : {uncached:10,.0f} msg/s ({uncached / legacy:.2f}x)")
+    print(f"time_tokenizer (cached)  : {cached:10,.0f} msg/s ({cached / legacy:.2f}x)")
+
+    print("\nDisagreements (legacy -> tokenizer):")
+    for message in messages:
+        old, new = legacy_time_parse(message), parse_time(message)
+        if old["datetime"] != new["datetime"]:
+            print(f"  {message!r}: {old['datetime']} -> {new['datetime']} ({new['parsed_text']!r})")
+
+if __name__ == "__main__":
+    main()
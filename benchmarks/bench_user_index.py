@@ -0,0 +1,86 @@
+"""
+Per-user read cost in DataManager: global list scans vs per-user indexes.
+
+Builds USERS x ITEMS todos in memory (no disk I/O) and times
+get_user_todos / get_all_user_items for random users, next to the old
+list comprehension over every user's items.
+
+The default 10k users x 1k items holds 10M items and needs several GB of
+RAM; pass smaller sizes for a quick run.
+
+Usage:
+    python benchmarks/bench_user_index.py --users 10000 --items 1000
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "benchmark")
+os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+
+from data_storage import DataManager  # noqa: E402
+from storage_backends import InMemoryBackend  # noqa: E402
+
+class GeneratedBackend(InMemoryBackend):
+    """In-memory backend preloaded with synthetic todos; saves are no-ops"""
+
+    def __init__(self, users, items_per_user):
+        super().__init__()
+        self.users = users
+        self.items_per_user = items_per_user
+
+    def load(self):
+        todos = []
+        item_id = 1
+        for n in range(self.items_per_user):
+            for user_id in range(self.users):
+                todos.append({
+                    "id": item_id,
+                    "user_id": user_id,
+                    "text": f"task {n}",
+                    "time_info": {"has_time": False},
+                    "completed": n % 3 == 0,
+                    "type": "todo"
+                })
+                item_id += 1
+        return self._set_loaded({"todos": todos})
+
+    def save(self, collection, item):
+        pass
+
+def time_per_call(func, user_ids):
+    start = time.perf_counter()
+    for user_id in user_ids:
+        func(user_id)
+    return (time.perf_counter() - start) / len(user_ids)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--items", type=int, default=1000, help="todos per user")
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    backend = GeneratedBackend(args.users, args.items)
+    data_manager = DataManager(backend)
+    print(f"built {args.users * args.items:,} items and indexes in {time.perf_counter() - start:.1f}s")
+
+    all_todos = backend.snapshot()["todos"]
+    user_ids = [random.randrange(args.users) for _ in range(args.queries)]
+
+    def scan(user_id):
+        return [t for t in all_todos if t.user_id == user_id and not t.completed]
+
+    scan_queries = user_ids[:max(1, min(args.queries, 20))]
+    print(f"full scan         : {time_per_call(scan, scan_queries) * 1000:10.3f} ms/query")
+    print(f"get_user_todos    : {time_per_call(data_manager.get_user_todos, user_ids) * 1000:10.3f} ms/query")
+    print(f"get_all_user_items: {time_per_call(data_manager.get_all_user_items, user_ids) * 1000:10.3f} ms/query")
+
+if __name__ == "__main__":
+    main()
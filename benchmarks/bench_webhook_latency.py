@@ -0,0 +1,252 @@
+"""
+End-to-end update latency: long polling vs webhook.
+
+Runs a fake Telegram Bot API server locally and a bot whose only handler
+replies to each message. For every sample the fake server makes one
+update available (polling: it answers the pending getUpdates; webhook: it
+POSTs the update to webhook_server.py) and the latency is the time until
+the bot's sendMessage reply arrives back at the fake server.
+
+No network access or real bot token is needed.
+
+Usage:
+    python benchmarks/bench_webhook_latency.py --samples 200
+    python benchmarks/bench_webhook_latency.py --rtt-ms 40   # simulate Bot API round trips
+    python benchmarks/bench_webhook_latency.py --rtt-ms 40 --gap-ms 10   # steady traffic
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from telegram import Update  # noqa: E402
+from telegram.ext import Application, ContextTypes, MessageHandler, filters  # noqa: E402
+
+from webhook_server import serve_webhook  # noqa: E402
+
+TOKEN = "123456:benchmark"
+SECRET = "benchmark-secret"
+CHAT_ID = 42
+
+class FakeTelegram:
+    """Just enough of the Bot API for polling, webhooks and sendMessage"""
+
+    def __init__(self, rtt_ms: float):
+        self.delay = rtt_ms / 2000  # half the round trip each way
+        self.updates = []
+        self.cond = threading.Condition()
+        self.replies = {}  # reply text -> perf_counter when received
+        self.next_update_id = 1
+
+    def make_update(self, text: str) -> dict:
+        with self.cond:
+            update_id = self.next_update_id
+            self.next_update_id += 1
+        return {
+            "update_id": update_id,
+            "message": {
+                "message_id": update_id,
+                "date": int(time.time()),
+                "chat": {"id": CHAT_ID, "type": "private"},
+                "from": {"id": CHAT_ID, "is_bot": False, "first_name": "Bench"},
+                "text": text
+            }
+        }
+
+    def push(self, update: dict):
+        with self.cond:
+            self.updates.append(update)
+            self.cond.notify_all()
+
+    def call(self, method: str, params: dict):
+        if method == "getMe":
+            return {"id": 1, "is_bot": True, "first_name": "Bench", "username": "bench_bot",
+                    "can_join_groups": True, "can_read_all_group_messages": False,
+                    "supports_inline_queries": False}
+        if method in ("setWebhook", "deleteWebhook"):
+            return True
+        if method == "getUpdates":
+            offset = int(params.get("offset", 0) or 0)
+            timeout = float(params.get("timeout", 0) or 0)
+            with self.cond:
+                self.updates = [u for u in self.updates if u["update_id"] >= offset]
+                if not self.updates:
+                    self.cond.wait(timeout)
+                return list(self.updates)
+        if method == "sendMessage":
+            self.replies[params["text"]] = time.perf_counter()
+            return {"message_id": 1, "date": int(time.time()),
+                    "chat": {"id": int(params["chat_id"]), "type": "private"}, "text": params["text"]}
+        raise KeyError(method)
+
+    def serve(self) -> ThreadingHTTPServer:
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Headers and body go out as separate writes; don't let Nagle hold the body back
+            disable_nagle_algorithm = True
+
+            def do_POST(self):
+                method = self.path.rsplit("/", 1)[-1]
+                raw = self.rfile.read(int(self.headers.get("Content-Length", 0))).decode()
+                if self.headers.get("Content-Type", "").startswith("application/json"):
+                    params = json.loads(raw or "{}")
+                else:
+                    # python-telegram-bot form-encodes parameters, JSON-encoding non-strings
+                    params = {}
+                    for key, value in parse_qsl(raw):
+                        try:
+                            params[key] = json.loads(value)
+                        except ValueError:
+                            params[key] = value
+                time.sleep(fake.delay)
+                body = json.dumps({"ok": True, "result": fake.call(method, params)}).encode()
+                time.sleep(fake.delay)
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+async def reply(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    await update.message.reply_text("re " + update.message.text)
+
+def build_application(api_port: int, webhook: bool) -> Application:
+    builder = (
+        Application.builder()
+        .token(TOKEN)
+        .base_url(f"http://127.0.0.1:{api_port}/bot")
+        .get_updates_read_timeout(30)
+    )
+    if webhook:
+        builder = builder.updater(None)
+    # Replies don't wait on each other, so only the transport differs between modes
+    application = builder.concurrent_updates(True).build()
+    application.add_handler(MessageHandler(filters.TEXT, reply))
+    return application
+
+async def wait_reply(fake: FakeTelegram, text: str, timeout: float = 10) -> float:
+    deadline = time.perf_counter() + timeout
+    while text not in fake.replies:
+        if time.perf_counter() > deadline:
+            raise TimeoutError(text)
+        await asyncio.sleep(0.0002)
+    return fake.replies[text]
+
+async def drive(fake: FakeTelegram, prefix: str, samples: int, gap: float, deliver):
+    """
+    gap == 0: one update at a time, each waiting for the previous reply.
+    gap > 0: open loop, a new update every gap seconds regardless of replies.
+    """
+    latencies = []
+    if not gap:
+        for n in range(samples):
+            update = fake.make_update(f"{prefix} {n}")
+            start = time.perf_counter()
+            await deliver(update)
+            latencies.append(await wait_reply(fake, f"re {prefix} {n}") - start)
+        return latencies
+
+    starts, deliveries = [], []
+    for n in range(samples):
+        update = fake.make_update(f"{prefix} {n}")
+        starts.append(time.perf_counter())
+        deliveries.append(asyncio.create_task(deliver(update)))
+        await asyncio.sleep(gap)
+    await asyncio.gather(*deliveries)
+    for n, start in enumerate(starts):
+        latencies.append(await wait_reply(fake, f"re {prefix} {n}") - start)
+    return latencies
+
+async def bench_polling(fake: FakeTelegram, api_port: int, samples: int, gap: float):
+    application = build_application(api_port, webhook=False)
+
+    async def deliver(update):
+        fake.push(update)
+
+    async with application:
+        await application.updater.start_polling(poll_interval=0, timeout=10)
+        await application.start()
+        latencies = await drive(fake, "poll", samples, gap, deliver)
+        await application.updater.stop()
+        await application.stop()
+    return latencies
+
+async def bench_webhook(fake: FakeTelegram, api_port: int, samples: int, gap: float):
+    application = build_application(api_port, webhook=True)
+    stop = asyncio.Event()
+    port = 18443
+    server = asyncio.create_task(serve_webhook(
+        application, "https://example.invalid", "127.0.0.1", port, "telegram", SECRET, stop_event=stop
+    ))
+    async with httpx.AsyncClient() as client:
+        url = f"http://127.0.0.1:{port}/telegram"
+        while True:
+            try:
+                if (await client.get(f"http://127.0.0.1:{port}/healthz")).status_code == 200:
+                    break
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.05)
+
+        rejected = await client.post(url, json=fake.make_update("x"), headers={"X-Telegram-Bot-Api-Secret-Token": "wrong"})
+        assert rejected.status_code == 403, rejected.status_code
+
+        async def deliver(update):
+            # Telegram's side of the round trip to the bot
+            await asyncio.sleep(fake.delay)
+            response = await client.post(url, json=update, headers={"X-Telegram-Bot-Api-Secret-Token": SECRET})
+            response.raise_for_status()
+
+        latencies = await drive(fake, "hook", samples, gap, deliver)
+    stop.set()
+    await server
+    return latencies
+
+def report(name, latencies):
+    latencies = sorted(latencies)
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    print(f"{name:8}: median {statistics.median(latencies) * 1000:7.2f} ms | "
+          f"p95 {p95 * 1000:7.2f} ms | max {latencies[-1] * 1000:7.2f} ms")
+
+async def run(samples: int, rtt_ms: float, gap_ms: float):
+    fake = FakeTelegram(rtt_ms)
+    server = fake.serve()
+    api_port = server.server_address[1]
+    try:
+        report("polling", await bench_polling(fake, api_port, samples, gap_ms / 1000))
+        report("webhook", await bench_webhook(fake, api_port, samples, gap_ms / 1000))
+    finally:
+        server.shutdown()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--samples", type=int, default=200)
+    parser.add_argument("--rtt-ms", type=float, default=0, help="simulated round trip to the Bot API")
+    parser.add_argument("--gap-ms", type=float, default=0,
+                        help="send an update every GAP ms without waiting for replies (0: one at a time)")
+    args = parser.parse_args()
+    asyncio.run(run(args.samples, args.rtt_ms, args.gap_ms))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Check the Supabase backend against the PostgREST stand-in, in one process.
+
+Every stand-in request is delayed by --delay-ms, so a network call made on
+the bot's event loop shows up as a stall at least that long (shorter ones
+come from the I/O thread encoding a batch while holding the GIL).
+
+The check loads the backend and a user the way the bot does, adds enough
+items to cross several ID blocks, completes and removes some, then
+restarts the backend and checks that nothing was lost and that the removed
+item's ID is not handed out again.
+Exits non-zero on failure.
+
+Usage:
+    python benchmarks/check_supabase_standin.py --items 2500 --delay-ms 200
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import threading
+import time
+from http.server import ThreadingHTTPServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "benchmark")
+os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+
+# Keep test data out of the real data/ directory
+os.chdir(tempfile.mkdtemp(prefix="todolist-supabase-check-"))
+
+import postgrest_standin  # noqa: E402
+from data_storage import DataManager  # noqa: E402
+from storage_backends import ID_BLOCK  # noqa: E402
+from supabase_storage import SupabaseBackend  # noqa: E402
+
+USER_ID = 42
+
+def start_standin(delay: float) -> ThreadingHTTPServer:
+    class SlowHandler(postgrest_standin.Handler):
+        def _parse(self):
+            time.sleep(delay)
+            return super()._parse()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), SlowHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+async def watch_loop(stalls: list, stop: asyncio.Event):
+    """Record the longest time the event loop went without running this task"""
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(0.005)
+        stalls.append(time.perf_counter() - started - 0.005)
+
+async def session(url: str, items: int) -> dict:
+    data_manager = DataManager(SupabaseBackend(url, "dev", flush_interval_ms=20))
+    stalls, stop = [], asyncio.Event()
+    watcher = asyncio.create_task(watch_loop(stalls, stop))
+    await data_manager.load_async()
+    await data_manager.load_user_async(USER_ID)
+    started = time.perf_counter()
+    added = []
+    for n in range(items):
+        added.append(data_manager.add_todo(USER_ID, f"todo {n}", {"has_time": False}))
+        if n % 3 == 0:
+            data_manager.complete_todo(USER_ID, todo_id=added[-1].id)
+        await asyncio.sleep(0)
+    # The newest item goes away; its ID must stay used
+    data_manager.remove_item("todos", USER_ID, added[-1].id)
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await watcher
+    await asyncio.to_thread(data_manager.close)
+    return {"max_stall": max(stalls, default=0), "elapsed": elapsed, "last_id": added[-1].id}
+
+async def reload(url: str) -> dict:
+    data_manager = DataManager(SupabaseBackend(url, "dev"))
+    await data_manager.load_async()
+    await data_manager.load_user_async(USER_ID)
+    todos = data_manager.get_user_todos(USER_ID, include_completed=True)
+    open_todos = data_manager.get_user_todos(USER_ID)
+    next_id = data_manager.add_todo(USER_ID, "after restart", {"has_time": False}).id
+    await asyncio.to_thread(data_manager.close)
+    return {"todos": len(todos), "open": len(open_todos), "next_id": next_id}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--items", type=int, default=2500, help="todos to add (crosses items // ID_BLOCK blocks)")
+    parser.add_argument("--delay-ms", type=float, default=200, help="added to every stand-in request")
+    args = parser.parse_args()
+
+    delay = args.delay_ms / 1000
+    server = start_standin(delay)
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+    try:
+        first = asyncio.run(session(url, args.items))
+        second = asyncio.run(reload(url))
+    finally:
+        server.shutdown()
+
+    print(f"supabase: {args.items} todos in {first['elapsed']:.2f}s, "
+          f"longest event loop stall {first['max_stall'] * 1000:.1f} ms "
+          f"(stand-in requests take {args.delay_ms:.0f} ms)")
+    errors = []
+    if first["max_stall"] >= delay:
+        errors.append(f"the event loop stalled for {first['max_stall'] * 1000:.1f} ms: a request ran on it")
+    expected = args.items - 1
+    if second["todos"] != expected:
+        errors.append(f"after restart: {second['todos']} todos, expected {expected}")
+    expected_open = expected - (expected + 2) // 3
+    if second["open"] != expected_open:
+        errors.append(f"after restart: {second['open']} open todos, expected {expected_open}")
+    if second["next_id"] <= first["last_id"]:
+        errors.append(f"after restart: ID {second['next_id']} handed out again (removed item had {first['last_id']})")
+    if args.items < ID_BLOCK:
+        print(f"⚠️ fewer than {ID_BLOCK} items: no ID block boundary crossed")
+
+    for error in errors:
+        print(f"❌ {error}")
+    if errors:
+        sys.exit(1)
+    print("✅ no event loop stalls, no lost writes, no reused IDs")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Local PostgREST-compatible stand-in for developing against the Supabase backend.
+
+Serves /rest/v1/<table> from memory with the subset of PostgREST that
+supabase_storage.py uses: eq./in. filters, select, order, limit/offset,
+bulk POST upserts (on_conflict + Prefer: resolution=merge-duplicates) and
+filtered DELETE. Data is lost when the server stops.
+
+Usage:
+    python benchmarks/postgrest_standin.py --port 54321
+    SUPABASE_URL=http://127.0.0.1:54321 SUPABASE_KEY=dev STORAGE_BACKEND=supabase python main.py
+"""
+
+import argparse
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+# table -> primary key tuple -> row
+TABLES = {}
+LOCK = threading.Lock()
+# Columns making up each table's primary key when no on_conflict is given
+DEFAULT_KEY = ("collection", "id")
+
+def _as_text(value) -> str:
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return "null" if value is None else str(value)
+
+def _matches(row, filters) -> bool:
+    for column, condition in filters:
+        operator, _, expected = condition.partition(".")
+        actual = _as_text(row.get(column))
+        if operator == "eq" and actual != expected:
+            return False
+        if operator == "in" and actual not in expected.strip("()").split(","):
+            return False
+    return True
+
+def _order(rows, spec):
+    # Apply the least significant column first; sorts are stable
+    for part in reversed(spec.split(",")):
+        column, _, direction = part.partition(".")
+        rows.sort(key=lambda row: (row.get(column) is None, row.get(column)), reverse=direction == "desc")
+    return rows
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like PostgREST
+    disable_nagle_algorithm = True
+
+    def _parse(self):
+        url = urlsplit(self.path)
+        prefix = "/rest/v1/"
+        if not url.path.startswith(prefix):
+            return None, None, None
+        params = parse_qsl(url.query)
+        options = {k: v for k, v in params if k in ("select", "order", "limit", "offset", "on_conflict")}
+        filters = [(k, v) for k, v in params if k not in options]
+        return url.path[len(prefix):], options, filters
+
+    def _reply(self, status, body=None):
+        payload = b"" if body is None else json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        table, options, filters = self._parse()
+        if table is None:
+            return self._reply(404, {"message": "not found"})
+        with LOCK:
+            rows = [row for row in TABLES.get(table, {}).values() if _matches(row, filters)]
+        if "order" in options:
+            rows = _order(rows, options["order"])
+        offset = int(options.get("offset", 0))
+        limit = int(options["limit"]) if "limit" in options else None
+        rows = rows[offset:None if limit is None else offset + limit]
+        select = options.get("select", "*")
+        if select != "*":
+            columns = select.split(",")
+            rows = [{column: row.get(column) for column in columns} for row in rows]
+        self._reply(200, rows)
+
+    def do_POST(self):
+        table, options, _ = self._parse()
+        if table is None:
+            return self._reply(404, {"message": "not found"})
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"[]")
+        rows = body if isinstance(body, list) else [body]
+        key_columns = tuple(options["on_conflict"].split(",")) if "on_conflict" in options else DEFAULT_KEY
+        upsert = "resolution=merge-duplicates" in self.headers.get("Prefer", "")
+        with LOCK:
+            stored = TABLES.setdefault(table, {})
+            keys = [tuple(row[column] for column in key_columns) for row in rows]
+            if not upsert and any(key in stored for key in keys):
+                return self._reply(409, {"message": "duplicate key value violates unique constraint"})
+            for key, row in zip(keys, rows):
+                stored[key] = dict(stored.get(key, {}), **row)
+        self._reply(201)
+
+    def do_DELETE(self):
+        table, _, filters = self._parse()
+        if table is None:
+            return self._reply(404, {"message": "not found"})
+        with LOCK:
+            stored = TABLES.get(table, {})
+            for key in [key for key, row in stored.items() if _matches(row, filters)]:
+                del stored[key]
+        self._reply(204)
+
+    def log_message(self, format, *args):
+        pass  # Quiet; every request would be logged otherwise
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=54321)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer((args.host, args.port), Handler)
+    print(f"PostgREST stand-in listening on http://{args.host}:{args.port}/rest/v1/")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
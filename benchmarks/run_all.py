@@ -0,0 +1,335 @@
+"""
+Benchmark suite: time parsing, DataManager scaling, handler rendering and summaries.
+
+Every benchmark runs a number of rounds and records pytest-benchmark style
+statistics (min/max/mean/median/stddev seconds per operation, ops/s). The
+results are written as JSON together with the git commit, so two commits can
+be compared:
+
+    python benchmarks/run_all.py                          # -> benchmarks/results/<commit>.json
+    python benchmarks/run_all.py --sizes 1000 100000      # skip the 1M-item run
+    python benchmarks/run_all.py --compare benchmarks/results/<old>.json
+
+With --compare, benchmarks whose median got slower by more than --threshold
+are listed and the exit status is 1.
+
+Gemini is stubbed out (any call fails), storage is in memory and nothing is
+written to the real data/ directory.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "benchmark")
+os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+os.environ["ALLOWED_USERS"] = ""
+
+# Keep benchmark data out of the real data/ directory
+os.chdir(tempfile.mkdtemp(prefix="todolist-bench-"))
+
+import gemini_service  # noqa: E402
+import handlers  # noqa: E402
+import time_tokenizer  # noqa: E402
+import utils  # noqa: E402
+from data_storage import DataManager  # noqa: E402
+from storage_backends import InMemoryBackend  # noqa: E402
+
+CORPUS = os.path.join(ROOT, "benchmarks", "time_messages.txt")
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+DEFAULT_SIZES = (1_000, 100_000, 1_000_000)
+# Items per user in the DataManager scaling runs
+ITEMS_PER_USER = 100
+
+class NoGemini:
+    """Stand-in for genai.GenerativeModel; the suite must never reach the network"""
+
+    def generate_content(self, *args, **kwargs):
+        raise RuntimeError("Gemini called during a benchmark")
+
+    async def generate_content_async(self, *args, **kwargs):
+        raise RuntimeError("Gemini called during a benchmark")
+
+class NullBackend(InMemoryBackend):
+    """In-memory backend whose saves are no-ops, so only DataManager is measured"""
+
+    def load(self):
+        return self._set_loaded({})
+
+    def save(self, collection, item):
+        pass
+
+    def delete(self, collection, item):
+        pass
+
+class FakeMessage:
+    def __init__(self):
+        self.replies = []
+
+    async def reply_text(self, text, **kwargs):
+        self.replies.append(text)
+
+def fake_update(user_id: int) -> SimpleNamespace:
+    """Just the parts of telegram.Update the handlers read"""
+    return SimpleNamespace(effective_user=SimpleNamespace(id=user_id), message=FakeMessage())
+
+class Suite:
+    def __init__(self, min_time: float, max_rounds: int):
+        self.min_time = min_time
+        self.max_rounds = max_rounds
+        self.results = []
+
+    def bench(self, group: str, name: str, func, ops: int = 1, rounds: int = None, setup=None, **params):
+        """
+        Time func() over several rounds; each call performs ops operations
+        Rounds continue until min_time has passed (at least 3, at most
+        max_rounds) unless rounds is given. setup() runs untimed before each round.
+        """
+        timings = []
+        started = time.perf_counter()
+        while True:
+            if setup:
+                setup()
+            start = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - start) / ops)
+            if rounds is not None:
+                if len(timings) >= rounds:
+                    break
+            elif len(timings) >= self.max_rounds or (
+                    len(timings) >= 3 and time.perf_counter() - started >= self.min_time):
+                break
+        median = statistics.median(timings)
+        result = {
+            "group": group,
+            "name": f"{group}/{name}",
+            "params": params,
+            "stats": {
+                "rounds": len(timings),
+                "ops_per_round": ops,
+                "min": min(timings),
+                "max": max(timings),
+                "mean": statistics.fmean(timings),
+                "median": median,
+                "stddev": statistics.stdev(timings) if len(timings) > 1 else 0.0,
+                "ops": 1 / median if median else float("inf")
+            }
+        }
+        self.results.append(result)
+        print(f"{result['name']:<45} {median * 1e6:12.2f} µs/op {result['stats']['ops']:14,.0f} op/s "
+              f"({len(timings)} rounds)")
+        return result
+
+def load_corpus():
+    with open(CORPUS, encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip()]
+
+def bench_parser(suite: Suite):
+    messages = load_corpus()
+
+    def parse_all():
+        for message in messages:
+            gemini_service.fallback_time_parse(message)
+
+    suite.bench("parser", "fallback_time_parse_cold", parse_all, ops=len(messages),
+                setup=time_tokenizer._parse_cached.cache_clear, messages=len(messages))
+    suite.bench("parser", "fallback_time_parse_cached", parse_all, ops=len(messages), messages=len(messages))
+
+def time_infos(count: int, rng: random.Random):
+    """A pool of time_info dicts: 60% due within the next 30 days, the rest untimed"""
+    now = datetime.now()
+    pool = []
+    for _ in range(count):
+        if rng.random() < 0.6:
+            due = now + timedelta(minutes=rng.randrange(30 * 24 * 60))
+            pool.append({"has_time": True, "datetime": due.strftime("%Y-%m-%d %H:%M"), "display_time": ""})
+        else:
+            pool.append({"has_time": False})
+    return pool
+
+def populate(manager: DataManager, users: int, items_per_user: int, rng: random.Random):
+    """Add items round-robin over users: half todos, 30% events, 20% ideas"""
+    infos = time_infos(1024, rng)
+    adders = [manager.add_todo] * 5 + [manager.add_event] * 3 + [manager.add_idea] * 2
+    words = ["mua sữa", "gọi mẹ", "dọn nhà", "họp nhóm", "nộp báo cáo", "đi chợ", "sửa xe", "đọc sách"]
+    for n in range(items_per_user):
+        adder = adders[n % len(adders)]
+        text = f"{words[n % len(words)]} {n}"
+        info = infos[n % len(infos)]
+        for user_id in range(1, users + 1):
+            adder(user_id, text, info)
+
+def bench_data_manager(suite: Suite, sizes):
+    for size in sizes:
+        users = max(1, size // ITEMS_PER_USER)
+        per_user = size // users
+        rng = random.Random(size)
+        manager = DataManager(NullBackend())
+
+        # One round: building the index is the add benchmark
+        suite.bench("data_manager", f"add[{size}]", lambda: populate(manager, users, per_user, rng),
+                    ops=users * per_user, rounds=1, items=size)
+
+        open_ids = [(user_id, todo.id) for user_id in range(1, users + 1)
+                    for todo in manager.get_user_todos(user_id)]
+        rng.shuffle(open_ids)
+        sample = open_ids[:1000]
+        batch = max(1, min(100, len(sample)))
+        batches = iter([sample[i:i + batch] for i in range(0, len(sample), batch)])
+
+        def complete_batch():
+            for user_id, todo_id in next(batches):
+                manager.complete_todo(user_id, todo_id)
+
+        suite.bench("data_manager", f"complete_todo[{size}]", complete_batch, ops=batch,
+                    rounds=len(sample) // batch, items=size)
+
+        user_ids = [rng.randint(1, users) for _ in range(1000)]
+
+        def timelines():
+            for user_id in user_ids:
+                manager.get_user_timeline(user_id, "todos")
+
+        def upcoming():
+            for user_id in user_ids:
+                manager.get_upcoming_items(user_id)
+
+        def all_items():
+            for user_id in user_ids:
+                manager.get_all_user_items(user_id)
+
+        suite.bench("data_manager", f"get_user_timeline[{size}]", timelines, ops=len(user_ids), items=size)
+        suite.bench("data_manager", f"get_upcoming_items[{size}]", upcoming, ops=len(user_ids), items=size)
+        suite.bench("data_manager", f"get_all_user_items[{size}]", all_items, ops=len(user_ids), items=size)
+
+def bench_rendering(suite: Suite, per_user_counts):
+    loop = asyncio.new_event_loop()
+    try:
+        for count in per_user_counts:
+            manager = DataManager(NullBackend())
+            populate(manager, 1, count, random.Random(count))
+            handlers.data_manager = manager
+            update = fake_update(1)
+
+            def render(command):
+                update.message.replies.clear()
+                loop.run_until_complete(command(update, None))
+
+            # Repeated views come from the render cache; the _uncached runs clear it every round
+            clear = handlers.render_cache.clear
+            suite.bench("render", f"list_command[{count}]", lambda: render(handlers.list_command), items=count)
+            suite.bench("render", f"list_command_uncached[{count}]", lambda: render(handlers.list_command),
+                        setup=clear, items=count)
+            suite.bench("render", f"idea_command[{count}]", lambda: render(handlers.idea_command), items=count)
+            suite.bench("render", f"idea_command_uncached[{count}]", lambda: render(handlers.idea_command),
+                        setup=clear, items=count)
+    finally:
+        loop.close()
+
+def bench_utils(suite: Suite, per_user_counts):
+    for count in per_user_counts:
+        manager = DataManager(NullBackend())
+        populate(manager, 1, count, random.Random(count))
+        all_items = manager.get_all_user_items(1)
+        timed, _ = manager.get_user_timeline(1, "todos")
+        suite.bench("utils", f"generate_summary_stats[{count}]",
+                    lambda: utils.generate_summary_stats(all_items), items=count)
+        suite.bench("utils", f"get_upcoming_items[{count}]", lambda: utils.get_upcoming_items(all_items["todos"]), items=count)
+        suite.bench("utils", f"upcoming_in_timeline[{count}]", lambda: utils.upcoming_in_timeline(timed), items=count)
+
+def git_info():
+    def git(*args):
+        try:
+            return subprocess.run(["git", *args], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return ""
+    return {
+        "id": git("rev-parse", "HEAD"),
+        "subject": git("log", "-1", "--format=%s"),
+        "dirty": bool(git("status", "--porcelain", "--untracked-files=no"))
+    }
+
+def compare(results, baseline_path: str, threshold: float) -> bool:
+    """Print the change in median per benchmark; True if nothing regressed beyond threshold"""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = {b["name"]: b for b in json.load(f)["benchmarks"]}
+    regressions = []
+    print(f"\nCompared with {baseline_path}:")
+    for result in results:
+        old = baseline.get(result["name"])
+        if old is None:
+            continue
+        ratio = result["stats"]["median"] / old["stats"]["median"]
+        marker = ""
+        if ratio > 1 + threshold:
+            marker = "  ⚠️ slower"
+            regressions.append(result["name"])
+        elif ratio < 1 - threshold:
+            marker = "  faster"
+        print(f"{result['name']:<45} {ratio:6.2f}x time{marker}")
+    if regressions:
+        print(f"\n❌ {len(regressions)} benchmark(s) slower by more than {threshold:.0%}")
+    return not regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES),
+                        help="total items in the DataManager scaling runs")
+    parser.add_argument("--render-sizes", type=int, nargs="+", default=[10, 100, 1000],
+                        help="items of the single user in the rendering and utils runs")
+    parser.add_argument("--only", nargs="+", choices=["parser", "data_manager", "render", "utils"],
+                        help="run only these groups")
+    parser.add_argument("--min-time", type=float, default=0.5, help="seconds spent per benchmark")
+    parser.add_argument("--max-rounds", type=int, default=1000)
+    parser.add_argument("--output", help="JSON file (default: benchmarks/results/<commit>.json)")
+    parser.add_argument("--compare", help="earlier results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="allowed slowdown for --compare")
+    args = parser.parse_args()
+
+    gemini_service.model = NoGemini()
+    suite = Suite(args.min_time, args.max_rounds)
+    groups = args.only or ["parser", "data_manager", "render", "utils"]
+    if "parser" in groups:
+        bench_parser(suite)
+    if "data_manager" in groups:
+        bench_data_manager(suite, args.sizes)
+    if "render" in groups:
+        bench_rendering(suite, args.render_sizes)
+    if "utils" in groups:
+        bench_utils(suite, args.render_sizes)
+
+    commit = git_info()
+    output = args.output or os.path.join(RESULTS_DIR, f"{commit['id'][:12] or 'unknown'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump({
+            "datetime": datetime.now().isoformat(timespec="seconds"),
+            "commit_info": commit,
+            "machine_info": {
+                "python": platform.python_version(),
+                "implementation": platform.python_implementation(),
+                "machine": platform.machine(),
+                "system": platform.system(),
+                "cpu_count": os.cpu_count()
+            },
+            "benchmarks": suite.results
+        }, f, ensure_ascii=False, indent=2)
+    print(f"\n💾 Results saved to {output}")
+
+    if args.compare and not compare(suite.results, args.compare, args.threshold):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -7,15 +7,99 @@ load_dotenv()
 TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 ALLOWED_USERS = os.getenv("ALLOWED_USERS", "").split(",")
+# Telegram user IDs allowed to use admin commands such as /stats
+ADMIN_USERS = [user.strip() for user in os.getenv("ADMIN_USERS", "").split(",") if user.strip()]
+# Updates processed at once across all users (each user's updates stay in order)
+MAX_CONCURRENT_UPDATES = int(os.getenv("MAX_CONCURRENT_UPDATES", "64"))
 
-# Optional Supabase (for persistent storage)
+# How updates arrive: "polling" (long polling) or "webhook" (Telegram POSTs to
+# WEBHOOK_URL/WEBHOOK_PATH; the server also serves GET /healthz)
+BOT_MODE = os.getenv("BOT_MODE", "polling")
+WEBHOOK_URL = os.getenv("WEBHOOK_URL")  # public base URL, e.g. https://bot.example.com
+WEBHOOK_LISTEN = os.getenv("WEBHOOK_LISTEN", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8443"))
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "telegram")
+# Sent back by Telegram on every webhook call; requests without it are rejected
+WEBHOOK_SECRET_TOKEN = os.getenv("WEBHOOK_SECRET_TOKEN")
+
+# Items per page in /list and /idea (pages are browsed with inline buttons)
+LIST_PAGE_SIZE = int(os.getenv("LIST_PAGE_SIZE", "20"))
+# Rendered /list and /idea pages kept for reuse until the user's data changes
+RENDER_CACHE_SIZE = int(os.getenv("RENDER_CACHE_SIZE", "1000"))
+
+# Cold archive: completed todos older than ARCHIVE_TODO_AFTER_DAYS and events due
+# before today move to monthly gzip JSONL files, swept every ARCHIVE_INTERVAL_HOURS (0 disables)
+ARCHIVE_DIR = os.getenv("ARCHIVE_DIR", os.path.join("data", "archive"))
+ARCHIVE_TODO_AFTER_DAYS = int(os.getenv("ARCHIVE_TODO_AFTER_DAYS", "30"))
+ARCHIVE_INTERVAL_HOURS = float(os.getenv("ARCHIVE_INTERVAL_HOURS", "24"))
+
+# Prometheus metrics: GET http://METRICS_LISTEN:METRICS_PORT/metrics (0 disables the endpoint)
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+METRICS_LISTEN = os.getenv("METRICS_LISTEN", "127.0.0.1")
+
+# Gemini
+# Needs a model with JSON response mode (structured output)
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-1.5-flash")
+# Max number of Gemini requests in flight at once from async handlers
+GEMINI_MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", "8"))
+# Concurrent analyses are coalesced for up to this many ms, or until the batch is full
+GEMINI_BATCH_WINDOW_MS = float(os.getenv("GEMINI_BATCH_WINDOW_MS", "5"))
+GEMINI_BATCH_MAX_SIZE = int(os.getenv("GEMINI_BATCH_MAX_SIZE", "10"))
+
+# Gemini analysis cache (persisted, keyed on day + normalized text)
+GEMINI_CACHE_PATH = os.getenv("GEMINI_CACHE_PATH", os.path.join("data", "gemini_cache.sqlite3"))
+GEMINI_CACHE_SIZE = int(os.getenv("GEMINI_CACHE_SIZE", "5000"))
+GEMINI_CACHE_TTL_SECONDS = int(os.getenv("GEMINI_CACHE_TTL_SECONDS", "86400"))
+
+# Local classifier: Gemini is only asked when confidence is below this
+LOCAL_CLASSIFIER_THRESHOLD = float(os.getenv("LOCAL_CLASSIFIER_THRESHOLD", "0.8"))
+# Its model, learned from stored items and saved so startup doesn't re-read them
+CLASSIFIER_MODEL_PATH = os.getenv("CLASSIFIER_MODEL_PATH", os.path.join("data", "classifier.json"))
+
+# Storage backend: "journal" (append-only log + snapshots), "json" (rewrite whole files)
+# "sharded" (one JSON file per user), "sqlite" (indexed queries) or "supabase"
+# (remote, see SUPABASE_* below); see migrate_storage.py to copy existing data between them
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "journal")
+SQLITE_PATH = os.getenv("SQLITE_PATH", os.path.join("data", "todolist.sqlite3"))
+# "sharded" layout: SHARDED_DATA_DIR/<user_id % SHARD_COUNT>/<user_id>.json
+SHARDED_DATA_DIR = os.getenv("SHARDED_DATA_DIR", os.path.join("data", "users"))
+SHARD_COUNT = int(os.getenv("SHARD_COUNT", "256"))
+
+# Write-behind mode for the "json" and "sharded" backends: saves only mark a file dirty and a
+# background task rewrites it (atomically) at most every WRITE_BEHIND_MAX_DELAY_MS,
+# or as soon as WRITE_BEHIND_MAX_PENDING mutations are pending. A crash loses at most
+# the mutations since the last flush, i.e. under WRITE_BEHIND_MAX_DELAY_MS worth and
+# under WRITE_BEHIND_MAX_PENDING of them. Pending writes are flushed on shutdown.
+STORAGE_WRITE_BEHIND = os.getenv("STORAGE_WRITE_BEHIND", "false").lower() == "true"
+WRITE_BEHIND_MAX_DELAY_MS = int(os.getenv("WRITE_BEHIND_MAX_DELAY_MS", "1000"))
+WRITE_BEHIND_MAX_PENDING = int(os.getenv("WRITE_BEHIND_MAX_PENDING", "100"))
+# Compact the journal into the snapshot files after this many mutations
+JOURNAL_COMPACT_EVERY = int(os.getenv("JOURNAL_COMPACT_EVERY", "1000"))
+JOURNAL_FSYNC = os.getenv("JOURNAL_FSYNC", "false").lower() == "true"
+
+# Reminders are sent this many minutes before an event or todo is due
+REMINDER_LEAD_MINUTES = int(os.getenv("REMINDER_LEAD_MINUTES", "10"))
+
+# Optional Supabase (for persistent storage, STORAGE_BACKEND=supabase)
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_KEY")
+SUPABASE_TABLE = os.getenv("SUPABASE_TABLE", "items")
+# Saves are sent as bulk upserts of up to SUPABASE_BATCH_SIZE rows, at least
+# every SUPABASE_FLUSH_INTERVAL_MS
+SUPABASE_BATCH_SIZE = int(os.getenv("SUPABASE_BATCH_SIZE", "500"))
+SUPABASE_FLUSH_INTERVAL_MS = int(os.getenv("SUPABASE_FLUSH_INTERVAL_MS", "200"))
+SUPABASE_MAX_CONNECTIONS = int(os.getenv("SUPABASE_MAX_CONNECTIONS", "10"))
 
-# Validate required environment variables
-if not TELEGRAM_BOT_TOKEN:
-    raise ValueError("TELEGRAM_BOT_TOKEN is required")
-if not GEMINI_API_KEY:
-    raise ValueError("GEMINI_API_KEY is required")
-
-print("✅ Configuration loaded successfully")
\ No newline at end of file
+def validate_config():
+    """
+    Check required environment variables; raises ValueError
+    Called when the bot starts, so modules can be imported without real tokens
+    """
+    if not TELEGRAM_BOT_TOKEN:
+        raise ValueError("TELEGRAM_BOT_TOKEN is required")
+    if not GEMINI_API_KEY:
+        raise ValueError("GEMINI_API_KEY is required")
+    if BOT_MODE == "webhook" and not (WEBHOOK_URL and WEBHOOK_SECRET_TOKEN):
+        raise ValueError("BOT_MODE=webhook requires WEBHOOK_URL and WEBHOOK_SECRET_TOKEN")
+    
+    print("✅ Configuration loaded successfully")
\ No newline at end of file
@@ -1,122 +1,393 @@
-import json
+import asyncio
+import heapq
 import os
-from datetime import datetime
-from typing import Dict, List, Optional
+import threading
+import time
+from operator import attrgetter
+from typing import Callable, Dict, List, Optional, Tuple
+from config import (
+    STORAGE_BACKEND,
+    JOURNAL_COMPACT_EVERY,
+    JOURNAL_FSYNC,
+    SQLITE_PATH,
+    SHARDED_DATA_DIR,
+    SHARD_COUNT,
+    SUPABASE_URL,
+    SUPABASE_KEY,
+    SUPABASE_TABLE,
+    SUPABASE_BATCH_SIZE,
+    SUPABASE_FLUSH_INTERVAL_MS,
+    SUPABASE_MAX_CONNECTIONS,
+    STORAGE_WRITE_BEHIND,
+    WRITE_BEHIND_MAX_DELAY_MS,
+    WRITE_BEHIND_MAX_PENDING
+)
+from metrics import register_gauge
+from models import Item, due_timestamp, has_clock
+from search_index import SearchIndex
+from time_index import TimeIndex
+from storage_backends import (
+    COLLECTIONS,
+    StorageBackend,
+    JsonFileBackend,
+    WriteBehindFlusher,
+    load_json_file,
+    save_json_file
+)
 
-# File-based storage (can be replaced with Supabase later)
+# File-based storage (STORAGE_BACKEND=supabase stores items remotely instead)
 DATA_DIR = "data"
 EVENTS_FILE = os.path.join(DATA_DIR, "events.json")
 TODOS_FILE = os.path.join(DATA_DIR, "todos.json")
 IDEAS_FILE = os.path.join(DATA_DIR, "ideas.json")
+JOURNAL_FILE = os.path.join(DATA_DIR, "journal.jsonl")
+# Highest reserved item IDs, so IDs of deleted or archived items are not reused
+IDS_FILE = os.path.join(DATA_DIR, "ids.json")
+
+COLLECTION_FILES = {
+    "events": EVENTS_FILE,
+    "todos": TODOS_FILE,
+    "ideas": IDEAS_FILE
+}
 
 def ensure_data_dir():
     """Create data directory if it doesn't exist"""
     if not os.path.exists(DATA_DIR):
         os.makedirs(DATA_DIR)
 
-def load_json_file(filepath: str) -> List[Dict]:
-    """Load JSON file or return empty list"""
-    if not os.path.exists(filepath):
-        return []
-    try:
-        with open(filepath, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except:
-        return []
+def create_backend(name: str = STORAGE_BACKEND) -> StorageBackend:
+    """Build the storage backend selected by STORAGE_BACKEND"""
+    if name == "json":
+        return JsonFileBackend(COLLECTION_FILES, write_behind=STORAGE_WRITE_BEHIND, ids_file=IDS_FILE)
+    if name == "journal":
+        from journal_storage import JournalBackend
+        # Snapshot files are the plain JSON files, so switching back is lossless
+        return JournalBackend(
+            COLLECTION_FILES,
+            JOURNAL_FILE,
+            compact_every=JOURNAL_COMPACT_EVERY,
+            fsync=JOURNAL_FSYNC,
+            ids_file=IDS_FILE
+        )
+    if name == "sharded":
+        from sharded_storage import ShardedJsonBackend
+        return ShardedJsonBackend(SHARDED_DATA_DIR, SHARD_COUNT, write_behind=STORAGE_WRITE_BEHIND)
+    if name == "sqlite":
+        from sqlite_storage import SQLiteBackend
+        return SQLiteBackend(SQLITE_PATH)
+    if name == "supabase":
+        from supabase_storage import SupabaseBackend
+        if not SUPABASE_URL or not SUPABASE_KEY:
+            raise ValueError("STORAGE_BACKEND=supabase requires SUPABASE_URL and SUPABASE_KEY")
+        return SupabaseBackend(
+            SUPABASE_URL,
+            SUPABASE_KEY,
+            table=SUPABASE_TABLE,
+            batch_size=SUPABASE_BATCH_SIZE,
+            flush_interval_ms=SUPABASE_FLUSH_INTERVAL_MS,
+            max_connections=SUPABASE_MAX_CONNECTIONS
+        )
+    raise ValueError(f"Unknown STORAGE_BACKEND: {name}")
 
-def save_json_file(filepath: str, data: List[Dict]):
-    """Save data to JSON file"""
-    ensure_data_dir()
-    with open(filepath, 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+class UserItems:
+    """
+    One user's items by ID in insertion order, the set of open todos, and
+    per-collection indexes by due time and by word (todos: open ones only)
+    version counts the user's mutations, so rendered views can be cached
+    """
+    __slots__ = ("events", "todos", "ideas", "open_todos", "timelines", "search", "lock", "loaded", "version")
+    
+    def __init__(self):
+        self.events = {}
+        self.todos = {}
+        self.ideas = {}
+        self.open_todos = {}  # id -> todo, insertion ordered
+        self.timelines = {name: TimeIndex() for name in COLLECTIONS}
+        self.search = {name: SearchIndex() for name in COLLECTIONS}
+        # Guards this user's items; different users never contend
+        self.lock = threading.RLock()
+        self.loaded = False
+        self.version = 0
+    
+    def add(self, collection: str, item: Item):
+        getattr(self, collection)[item.id] = item
+        if collection == "todos":
+            if item.completed:
+                return
+            self.open_todos[item.id] = item
+        self.timelines[collection].add(item)
+        self.search[collection].add(item)
+    
+    def remove(self, collection: str, item: Item):
+        getattr(self, collection).pop(item.id, None)
+        if collection == "todos":
+            self.open_todos.pop(item.id, None)
+        self.timelines[collection].remove(item)
+        self.search[collection].remove(item)
 
 class DataManager:
-    def __init__(self):
-        self.events = load_json_file(EVENTS_FILE)
-        self.todos = load_json_file(TODOS_FILE)
-        self.ideas = load_json_file(IDEAS_FILE)
+    """
+    Per-user item indexes over a storage backend
+
+    Nothing is read at construction: the backend is created and loaded on
+    first use, and a user's indexes are built the first time that user is
+    accessed.
+    """
+    
+    def __init__(self, backend: Optional[StorageBackend] = None):
+        self._backend = backend
+        self._backend_lock = threading.Lock()
+        self._loaded = False
+        self._users: Dict[int, UserItems] = {}
+        # Only held while creating a user's entry
+        self._users_lock = threading.Lock()
+        # In-memory backends load everything at once; items wait here, grouped
+        # by user as (collection, item), until their user is first accessed
+        self._unindexed: Dict[int, List[Tuple[str, Item]]] = {}
+        self._flusher = None
+        # Called as listener(action, collection, item) after "add", "complete" and "remove"
+        self._listeners: List[Callable[[str, str, Item], None]] = []
+    
+    @property
+    def backend(self) -> StorageBackend:
+        """The storage backend, created and loaded on first access"""
+        if not self._loaded:
+            self.load()
+        return self._backend
+    
+    def load(self):
+        """Create and load the backend now instead of on first use"""
+        with self._backend_lock:
+            if self._loaded:
+                return
+            if self._backend is None:
+                self._backend = create_backend()
+            collections = self._backend.load()
+            for name in COLLECTIONS:
+                for item in collections.get(name, []):
+                    self._unindexed.setdefault(item.user_id, []).append((name, item))
+            self._loaded = True
+    
+    async def load_async(self):
+        """load() in a worker thread"""
+        if not self._loaded:
+            await asyncio.to_thread(self.load)
+    
+    async def load_user_async(self, user_id: int):
+        """Build a user's indexes in a worker thread; query backends read them over disk or network"""
+        user = self._users.get(user_id)
+        if user is None or not user.loaded:
+            await asyncio.to_thread(self._user_items, user_id)
+    
+    def _user_items(self, user_id: int) -> UserItems:
+        """Per-user index, built (or queried from the backend) on first access"""
+        user = self._users.get(user_id)
+        if user is None:
+            with self._users_lock:
+                user = self._users.setdefault(user_id, UserItems())
+        if not user.loaded:
+            backend = self.backend
+            with user.lock:
+                if not user.loaded:
+                    if backend.supports_queries:
+                        for name in COLLECTIONS:
+                            for item in backend.query_user_items(name, user_id):
+                                user.add(name, item)
+                    for name, item in self._unindexed.pop(user_id, ()):
+                        user.add(name, item)
+                    user.loaded = True
+        return user
+    
+    def add_listener(self, listener: Callable[[str, str, Item], None]):
+        """Get notified of every add, completion and removal"""
+        self._listeners.append(listener)
+    
+    def _notify(self, action: str, collection: str, item: Item):
+        for listener in self._listeners:
+            try:
+                listener(action, collection, item)
+            except Exception as e:
+                print(f"Listener error: {e}")
+    
+    def start_write_behind(self):
+        """Start background flushing if the backend buffers writes"""
+        if getattr(self.backend, "write_behind", False):
+            self._flusher = WriteBehindFlusher(self.backend, WRITE_BEHIND_MAX_DELAY_MS, WRITE_BEHIND_MAX_PENDING)
+            self._flusher.start()
+    
+    async def stop_write_behind(self):
+        """Stop background flushing and write out everything pending"""
+        if self._flusher is not None:
+            await self._flusher.stop()
+            self._flusher = None
     
-    def add_event(self, user_id: int, text: str, time_info: Dict) -> Dict:
+    def close(self):
+        """Flush pending writes and release the backend"""
+        if self._backend is not None:
+            self._backend.close()
+    
+    def _add(self, collection: str, item: Item) -> Item:
+        user = self._user_items(item.user_id)
+        with user.lock:
+            user.add(collection, item)
+            user.version += 1
+            self.backend.save(collection, item)
+        self._notify("add", collection, item)
+        return item
+    
+    def add_event(self, user_id: int, text: str, time_info: Dict) -> Item:
         """Add new event"""
-        event = {
-            "id": len(self.events) + 1,
-            "user_id": user_id,
-            "text": text,
-            "time_info": time_info,
-            "created_at": datetime.now().isoformat(),
-            "type": "event"
-        }
-        self.events.append(event)
-        save_json_file(EVENTS_FILE, self.events)
-        return event
+        event = Item(self.backend.next_id("events"), user_id, "event", text, due_timestamp(time_info),
+                     has_clock=has_clock(time_info))
+        return self._add("events", event)
     
-    def add_todo(self, user_id: int, text: str, time_info: Dict) -> Dict:
+    def add_todo(self, user_id: int, text: str, time_info: Dict) -> Item:
         """Add new todo"""
-        todo = {
-            "id": len(self.todos) + 1,
-            "user_id": user_id,
-            "text": text,
-            "time_info": time_info,
-            "created_at": datetime.now().isoformat(),
-            "completed": False,
-            "type": "todo"
-        }
-        self.todos.append(todo)
-        save_json_file(TODOS_FILE, self.todos)
-        return todo
+        todo = Item(self.backend.next_id("todos"), user_id, "todo", text, due_timestamp(time_info),
+                    has_clock=has_clock(time_info))
+        return self._add("todos", todo)
     
-    def add_idea(self, user_id: int, text: str, time_info: Dict) -> Dict:
+    def add_idea(self, user_id: int, text: str, time_info: Dict) -> Item:
         """Add new idea"""
-        idea = {
-            "id": len(self.ideas) + 1,
-            "user_id": user_id,
-            "text": text,
-            "time_info": time_info,
-            "created_at": datetime.now().isoformat(),
-            "type": "idea"
-        }
-        self.ideas.append(idea)
-        save_json_file(IDEAS_FILE, self.ideas)
-        return idea
+        idea = Item(self.backend.next_id("ideas"), user_id, "idea", text, due_timestamp(time_info),
+                    has_clock=has_clock(time_info))
+        return self._add("ideas", idea)
+    
+    def _find(self, user: UserItems, collection: str, item_id: int = None, description: str = None) -> Optional[Item]:
+        """Look up one of the user's items by ID or by (diacritic-insensitive) description"""
+        if item_id:
+            return getattr(user, collection).get(item_id)
+        if description:
+            return user.search[collection].find(description)
+        return None
     
     def complete_todo(self, user_id: int, todo_id: int = None, description: str = None) -> bool:
         """Mark todo as completed"""
-        if todo_id:
-            # Complete by ID
-            for todo in self.todos:
-                if todo["id"] == todo_id and todo["user_id"] == user_id:
-                    todo["completed"] = True
-                    todo["completed_at"] = datetime.now().isoformat()
-                    save_json_file(TODOS_FILE, self.todos)
-                    return True
-        elif description:
-            # Complete by description match
-            for todo in self.todos:
-                if (todo["user_id"] == user_id and 
-                    not todo["completed"] and 
-                    description.lower() in todo["text"].lower()):
-                    todo["completed"] = True
-                    todo["completed_at"] = datetime.now().isoformat()
-                    save_json_file(TODOS_FILE, self.todos)
-                    return True
-        return False
-    
-    def get_user_events(self, user_id: int) -> List[Dict]:
+        user = self._user_items(user_id)
+        with user.lock:
+            todo = self._find(user, "todos", todo_id, description)
+            if todo is None:
+                return False
+            todo.complete()
+            if user.open_todos.pop(todo.id, None) is not None:
+                user.timelines["todos"].remove(todo)
+                user.search["todos"].remove(todo)
+            user.version += 1
+            self.backend.save("todos", todo)
+        self._notify("complete", "todos", todo)
+        return True
+    
+    def _remove(self, collection: str, user_id: int, item_id: int = None, description: str = None,
+                only_if: Optional[Callable[[Item], bool]] = None) -> bool:
+        user = self._user_items(user_id)
+        with user.lock:
+            item = self._find(user, collection, item_id, description)
+            if item is None or (only_if is not None and not only_if(item)):
+                return False
+            user.remove(collection, item)
+            user.version += 1
+            self.backend.delete(collection, item)
+        self._notify("remove", collection, item)
+        return True
+    
+    def remove_event(self, user_id: int, event_id: int = None, description: str = None) -> bool:
+        """Delete an event by ID or description"""
+        return self._remove("events", user_id, event_id, description)
+    
+    def remove_idea(self, user_id: int, idea_id: int = None, description: str = None) -> bool:
+        """Delete an idea by ID or description"""
+        return self._remove("ideas", user_id, idea_id, description)
+    
+    def remove_item(self, collection: str, user_id: int, item_id: int,
+                    only_if: Optional[Callable[[Item], bool]] = None) -> bool:
+        """
+        Delete any item by ID (used when moving items to the archive)
+        With only_if, the item is kept unless only_if(current item) is true
+        """
+        return self._remove(collection, user_id, item_id, only_if=only_if)
+    
+    def get_version(self, user_id: int) -> int:
+        """Counter bumped by every change to the user's items"""
+        return self._user_items(user_id).version
+    
+    def get_user_events(self, user_id: int) -> List[Item]:
         """Get all events for user"""
-        return [e for e in self.events if e["user_id"] == user_id]
+        user = self._user_items(user_id)
+        with user.lock:
+            return list(user.events.values())
     
-    def get_user_todos(self, user_id: int, include_completed: bool = False) -> List[Dict]:
+    def get_user_todos(self, user_id: int, include_completed: bool = False) -> List[Item]:
         """Get todos for user"""
-        todos = [t for t in self.todos if t["user_id"] == user_id]
-        if not include_completed:
-            todos = [t for t in todos if not t["completed"]]
-        return todos
+        user = self._user_items(user_id)
+        with user.lock:
+            if include_completed:
+                return list(user.todos.values())
+            return list(user.open_todos.values())
     
-    def get_user_ideas(self, user_id: int) -> List[Dict]:
+    def get_user_ideas(self, user_id: int) -> List[Item]:
         """Get all ideas for user"""
-        return [i for i in self.ideas if i["user_id"] == user_id]
+        user = self._user_items(user_id)
+        with user.lock:
+            return list(user.ideas.values())
+    
+    def get_user_timeline(self, user_id: int, collection: str) -> Tuple[List[Item], List[Item]]:
+        """
+        A user's items ordered by due time, without parsing or sorting
+        Returns (timed items earliest first, untimed items); todos are open ones only
+        """
+        user = self._user_items(user_id)
+        with user.lock:
+            timeline = user.timelines[collection]
+            return timeline.timed(), timeline.untimed()
+    
+    def get_timeline_page(self, user_id: int, collections: Tuple[str, ...], offset: int,
+                          limit: int) -> Tuple[List[Item], int]:
+        """
+        One page of a user's timelines, read as one sequence: each collection
+        in turn, timed items earliest first, then untimed ones
+        Returns (items, total number of items); costs O(limit), not O(total)
+        """
+        user = self._user_items(user_id)
+        items = []
+        total = 0
+        with user.lock:
+            for name in collections:
+                timeline = user.timelines[name]
+                size = len(timeline)
+                if len(items) < limit and offset < total + size:
+                    items += timeline.page(max(0, offset - total), limit - len(items))
+                total += size
+        return items, total
+    
+    def get_upcoming_items(self, user_id: int, days_ahead: int = 7) -> List[Item]:
+        """Events, open todos and ideas due within days_ahead, earliest first"""
+        now = time.time()
+        end = now + days_ahead * 86400
+        user = self._user_items(user_id)
+        with user.lock:
+            ranges = [timeline.between(now, end) for timeline in user.timelines.values()]
+        return list(heapq.merge(*ranges, key=attrgetter("due_ts")))
+    
+    def iter_all_items(self):
+        """Iterate over every stored item of every user"""
+        return self.backend.iter_items()
+    
+    def item_counts(self) -> Dict[Tuple[str], int]:
+        """Items held in memory per collection (open todos counted separately)"""
+        counts = {(name,): 0 for name in COLLECTIONS}
+        counts[("open_todos",)] = 0
+        for user in list(self._users.values()):
+            for name in COLLECTIONS:
+                counts[(name,)] += len(getattr(user, name))
+            counts[("open_todos",)] += len(user.open_todos)
+        for items in list(self._unindexed.values()):
+            for name, item in items:
+                counts[(name,)] += 1
+                if name == "todos" and not item.completed:
+                    counts[("open_todos",)] += 1
+        return counts
     
-    def get_all_user_items(self, user_id: int) -> Dict[str, List[Dict]]:
+    def get_all_user_items(self, user_id: int) -> Dict[str, List[Item]]:
         """Get all items for user organized by type"""
         return {
             "events": self.get_user_events(user_id),
@@ -125,4 +396,5 @@ class DataManager:
         }
 
 # Global instance
-data_manager = DataManager()
\ No newline at end of file
+data_manager = DataManager()
+register_gauge("todolist_items", "Items held in memory", ("collection",), data_manager.item_counts)
@@ -0,0 +1,162 @@
+"""
+Persistent LRU/TTL cache for Gemini message analyses
+"""
+
+import asyncio
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from datetime import date
+from typing import Dict, Optional
+
+def normalize_text(text: str) -> str:
+    """Normalize a message so repeated phrasings share a cache entry"""
+    text = unicodedata.normalize("NFC", text)
+    return re.sub(r'\s+', ' ', text).strip()
+
+class AnalysisCache:
+    """
+    Size-bounded LRU cache with a TTL, backed by a SQLite file
+
+    Keys combine the current date with the normalized text because relative
+    expressions like "mai" resolve differently from one day to the next.
+    Recency is tracked in memory only; after a restart entries are reloaded
+    in insertion order. The file is opened and loaded by open_async, or
+    else on first use.
+    """
+
+    def __init__(self, path: str, max_size: int = 5000, ttl_seconds: int = 86400):
+        self.path = path
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # key -> (stored_at, value)
+        self._lock = threading.Lock()
+        self._db = None
+
+    def _open(self):
+        """Open the SQLite file and load it; call with the lock held"""
+        if self._db is not None:
+            return
+        directory = os.path.dirname(self.path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS analysis_cache ("
+            "key TEXT PRIMARY KEY, stored_at REAL NOT NULL, value TEXT NOT NULL)"
+        )
+        self._db.commit()
+        self._load()
+
+    def open(self):
+        """Open and load the SQLite file now instead of on first use"""
+        with self._lock:
+            self._open()
+
+    async def open_async(self):
+        """open() on a worker thread; async callers await this before get()"""
+        if self._db is None:
+            await asyncio.to_thread(self.open)
+
+    def _load(self):
+        """Load unexpired entries from disk, dropping anything past the TTL"""
+        cutoff = time.time() - self.ttl_seconds
+        self._db.execute("DELETE FROM analysis_cache WHERE stored_at < ?", (cutoff,))
+        self._db.commit()
+
+        rows = self._db.execute(
+            "SELECT key, stored_at, value FROM analysis_cache ORDER BY stored_at"
+        ).fetchall()
+        for key, stored_at, value in rows:
+            try:
+                self._entries[key] = (stored_at, json.loads(value))
+            except ValueError:
+                continue  # Skip corrupt rows
+
+        while len(self._entries) > self.max_size:
+            self._evict_oldest()
+        self._db.commit()
+
+    def _evict_oldest(self):
+        key, _ = self._entries.popitem(last=False)
+        self._db.execute("DELETE FROM analysis_cache WHERE key = ?", (key,))
+
+    @staticmethod
+    def make_key(text: str, day: Optional[date] = None) -> str:
+        """Build the cache key for a message on a given day (default today)"""
+        day = day or date.today()
+        return f"{day.isoformat()}|{normalize_text(text)}"
+
+    def get(self, text: str) -> Optional[Dict]:
+        """Return a copy of the cached analysis for text, or None"""
+        key = self.make_key(text)
+        with self._lock:
+            self._open()
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            stored_at, value = entry
+            if time.time() - stored_at > self.ttl_seconds:
+                # The row is overwritten by the next set, or purged by _load
+                del self._entries[key]
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return dict(value)
+
+    def set(self, text: str, value: Dict):
+        """
+        Store an analysis for text, evicting the least recently used entries
+        Writes and commits to SQLite; async callers should use set_async
+        """
+        key = self.make_key(text)
+        stored_at = time.time()
+        with self._lock:
+            self._open()
+            self._entries[key] = (stored_at, dict(value))
+            self._entries.move_to_end(key)
+            self._db.execute(
+                "INSERT OR REPLACE INTO analysis_cache (key, stored_at, value) VALUES (?, ?, ?)",
+                (key, stored_at, json.dumps(value, ensure_ascii=False))
+            )
+            while len(self._entries) > self.max_size:
+                self._evict_oldest()
+            self._db.commit()
+
+    async def set_async(self, text: str, value: Dict):
+        """set() on a worker thread, so the SQLite commit never blocks the event loop"""
+        await asyncio.to_thread(self.set, text, value)
+
+    def clear(self):
+        """Drop every entry, in memory and on disk"""
+        with self._lock:
+            self._open()
+            self._entries.clear()
+            self._db.execute("DELETE FROM analysis_cache")
+            self._db.commit()
+
+    def stats(self) -> Dict:
+        """Hit/miss counters and current size"""
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": len(self._entries),
+            "hit_rate": self.hits / total if total else 0.0
+        }
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
@@ -1,212 +1,356 @@
-import google.generativeai as genai
-from config import GEMINI_API_KEY
-from datetime import datetime, timedelta
+from config import (
+    GEMINI_API_KEY,
+    GEMINI_MAX_CONCURRENCY,
+    GEMINI_MODEL,
+    GEMINI_BATCH_WINDOW_MS,
+    GEMINI_BATCH_MAX_SIZE,
+    GEMINI_CACHE_PATH,
+    GEMINI_CACHE_SIZE,
+    GEMINI_CACHE_TTL_SECONDS,
+    LOCAL_CLASSIFIER_THRESHOLD
+)
+from gemini_cache import AnalysisCache
+from local_classifier import classifier
+from metrics import ANALYSIS_SOURCE, GEMINI_ERRORS, GEMINI_LATENCY, TIME_PARSE
+from time_tokenizer import day_table, next_weekday, parse_time, weekday_name
+import asyncio
 import json
-import re
 
-# Configure Gemini
-genai.configure(api_key=GEMINI_API_KEY)
-model = genai.GenerativeModel('gemini-pro')
+MESSAGE_TYPES = ('event', 'todo', 'idea')
 
-def parse_vietnamese_time(text):
+# Structured output schema for a single message analysis
+MESSAGE_ANALYSIS_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "type": {"type": "string", "enum": list(MESSAGE_TYPES)},
+        "has_time": {"type": "boolean"},
+        "datetime": {"type": "string", "nullable": True},
+        "display_time": {"type": "string"},
+        "parsed_text": {"type": "string"}
+    },
+    "required": ["type", "has_time", "datetime", "display_time", "parsed_text"]
+}
+
+# Plain dicts, accepted wherever google.generativeai takes a GenerationConfig
+GENERATION_CONFIG = {
+    "response_mime_type": "application/json",
+    "response_schema": MESSAGE_ANALYSIS_SCHEMA
+}
+
+BATCH_GENERATION_CONFIG = {
+    "response_mime_type": "application/json",
+    "response_schema": {
+        "type": "array",
+        "items": {
+            **MESSAGE_ANALYSIS_SCHEMA,
+            "properties": {"index": {"type": "integer"}, **MESSAGE_ANALYSIS_SCHEMA["properties"]},
+            "required": ["index", *MESSAGE_ANALYSIS_SCHEMA["required"]]
+        }
+    }
+}
+
+# Created by get_model on the first Gemini request; google.generativeai alone
+# takes most of a second to import, and messages handled locally never need it
+model = None
+
+def get_model():
+    """The Gemini model, configured on first use"""
+    global model
+    if model is None:
+        import google.generativeai as genai
+        genai.configure(api_key=GEMINI_API_KEY)
+        model = genai.GenerativeModel(GEMINI_MODEL, generation_config=GENERATION_CONFIG)
+    return model
+
+# Bounds the number of in-flight async Gemini requests
+_gemini_semaphore = asyncio.Semaphore(GEMINI_MAX_CONCURRENCY)
+
+# Repeated messages are answered from here without a network round trip
+analysis_cache = AnalysisCache(GEMINI_CACHE_PATH, GEMINI_CACHE_SIZE, GEMINI_CACHE_TTL_SECONDS)
+
+class RequestCoalescer:
     """
-    Parse Vietnamese time expressions using enhanced logic
-    Returns parsed datetime and cleaned text
+    Collects concurrent analysis requests into one batched Gemini call
+
+    A batch is sent when the first pending request has waited window_ms,
+    or as soon as max_batch_size requests are pending. Each caller gets
+    back its own element of the JSON array.
     """
-    # Always try simple parsing first for reliability
-    simple_result = fallback_time_parse(text)
     
-    # If simple parsing found time, use it
-    if simple_result["has_time"]:
-        return simple_result
+    def __init__(self, window_ms, max_batch_size):
+        self.window = window_ms / 1000
+        self.max_batch_size = max(1, max_batch_size)
+        self._pending = []  # (text, future)
+        self._flush_handle = None
+        # The loop only keeps weak references to tasks; hold sends until they finish
+        self._sending = set()
     
-    # Try Gemini as backup
-    current_date = datetime.now()
-    current_weekday_vn = get_vietnamese_weekday_name(current_date.weekday())
-    current_date_str = current_date.strftime("%d/%m/%Y")
+    async def submit(self, text):
+        """Queue text for the next batch and wait for its raw analysis dict"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((text, future))
+        
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.window, self._flush)
+        
+        return await future
+    
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.ensure_future(self._send(batch))
+            self._sending.add(task)
+            task.add_done_callback(self._sending.discard)
     
-    prompt = f"""
-Phân tích thời gian trong câu tiếng Việt. Hôm nay là {current_weekday_vn} ngày {current_date_str}.
+    async def _send(self, batch):
+        # Identical messages in the same window share one slot in the prompt
+        texts = list(dict.fromkeys(text for text, _ in batch))
+        call = "single" if len(texts) == 1 else "batch"
+        try:
+            async with _gemini_semaphore:
+                with GEMINI_LATENCY.time(call):
+                    if len(texts) == 1:
+                        response = await get_model().generate_content_async(_build_analysis_prompt(texts[0]))
+                        results = {texts[0]: json.loads(response.text)}
+                    else:
+                        response = await get_model().generate_content_async(
+                            _build_batch_prompt(texts),
+                            generation_config=BATCH_GENERATION_CONFIG
+                        )
+                        results = _split_batch_response(texts, json.loads(response.text))
+        except Exception as e:
+            GEMINI_ERRORS.inc(call)
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        
+        for text, future in batch:
+            if future.done():
+                continue
+            if text in results:
+                future.set_result(results[text])
+            else:
+                future.set_exception(ValueError("missing from batched Gemini response"))
 
-Câu: "{text}"
+def _split_batch_response(texts, results):
+    """Map a batched JSON array back to its messages by index"""
+    by_text = {}
+    for position, result in enumerate(results):
+        if not isinstance(result, dict):
+            continue
+        index = result.get("index", position)
+        if isinstance(index, int) and 0 <= index < len(texts):
+            by_text[texts[index]] = result
+    return by_text
+
+coalescer = RequestCoalescer(GEMINI_BATCH_WINDOW_MS, GEMINI_BATCH_MAX_SIZE)
+
+def _analysis_instructions():
+    """Shared instructions for single and batched analysis prompts"""
+    return f"""
+Phân loại và phân tích thời gian trong câu tiếng Việt. Hôm nay là {day_table().today_display}.
 
-QUAN TRỌNG: Chỉ trả về JSON, không giải thích gì thêm.
+Loại (type):
+- "event": Sự kiện, cuộc họp, lịch hẹn (có thời gian cụ thể)
+- "todo": Công việc cần làm, nhiệm vụ
+- "idea": Ý tưởng, ghi chú chung, không phải công việc cụ thể
 
-Format JSON:
-{{
-    "has_time": true/false,
-    "datetime": "YYYY-MM-DD HH:MM",
-    "display_time": "thứ X ngày DD/MM",
-    "parsed_text": "text sau khi bỏ thời gian"
-}}
+Thời gian:
+- "datetime": "YYYY-MM-DD HH:MM", null nếu không có thời gian
+- "display_time": "thứ X ngày DD/MM", rỗng nếu không có thời gian
+- "parsed_text": text sau khi bỏ thời gian
 
 Ví dụ:
-- "thứ 4 liên hệ gửi mèo" → {{"has_time": true, "datetime": "2025-08-06 09:00", "display_time": "thứ 4 ngày 06/08", "parsed_text": "liên hệ gửi mèo"}}
-- "7/8 tiêm mèo" → {{"has_time": true, "datetime": "2025-08-07 09:00", "display_time": "thứ 4 ngày 07/08", "parsed_text": "tiêm mèo"}}
+- "thứ 4 liên hệ gửi mèo" → {{"type": "todo", "has_time": true, "datetime": "2025-08-06 09:00", "display_time": "thứ 4 ngày 06/08", "parsed_text": "liên hệ gửi mèo"}}
+- "7/8 tiêm mèo" → {{"type": "event", "has_time": true, "datetime": "2025-08-07 09:00", "display_time": "thứ 4 ngày 07/08", "parsed_text": "tiêm mèo"}}
+- "ý tưởng app mới" → {{"type": "idea", "has_time": false, "datetime": null, "display_time": "", "parsed_text": "ý tưởng app mới"}}
 """
 
-    try:
-        response = model.generate_content(prompt)
-        clean_response = response.text.strip()
-        # Remove markdown code blocks if present
-        if clean_response.startswith('```'):
-            clean_response = clean_response.split('\n', 1)[1]
-        if clean_response.endswith('```'):
-            clean_response = clean_response.rsplit('\n', 1)[0]
-        
-        result = json.loads(clean_response)
-        return result
-    except Exception as e:
-        print(f"Gemini parsing error: {e}")
-        return simple_result
+def _build_analysis_prompt(text):
+    """Build the single Gemini prompt for classification and time parsing"""
+    return _analysis_instructions() + f"""
+Câu: "{text}"
+"""
 
-def fallback_time_parse(text):
-    """Enhanced fallback parser for Vietnamese time"""
-    has_time = False
-    parsed_text = text
-    display_time = ""
-    datetime_str = None
+def _build_batch_prompt(texts):
+    """Build one prompt that analyzes several messages, answered as a JSON array"""
+    lines = "\n".join(f'[{index}] "{text}"' for index, text in enumerate(texts))
+    return _analysis_instructions() + f"""
+Phân tích từng câu dưới đây. Trả về mảng JSON, mỗi phần tử ứng với một câu và có "index" là số thứ tự của câu.
+
+{lines}
+"""
+
+def _merge_analysis(text, simple_result, result):
+    """
+    Combine the local time parse with Gemini's structured reply
+    The local parser wins for time when it found one
+    """
+    message_type = str(result.get("type", "")).strip().lower()
+    if message_type not in MESSAGE_TYPES:
+        message_type = 'idea'
+    
+    if simple_result["has_time"] or not result.get("has_time") or not result.get("datetime"):
+        time_info = simple_result
+    else:
+        time_info = {
+            "has_time": True,
+            "datetime": result["datetime"],
+            "display_time": result.get("display_time") or "",
+            "parsed_text": result.get("parsed_text") or text,
+            "original_time_expression": ""
+        }
     
-    current_date = datetime.now()
+    return {"type": message_type, **time_info}
+
+def _fallback_analysis(text, simple_result):
+    """Local-only analysis used when Gemini is unavailable"""
+    return {"type": fallback_classify(text), **simple_result}
+
+def _local_analysis(text):
+    """
+    Analyze a message without Gemini when the local classifier is confident
+    Returns None when Gemini should be asked
+    """
+    message_type, confidence = classifier.classify(text)
+    if confidence < LOCAL_CLASSIFIER_THRESHOLD:
+        return None
+    return {"type": message_type, **fallback_time_parse(text)}
+
+def analyze_message(text):
+    """
+    Classify a message and parse its time with at most one Gemini call
+    Obvious messages are handled locally, repeated ones come from the cache
+    Returns the time_info fields plus 'type'
+    """
+    local = _local_analysis(text)
+    if local is not None:
+        ANALYSIS_SOURCE.inc("local")
+        TIME_PARSE.inc("local")
+        return local
     
-    # Pattern matching for Vietnamese time expressions
-    text_lower = text.lower().strip()
+    cached = analysis_cache.get(text)
+    if cached is not None:
+        ANALYSIS_SOURCE.inc("cache")
+        TIME_PARSE.inc("cache")
+        return cached
     
-    # 1. Weekday patterns (thứ 2, thứ 3, etc.)
-    weekday_match = re.search(r'thứ\s+([2-7])', text_lower)
-    if weekday_match:
-        weekday_num = int(weekday_match.group(1)) - 2  # Convert to 0-6 (Mon-Sun)
-        next_date = get_next_weekday(weekday_num)
-        
-        has_time = True
-        datetime_str = next_date.strftime("%Y-%m-%d 09:00")  # Default to 9 AM
-        display_time = f"{get_vietnamese_weekday_name(weekday_num)} ngày {next_date.strftime('%d/%m')}"
-        parsed_text = re.sub(r'thứ\s+[2-7]', '', text, flags=re.IGNORECASE).strip()
+    simple_result = fallback_time_parse(text)
+    try:
+        with GEMINI_LATENCY.time("sync"):
+            response = get_model().generate_content(_build_analysis_prompt(text))
+        analysis = _merge_analysis(text, simple_result, json.loads(response.text))
+    except Exception as e:
+        print(f"Gemini analysis error: {e}")
+        GEMINI_ERRORS.inc("sync")
+        ANALYSIS_SOURCE.inc("fallback")
+        TIME_PARSE.inc("local")
+        return _fallback_analysis(text, simple_result)
     
-    # 2. Sunday pattern
-    elif re.search(r'chủ\s*nhật', text_lower):
-        next_date = get_next_weekday(6)  # Sunday = 6
-        has_time = True
-        datetime_str = next_date.strftime("%Y-%m-%d 09:00")
-        display_time = f"chủ nhật ngày {next_date.strftime('%d/%m')}"
-        parsed_text = re.sub(r'chủ\s*nhật', '', text, flags=re.IGNORECASE).strip()
+    ANALYSIS_SOURCE.inc("gemini")
+    # The local parse wins whenever it found a time (see _merge_analysis)
+    TIME_PARSE.inc("local" if simple_result["has_time"] else "gemini")
+    analysis_cache.set(text, analysis)
+    return analysis
+
+async def analyze_message_async(text):
+    """
+    Async version of analyze_message for use inside handlers
+    Concurrent calls are coalesced into batched Gemini requests
+    """
+    local = _local_analysis(text)
+    if local is not None:
+        ANALYSIS_SOURCE.inc("local")
+        TIME_PARSE.inc("local")
+        return local
     
-    # 3. Date patterns (7/8, ngày 7/8, 19/10)
-    date_match = re.search(r'(?:ngày\s+)?(\d{1,2})/(\d{1,2})(?:/(\d{4}))?', text)
-    if date_match:
-        day = int(date_match.group(1))
-        month = int(date_match.group(2))
-        year = int(date_match.group(3)) if date_match.group(3) else current_date.year
-        
-        try:
-            target_date = datetime(year, month, day)
-            # If date is in the past, assume next year
-            if target_date.date() < current_date.date():
-                target_date = datetime(year + 1, month, day)
-            
-            has_time = True
-            datetime_str = target_date.strftime("%Y-%m-%d 09:00")
-            weekday_vn = get_vietnamese_weekday_name(target_date.weekday())
-            display_time = f"{weekday_vn} ngày {target_date.strftime('%d/%m')}"
-            parsed_text = re.sub(r'(?:ngày\s+)?\d{1,2}/\d{1,2}(?:/\d{4})?', '', text).strip()
-        except ValueError:
-            pass  # Invalid date
+    # Only the first call waits, for the file to be loaded off the event loop
+    await analysis_cache.open_async()
+    cached = analysis_cache.get(text)
+    if cached is not None:
+        ANALYSIS_SOURCE.inc("cache")
+        TIME_PARSE.inc("cache")
+        return cached
     
-    # 4. Time patterns (5h, 14h30, 9h sáng)
-    elif re.search(r'\d{1,2}h(?:\d{2})?', text_lower):
-        time_match = re.search(r'(\d{1,2})h(\d{2})?(?:\s*(sáng|chiều|tối))?', text_lower)
-        if time_match:
-            hour = int(time_match.group(1))
-            minute = int(time_match.group(2)) if time_match.group(2) else 0
-            period = time_match.group(3)
-            
-            # Adjust hour based on period
-            if period == 'chiều' and hour < 12:
-                hour += 12
-            elif period == 'tối' and hour < 12:
-                hour += 12
-            
-            has_time = True
-            datetime_str = current_date.strftime(f"%Y-%m-%d {hour:02d}:{minute:02d}")
-            display_time = f"hôm nay {hour:02d}:{minute:02d}"
-            parsed_text = re.sub(r'\d{1,2}h(?:\d{2})?(?:\s*(?:sáng|chiều|tối))?', '', text, flags=re.IGNORECASE).strip()
+    simple_result = fallback_time_parse(text)
+    try:
+        analysis = _merge_analysis(text, simple_result, await coalescer.submit(text))
+    except Exception as e:
+        print(f"Gemini analysis error: {e}")
+        ANALYSIS_SOURCE.inc("fallback")
+        TIME_PARSE.inc("local")
+        return _fallback_analysis(text, simple_result)
     
-    # 5. Relative time (mai, ngày mai, hôm nay)
-    elif re.search(r'(?:ngày\s+)?mai', text_lower):
-        tomorrow = current_date + timedelta(days=1)
-        has_time = True
-        datetime_str = tomorrow.strftime("%Y-%m-%d 09:00")
-        weekday_vn = get_vietnamese_weekday_name(tomorrow.weekday())
-        display_time = f"{weekday_vn} ngày {tomorrow.strftime('%d/%m')} (mai)"
-        parsed_text = re.sub(r'(?:ngày\s+)?mai', '', text, flags=re.IGNORECASE).strip()
+    ANALYSIS_SOURCE.inc("gemini")
+    # The local parse wins whenever it found a time (see _merge_analysis)
+    TIME_PARSE.inc("local" if simple_result["has_time"] else "gemini")
+    await analysis_cache.set_async(text, analysis)
+    return analysis
+
+def _time_info(analysis):
+    """Strip the classification from an analysis result"""
+    return {key: value for key, value in analysis.items() if key != "type"}
+
+def parse_vietnamese_time(text):
+    """
+    Parse Vietnamese time expressions using enhanced logic
+    Returns parsed datetime and cleaned text
+    """
+    # Always try simple parsing first for reliability
+    simple_result = fallback_time_parse(text)
     
-    elif re.search(r'hôm\s+nay', text_lower):
-        has_time = True
-        datetime_str = current_date.strftime("%Y-%m-%d 09:00")
-        display_time = "hôm nay"
-        parsed_text = re.sub(r'hôm\s+nay', '', text, flags=re.IGNORECASE).strip()
+    # If simple parsing found time, use it
+    if simple_result["has_time"]:
+        TIME_PARSE.inc("local")
+        return simple_result
     
-    # Clean up parsed text
-    parsed_text = re.sub(r'\s+', ' ', parsed_text).strip()
+    return _time_info(analyze_message(text))
+
+async def parse_vietnamese_time_async(text):
+    """Async version of parse_vietnamese_time"""
+    simple_result = fallback_time_parse(text)
+    if simple_result["has_time"]:
+        TIME_PARSE.inc("local")
+        return simple_result
     
-    return {
-        "has_time": has_time,
-        "datetime": datetime_str,
-        "display_time": display_time,
-        "parsed_text": parsed_text,
-        "original_time_expression": ""
-    }
+    return _time_info(await analyze_message_async(text))
+
+def fallback_time_parse(text):
+    """Local parser for Vietnamese time (single-pass tokenizer, see time_tokenizer.py)"""
+    return parse_time(text)
 
 def get_vietnamese_weekday_name(weekday_num):
     """Get Vietnamese weekday name from number (0=Monday)"""
-    names = {
-        0: "thứ 2",
-        1: "thứ 3", 
-        2: "thứ 4",
-        3: "thứ 5",
-        4: "thứ 6",
-        5: "thứ 7",
-        6: "chủ nhật"
-    }
-    return names.get(weekday_num, f"thứ {weekday_num + 2}")
+    return weekday_name(weekday_num)
 
 def get_next_weekday(weekday):
-    """Get next occurrence of a weekday (0=Monday, 6=Sunday)"""
-    current = datetime.now()
-    days_ahead = weekday - current.weekday()
-    if days_ahead <= 0:  # Target day already happened this week
-        days_ahead += 7
-    return current + timedelta(days=days_ahead)
+    """Get the date of the next occurrence of a weekday (0=Monday, 6=Sunday)"""
+    return next_weekday(weekday)
+
+def fallback_classify(text):
+    """Simple keyword classification used when Gemini is unavailable"""
+    text_lower = text.lower()
+    if any(word in text_lower for word in ['event', 'meeting', 'cuộc họp', 'hẹn']):
+        return 'event'
+    elif any(word in text_lower for word in ['todo', 'làm', 'dọn', 'mua', 'task']):
+        return 'todo'
+    else:
+        return 'idea'
 
 def classify_message_type(text):
     """
     Use Gemini to classify message type
     Returns: 'event', 'todo', 'idea'
     """
-    prompt = f"""
-Phân loại câu sau đây thuộc loại nào:
-"{text}"
+    return analyze_message(text)["type"]
 
-Loại:
-- "event": Sự kiện, cuộc họp, lịch hẹn (có thời gian cụ thể)
-- "todo": Công việc cần làm, nhiệm vụ
-- "idea": Ý tưởng, ghi chú chung, không phải công việc cụ thể
-
-Trả về chỉ một từ: event, todo, hoặc idea
-"""
-
-    try:
-        response = model.generate_content(prompt)
-        result = response.text.strip().lower()
-        if result in ['event', 'todo', 'idea']:
-            return result
-        return 'idea'  # default
-    except:
-        # Simple fallback classification
-        text_lower = text.lower()
-        if any(word in text_lower for word in ['event', 'meeting', 'cuộc họp', 'hẹn']):
-            return 'event'
-        elif any(word in text_lower for word in ['todo', 'làm', 'dọn', 'mua', 'task']):
-            return 'todo'
-        else:
-            return 'idea'
\ No newline at end of file
+async def classify_message_type_async(text):
+    """Async version of classify_message_type"""
+    return (await analyze_message_async(text))["type"]
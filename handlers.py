@@ -1,21 +1,36 @@
+import asyncio
 from datetime import datetime
-from telegram import Update
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Update
+from telegram.error import BadRequest
 from telegram.ext import ContextTypes
-from config import ALLOWED_USERS
-from gemini_service import parse_vietnamese_time, classify_message_type
+from config import ADMIN_USERS, ALLOWED_USERS, LIST_PAGE_SIZE, RENDER_CACHE_SIZE
+from archive import archived_ts, item_archive
+from gemini_service import analyze_message_async
 from data_storage import data_manager
+from metrics import format_stats, register_gauge, track_handler
+from render_cache import RenderCache
+from time_tokenizer import day_table
+from typing import List, Optional, Tuple
 import re
 
+# Unchanged /list and /idea pages are answered from here
+render_cache = RenderCache(RENDER_CACHE_SIZE)
+register_gauge("todolist_render_cache", "Rendered page cache lookups", ("result",),
+               lambda: {("hit",): render_cache.hits, ("miss",): render_cache.misses})
+
 def check_user_access(func):
     """Decorator to check if user is allowed"""
     async def wrapper(update: Update, context: ContextTypes.DEFAULT_TYPE):
         user_id = str(update.effective_user.id)
         if ALLOWED_USERS and ALLOWED_USERS[0] and user_id not in ALLOWED_USERS:
-            await update.message.reply_text("❌ Bạn không có quyền sử dụng bot này.")
+            await update.effective_message.reply_text("❌ Bạn không có quyền sử dụng bot này.")
             return
+        # The handlers read the user's items synchronously; fetch them off the loop first
+        await data_manager.load_user_async(update.effective_user.id)
         return await func(update, context)
     return wrapper
 
+@track_handler("start")
 @check_user_access
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Start command handler"""
@@ -39,13 +54,14 @@ Chào mừng! Tôi có thể giúp bạn:
 🎯 **Commands:**
 - `/idea` - Xem tất cả events và ideas
 - `/list` - Xem todolist
-- `/todone [mô tả]` - Hoàn thành task
+- `/todone [mô tả]` - Hoàn thành task (gõ không dấu cũng được)
 - `/help` - Trợ giúp
 
 🧠 Tôi hiểu thời gian tiếng Việt: thứ 6, ngày 19/10, 5h, mai, v.v.
 """
     await update.message.reply_text(welcome_message, parse_mode='Markdown')
 
+@track_handler("help")
 @check_user_access
 async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Enhanced help command"""
@@ -81,6 +97,9 @@ Bot sẽ tự động hiểu bạn muốn thêm gì!
 • `/idea` - Xem tất cả events & ideas
 • `/list` - Xem todolist hiện tại
 • `/todone [mô tả]` - Hoàn thành task
+• `/eventdone [mô tả]` - Xóa event
+• `/ideadone [mô tả]` - Xóa idea
+• `/archive [YYYY-MM]` - Xem todos đã xong & events đã qua được lưu trữ
 
 📝 **Ví dụ sử dụng:**
 1. Gửi: `event thứ 6 thợ lắp đồ`
@@ -101,17 +120,17 @@ Bot sẽ tự động hiểu bạn muốn thêm gì!
 """
     await update.message.reply_text(help_text, parse_mode='Markdown')
 
+@track_handler("message")
 @check_user_access
 async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle natural language messages"""
     text = update.message.text.strip()
     user_id = update.effective_user.id
     
-    # Parse time information
-    time_info = parse_vietnamese_time(text)
-    
-    # Classify message type
-    message_type = classify_message_type(text)
+    # Classify and parse time in a single Gemini round trip
+    analysis = await analyze_message_async(text)
+    message_type = analysis.pop("type")
+    time_info = analysis
     
     # Clean text for storage
     clean_text = time_info.get("parsed_text", text)
@@ -136,145 +155,152 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
     response += f"📝 {clean_text}\n"
     if time_info.get("has_time"):
         response += f"⏰ {time_display}\n"
-    response += f"🆔 ID: {item['id']}"
+    response += f"🆔 ID: {item.id}"
     
     await update.message.reply_text(response, parse_mode='Markdown')
 
-@check_user_access
-async def idea_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """View all events and ideas sorted by time"""
-    user_id = update.effective_user.id
-    all_items = data_manager.get_all_user_items(user_id)
+def _page_keyboard(view: str, offset: int, total: int) -> Optional[InlineKeyboardMarkup]:
+    """Prev/next buttons whose callback data is the view and the page offset"""
+    buttons = []
+    if offset > 0:
+        buttons.append(InlineKeyboardButton("◀️ Trước", callback_data=f"{view}:{max(0, offset - LIST_PAGE_SIZE)}"))
+    if offset + LIST_PAGE_SIZE < total:
+        buttons.append(InlineKeyboardButton("Sau ▶️", callback_data=f"{view}:{offset + LIST_PAGE_SIZE}"))
+    return InlineKeyboardMarkup([buttons]) if buttons else None
+
+def _page_footer(offset: int, total: int) -> str:
+    pages = (total + LIST_PAGE_SIZE - 1) // LIST_PAGE_SIZE
+    return f"📄 Trang {offset // LIST_PAGE_SIZE + 1}/{pages}\n" if pages > 1 else ""
+
+def _clamp_offset(offset: int, total: int) -> int:
+    """Snap to a page boundary that still exists (items may have been removed)"""
+    offset = max(0, offset) // LIST_PAGE_SIZE * LIST_PAGE_SIZE
+    if offset >= total:
+        offset = max(0, (total - 1) // LIST_PAGE_SIZE * LIST_PAGE_SIZE)
+    return offset
+
+def _cached_page(command: str, user_id: int, offset: int, render) -> Tuple[str, Optional[InlineKeyboardMarkup]]:
+    return render_cache.get_or_render(
+        user_id, command, offset, data_manager.get_version(user_id), day_table().day,
+        lambda: render(user_id, offset)
+    )
+
+def render_idea_page(user_id: int, offset: int = 0) -> Tuple[str, Optional[InlineKeyboardMarkup]]:
+    """One page of events then ideas, each timed first; returns (text, keyboard)"""
+    return _cached_page("idea", user_id, offset, _render_idea_page)
+
+def render_list_page(user_id: int, offset: int = 0) -> Tuple[str, Optional[InlineKeyboardMarkup]]:
+    """One page of open todos, timed first; returns (text, keyboard)"""
+    return _cached_page("list", user_id, offset, _render_list_page)
+
+def _render_idea_page(user_id: int, offset: int) -> Tuple[str, Optional[InlineKeyboardMarkup]]:
+    items, total = data_manager.get_timeline_page(user_id, ("events", "ideas"), offset, LIST_PAGE_SIZE)
+    if offset and not items:
+        offset = _clamp_offset(offset, total)
+        items, total = data_manager.get_timeline_page(user_id, ("events", "ideas"), offset, LIST_PAGE_SIZE)
     
     response = "📋 **Events & Ideas** (sắp xếp theo thời gian)\n\n"
     
-    # Sort function for items
-    def get_sort_key(item):
-        time_info = item.get("time_info", {})
-        if time_info.get("has_time") and time_info.get("datetime"):
-            try:
-                return datetime.fromisoformat(time_info["datetime"])
-            except:
-                pass
-        # Items without time go to the end
-        return datetime.max
-    
-    # Events
-    if all_items["events"]:
-        sorted_events = sorted(all_items["events"], key=get_sort_key)
-        
-        # Separate timed and non-timed events
-        timed_events = [e for e in sorted_events if e["time_info"].get("has_time")]
-        no_time_events = [e for e in sorted_events if not e["time_info"].get("has_time")]
-        
-        response += "📅 **Events:**\n"
-        
-        # Timed events first
-        if timed_events:
-            response += "⏰ *Có thời gian:*\n"
-            for event in timed_events[-10:]:  # Last 10
-                time_display = event["time_info"].get("display_time", "")
-                response += f"• {event['text']}"
-                if time_display:
-                    response += f" - {time_display}"
-                response += f" (ID: {event['id']})\n"
-        
-        # Non-timed events
-        if no_time_events:
-            if timed_events:
-                response += "\n📝 *Chưa có thời gian:*\n"
-            for event in no_time_events[-5:]:  # Last 5
-                response += f"• {event['text']} (ID: {event['id']})\n"
-        
-        response += "\n"
-    
-    # Ideas
-    if all_items["ideas"]:
-        sorted_ideas = sorted(all_items["ideas"], key=get_sort_key)
-        
-        response += "💡 **Ideas:**\n"
-        for idea in sorted_ideas[-10:]:  # Last 10
-            time_display = idea["time_info"].get("display_time", "")
-            response += f"• {idea['text']}"
-            if idea["time_info"].get("has_time") and time_display:
-                response += f" - {time_display}"
-            response += f" (ID: {idea['id']})\n"
-        response += "\n"
-    
-    if not all_items["events"] and not all_items["ideas"]:
+    if not total:
         response += "Chưa có events hoặc ideas nào.\n"
         response += "Hãy thêm bằng cách gửi tin nhắn như: 'event thứ 6 thợ lắp đồ'\n\n"
     
+    # Section headers are printed where the item type or timed/untimed changes
+    section = None
+    for item in items:
+        if section is None or item.type != section[0]:
+            if section is not None:
+                response += "\n"
+            response += "📅 **Events:**\n" if item.type == "event" else "💡 **Ideas:**\n"
+        if item.type == "event" and (item.type, item.has_time) != section:
+            if section == ("event", True):
+                response += "\n"
+            response += "⏰ *Có thời gian:*\n" if item.has_time else "📝 *Chưa có thời gian:*\n"
+        response += f"• {item.text}"
+        if item.has_time:
+            response += f" - {item.display_time()}"
+        response += f" (ID: {item.id})\n"
+        section = (item.type, item.has_time)
+    if items:
+        response += "\n"
+    
+    response += _page_footer(offset, total)
     # Add removal instructions
     response += "🗑️ **Xóa items:**\n"
     response += "• `/eventdone [mô tả]` - xóa event\n" 
     response += "• `/ideadone [mô tả]` - xóa idea"
-    
-    await update.message.reply_text(response, parse_mode='Markdown')
+    return response, _page_keyboard("idea", offset, total)
 
-@check_user_access
-async def list_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """View todolist sorted by time"""
-    user_id = update.effective_user.id
-    todos = data_manager.get_user_todos(user_id)
+def _render_list_page(user_id: int, offset: int) -> Tuple[str, Optional[InlineKeyboardMarkup]]:
+    todos, total = data_manager.get_timeline_page(user_id, ("todos",), offset, LIST_PAGE_SIZE)
+    if offset and not todos:
+        offset = _clamp_offset(offset, total)
+        todos, total = data_manager.get_timeline_page(user_id, ("todos",), offset, LIST_PAGE_SIZE)
     
-    if not todos:
+    if not total:
         response = "📋 **Todolist trống**\n\n"
         response += "Thêm todo bằng cách gửi: 'todo dọn nhà 5h'"
-        await update.message.reply_text(response, parse_mode='Markdown')
-        return
-    
-    # Sort todos by datetime
-    def get_sort_key(todo):
-        time_info = todo.get("time_info", {})
-        if time_info.get("has_time") and time_info.get("datetime"):
-            try:
-                return datetime.fromisoformat(time_info["datetime"])
-            except:
-                pass
-        # Items without time go to the end
-        return datetime.max
-    
-    sorted_todos = sorted(todos, key=get_sort_key)
+        return response, None
     
     response = "📋 **Todolist** (sắp xếp theo thời gian)\n\n"
     
-    # Group by time status
-    timed_todos = []
-    no_time_todos = []
-    
-    for todo in sorted_todos:
-        if todo["time_info"].get("has_time"):
-            timed_todos.append(todo)
+    # Timed todos come first; a header starts each group on the page
+    timed = None
+    for todo in todos:
+        if todo.has_time != timed:
+            if timed is not None:
+                response += "\n"
+            response += "⏰ **Có thời gian:**\n" if todo.has_time else "📝 **Chưa có thời gian:**\n"
+            timed = todo.has_time
+        status = "☑️" if todo.completed else "⬜"
+        if todo.has_time:
+            response += f"{status} {todo.text} - {todo.display_time()} (ID: {todo.id})\n"
         else:
-            no_time_todos.append(todo)
+            response += f"{status} {todo.text} (ID: {todo.id})\n"
+    response += "\n"
     
-    # Show timed todos first
-    if timed_todos:
-        response += "⏰ **Có thời gian:**\n"
-        for todo in timed_todos:
-            status = "☑️" if todo["completed"] else "⬜"
-            time_display = todo["time_info"].get("display_time", "")
-            
-            response += f"{status} {todo['text']}"
-            if time_display:
-                response += f" - {time_display}"
-            response += f" (ID: {todo['id']})\n"
-        response += "\n"
-    
-    # Show non-timed todos
-    if no_time_todos:
-        response += "📝 **Chưa có thời gian:**\n"
-        for todo in no_time_todos:
-            status = "☑️" if todo["completed"] else "⬜"
-            response += f"{status} {todo['text']} (ID: {todo['id']})\n"
-        response += "\n"
-    
-    response += f"📊 Tổng: {len(todos)} tasks"
+    response += _page_footer(offset, total)
+    response += f"📊 Tổng: {total} tasks"
     response += "\n💡 Dùng `/todone [mô tả]` để hoàn thành task"
+    return response, _page_keyboard("list", offset, total)
+
+PAGE_RENDERERS = {"list": render_list_page, "idea": render_idea_page}
+
+@track_handler("idea")
+@check_user_access
+async def idea_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """View all events and ideas sorted by time, one page at a time"""
+    response, keyboard = render_idea_page(update.effective_user.id)
+    await update.message.reply_text(response, parse_mode='Markdown', reply_markup=keyboard)
+
+@track_handler("list")
+@check_user_access
+async def list_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """View todolist sorted by time, one page at a time"""
+    response, keyboard = render_list_page(update.effective_user.id)
+    await update.message.reply_text(response, parse_mode='Markdown', reply_markup=keyboard)
+
+@track_handler("page")
+@check_user_access
+async def page_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Prev/next buttons of /list and /idea: re-render the page in place"""
+    query = update.callback_query
+    view, _, offset = (query.data or "").partition(":")
+    renderer = PAGE_RENDERERS.get(view)
+    if renderer is None or not offset.isdigit():
+        await query.answer()
+        return
     
-    await update.message.reply_text(response, parse_mode='Markdown')
+    response, keyboard = renderer(query.from_user.id, int(offset))
+    await query.answer()
+    try:
+        await query.edit_message_text(response, parse_mode='Markdown', reply_markup=keyboard)
+    except BadRequest as e:
+        # Pressing a button whose page hasn't changed
+        if "not modified" not in str(e).lower():
+            raise
 
+@track_handler("todone")
 @check_user_access
 async def todone_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Mark todo as completed"""
@@ -306,6 +332,7 @@ async def todone_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
             parse_mode='Markdown'
         )
 
+@track_handler("eventdone")
 @check_user_access
 async def eventdone_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Remove event by description"""
@@ -337,6 +364,7 @@ async def eventdone_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
             parse_mode='Markdown'
         )
 
+@track_handler("ideadone")
 @check_user_access
 async def ideadone_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Remove idea by description"""
@@ -368,6 +396,61 @@ async def ideadone_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
             parse_mode='Markdown'
         )
 
+def _read_archive(user_id: int, month: Optional[str], limit: int) -> Tuple[List[Tuple[str, list]], bool]:
+    """
+    Up to limit archived entries, newest month first
+    Months are streamed one at a time and reading stops once limit is reached;
+    returns ([(month, entries)...], whether more entries were left unread)
+    """
+    months = []
+    count = 0
+    for current, entries in item_archive.iter_user_items(user_id, month):
+        if count >= limit:
+            return months, True
+        entries.sort(key=lambda entry: archived_ts(entry[1]), reverse=True)
+        months.append((current, entries[:limit - count]))
+        count += len(months[-1][1])
+        if len(entries) > len(months[-1][1]):
+            return months, True
+    return months, False
+
+@track_handler("archive")
+@check_user_access
+async def archive_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Completed todos and past events moved to the archive, newest first"""
+    user_id = update.effective_user.id
+    month = context.args[0] if context.args else None
+    if month and not re.fullmatch(r"\d{4}-\d{2}", month):
+        await update.message.reply_text("❌ Tháng không hợp lệ. Dùng: `/archive 2024-10`", parse_mode='Markdown')
+        return
+    
+    # Decompressing archive files is disk work; keep it off the event loop
+    months, more = await asyncio.to_thread(_read_archive, user_id, month, LIST_PAGE_SIZE)
+    if not months:
+        where = f" tháng {month}" if month else ""
+        await update.message.reply_text(f"🗄️ Chưa có gì trong lưu trữ{where}.")
+        return
+    
+    response = "🗄️ **Lưu trữ** (mới nhất trước)\n"
+    for current, entries in months:
+        response += f"\n📆 **{current}:**\n"
+        for collection, item in entries:
+            day = datetime.fromtimestamp(archived_ts(item)).strftime("%d/%m/%Y")
+            icon = "✅" if collection == "todos" else "📅"
+            response += f"{icon} {item.text} - {day}\n"
+    if more:
+        hint = "" if month else " hoặc `/archive YYYY-MM` để xem một tháng"
+        response += f"\n… còn nữa, chỉ hiện {LIST_PAGE_SIZE} mục mới nhất{hint}"
+    await update.message.reply_text(response, parse_mode='Markdown')
+
+@track_handler("stats")
+async def stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Latency, Gemini and storage metrics (admins only)"""
+    if str(update.effective_user.id) not in ADMIN_USERS:
+        await update.message.reply_text("❌ Lệnh này chỉ dành cho admin.")
+        return
+    await update.message.reply_text(format_stats(), parse_mode='Markdown')
+
 # Additional helper functions
 async def add_event(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Explicit event adding (if needed)"""
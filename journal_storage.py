@@ -0,0 +1,147 @@
+"""
+Append-only journal storage engine
+
+Every mutation is one JSON line appended to the journal. The journal is
+periodically compacted in a background thread into snapshot files, which
+use the same format as the plain JSON storage (events.json, todos.json,
+ideas.json). Startup loads the snapshot and replays the journal tail.
+"""
+
+import json
+import os
+import threading
+from typing import Dict, List, Optional
+
+from models import Item
+from storage_backends import InMemoryBackend, ensure_parent_dir, load_json_file, save_json_file
+
+class JournalBackend(InMemoryBackend):
+    def __init__(self, snapshot_files: Dict[str, str], journal_path: str,
+                 compact_every: int = 1000, fsync: bool = False, ids_file: Optional[str] = None):
+        """snapshot_files maps collection name -> snapshot JSON path"""
+        super().__init__(ids_file)
+        self.snapshot_files = snapshot_files
+        self.journal_path = journal_path
+        self.compacting_path = journal_path + ".compacting"
+        self.compact_every = compact_every
+        self.fsync = fsync
+        self._lock = threading.Lock()
+        self._journal = None
+        self._mutations = 0
+        self._compaction = None
+
+    def load(self) -> Dict[str, List[Item]]:
+        """Load the snapshot and replay the journal on top of it"""
+        collections = {}
+        for name, path in self.snapshot_files.items():
+            collections[name] = {item["id"]: item for item in load_json_file(path)}
+
+        # A leftover .compacting file means a compaction was interrupted;
+        # replaying it again is harmless because every record is an upsert
+        for path in (self.compacting_path, self.journal_path):
+            self._mutations += _replay(path, collections)
+
+        return self._set_loaded({name: list(items.values()) for name, items in collections.items()})
+
+    def save(self, collection: str, item: Item):
+        self._items[collection][item.id] = item
+        self._append("put", collection, item.to_dict())
+
+    def delete(self, collection: str, item: Item):
+        self._items[collection].pop(item.id, None)
+        self._append("delete", collection, {"id": item.id})
+
+    def _append(self, op: str, collection: str, item: Dict):
+        """Record one mutation as a single journal line"""
+        line = json.dumps({"op": op, "collection": collection, "item": item}, ensure_ascii=False)
+        with self._lock:
+            if self._journal is None:
+                ensure_parent_dir(self.journal_path)
+                self._journal = open(self.journal_path, 'a', encoding='utf-8')
+            self._journal.write(line + "\n")
+            self._journal.flush()
+            if self.fsync:
+                os.fsync(self._journal.fileno())
+            self._mutations += 1
+            due = self._mutations >= self.compact_every
+
+        if due:
+            self.compact_in_background()
+
+    def compact_in_background(self):
+        """Start a compaction unless one is already running"""
+        with self._lock:
+            if self._compaction is not None and self._compaction.is_alive():
+                return
+            snapshot = self._rotate()
+            self._compaction = threading.Thread(target=self._write_snapshot, args=(snapshot,), daemon=True)
+            self._compaction.start()
+
+    def compact(self):
+        """Compact synchronously (used on shutdown)"""
+        with self._lock:
+            if self._compaction is not None:
+                self._compaction.join()
+            if not os.path.exists(self.journal_path) and not os.path.exists(self.compacting_path):
+                return  # Nothing new since the last snapshot
+            snapshot = self._rotate()
+        self._write_snapshot(snapshot)
+
+    def _rotate(self) -> Dict[str, List[Dict]]:
+        """
+        Move the journal aside and copy the collections it describes
+        Must be called with the lock held
+        """
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+        if os.path.exists(self.journal_path):
+            if os.path.exists(self.compacting_path):
+                # Previous compaction never finished; fold its records in first
+                with open(self.compacting_path, 'a', encoding='utf-8') as dest, \
+                        open(self.journal_path, 'r', encoding='utf-8') as src:
+                    dest.write(src.read())
+                os.remove(self.journal_path)
+            else:
+                os.replace(self.journal_path, self.compacting_path)
+        self._mutations = 0
+
+        # Serialize under the lock so later mutations can't race the writer
+        return {name: [item.to_dict() for item in items] for name, items in self.snapshot().items()}
+
+    def _write_snapshot(self, snapshot: Dict[str, List[Dict]]):
+        try:
+            for name, items in snapshot.items():
+                save_json_file(self.snapshot_files[name], items)
+            if os.path.exists(self.compacting_path):
+                os.remove(self.compacting_path)
+        except Exception as e:
+            print(f"Journal compaction error: {e}")
+
+    def close(self):
+        """Fold the journal into the snapshot files"""
+        self.compact()
+        with self._lock:
+            if self._journal is not None:
+                self._journal.close()
+                self._journal = None
+
+def _replay(path: str, collections: Dict[str, Dict[int, Dict]]) -> int:
+    """Apply journal records to collections; returns the number of records"""
+    if not os.path.exists(path):
+        return 0
+    count = 0
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # Torn final line after a crash
+            items = collections.setdefault(record["collection"], {})
+            item = record["item"]
+            if record["op"] == "delete":
+                items.pop(item["id"], None)
+            else:
+                items[item["id"]] = item
+            count += 1
+    return count
@@ -0,0 +1,168 @@
+"""
+Local message classifier: prefix/keyword rules plus a small naive-Bayes model
+
+Runs before Gemini and returns a confidence score so obvious messages
+("event ...", "todo ...", "mua sữa") never leave the process.
+
+The model learns from every item as it is added and is saved to a small
+JSON file (its size depends on the vocabulary, not the number of items),
+so startup loads the file instead of re-reading every stored item.
+"""
+
+import math
+import re
+import threading
+from collections import Counter
+from typing import Dict, Iterable, List, Tuple
+
+from storage_backends import load_json_file, save_json_file
+
+MESSAGE_TYPES = ('event', 'todo', 'idea')
+
+# A message starting with one of these is classified without further checks
+PREFIX_RULES = {
+    'event': ('event', 'meeting', 'cuộc họp', 'họp', 'lịch hẹn', 'hẹn', 'sự kiện'),
+    'todo': ('todo', 'task', 'việc cần làm', 'cần làm', 'phải làm'),
+    'idea': ('idea', 'ý tưởng', 'ghi nhớ', 'ghi chú', 'note', 'nhớ')
+}
+
+# Keywords anywhere in the message vote for a type
+KEYWORD_RULES = {
+    'event': ('meeting', 'cuộc họp', 'hẹn', 'gặp', 'tiệc', 'sinh nhật', 'khám'),
+    'todo': ('làm', 'dọn', 'mua', 'task', 'gửi', 'nộp', 'trả', 'sửa', 'đón', 'gọi'),
+    'idea': ('ý tưởng', 'ghi nhớ', 'có thể', 'nên thử')
+}
+
+PREFIX_CONFIDENCE = 0.97
+KEYWORD_CONFIDENCE = 0.85
+
+# The naive-Bayes model only votes once it has seen this many samples
+MIN_TRAINING_SAMPLES = 20
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased syllables plus syllable bigrams"""
+    words = _TOKEN_RE.findall(text.lower())
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+def _compile_phrases(phrases, anchored=False):
+    """One regex per type matching any of its phrases on word boundaries"""
+    alternatives = '|'.join(re.escape(phrase) for phrase in sorted(phrases, key=len, reverse=True))
+    start = '^' if anchored else r'(?<!\w)'
+    return re.compile(rf'{start}(?:{alternatives})(?!\w)')
+
+_PREFIX_PATTERNS = {t: _compile_phrases(p, anchored=True) for t, p in PREFIX_RULES.items()}
+_KEYWORD_PATTERNS = {t: _compile_phrases(k) for t, k in KEYWORD_RULES.items()}
+
+class LocalClassifier:
+    """Rule engine plus multinomial naive Bayes trained on stored items"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._doc_counts = Counter()
+        self._token_counts = {message_type: Counter() for message_type in MESSAGE_TYPES}
+        self._token_totals = Counter()
+        self._vocabulary = set()
+
+    @property
+    def samples(self) -> int:
+        return sum(self._doc_counts.values())
+
+    def learn(self, text: str, message_type: str):
+        """Add one labelled message to the naive-Bayes model"""
+        if message_type not in MESSAGE_TYPES:
+            return
+        tokens = tokenize(text)
+        with self._lock:
+            self._doc_counts[message_type] += 1
+            self._token_counts[message_type].update(tokens)
+            self._token_totals[message_type] += len(tokens)
+            self._vocabulary.update(tokens)
+
+    def train(self, samples: Iterable[Tuple[str, str]]):
+        """Train from (text, type) pairs, e.g. the items in DataManager"""
+        for text, message_type in samples:
+            self.learn(text, message_type)
+
+    def save(self, path: str):
+        """Write the model's counts to path"""
+        with self._lock:
+            data = {
+                "doc_counts": dict(self._doc_counts),
+                "token_counts": {t: dict(counts) for t, counts in self._token_counts.items()}
+            }
+        save_json_file(path, data)
+
+    def load(self, path: str) -> bool:
+        """Replace the model with the one saved at path; False if there is none"""
+        data = load_json_file(path)
+        if not isinstance(data, dict) or "token_counts" not in data:
+            return False
+        token_counts = {t: Counter(data["token_counts"].get(t, {})) for t in MESSAGE_TYPES}
+        with self._lock:
+            self._doc_counts = Counter(data.get("doc_counts", {}))
+            self._token_counts = token_counts
+            self._token_totals = Counter({t: sum(counts.values()) for t, counts in token_counts.items()})
+            self._vocabulary = set().union(*token_counts.values())
+        return True
+
+    def _rule_classify(self, text_lower: str) -> Tuple[str, float]:
+        for message_type, pattern in _PREFIX_PATTERNS.items():
+            if pattern.match(text_lower):
+                return message_type, PREFIX_CONFIDENCE
+
+        votes = [
+            message_type for message_type, pattern in _KEYWORD_PATTERNS.items()
+            if pattern.search(text_lower)
+        ]
+        if len(votes) == 1:
+            return votes[0], KEYWORD_CONFIDENCE
+        return 'idea', 0.0
+
+    def _bayes_probabilities(self, text: str) -> Dict[str, float]:
+        tokens = tokenize(text)
+        with self._lock:
+            total_docs = self.samples
+            vocabulary_size = len(self._vocabulary) + 1
+            log_scores = {}
+            for message_type in MESSAGE_TYPES:
+                # Laplace smoothing on both the prior and the token likelihoods
+                score = math.log((self._doc_counts[message_type] + 1) / (total_docs + len(MESSAGE_TYPES)))
+                counts = self._token_counts[message_type]
+                denominator = self._token_totals[message_type] + vocabulary_size
+                for token in tokens:
+                    score += math.log((counts[token] + 1) / denominator)
+                log_scores[message_type] = score
+
+        best = max(log_scores.values())
+        exp_scores = {t: math.exp(s - best) for t, s in log_scores.items()}
+        total = sum(exp_scores.values())
+        return {t: s / total for t, s in exp_scores.items()}
+
+    def classify(self, text: str) -> Tuple[str, float]:
+        """
+        Classify a message locally
+        Returns (type, confidence) with confidence in [0, 1]
+        """
+        text_lower = text.lower().strip()
+        rule_type, rule_confidence = self._rule_classify(text_lower)
+        if rule_confidence >= PREFIX_CONFIDENCE or self.samples < MIN_TRAINING_SAMPLES:
+            return rule_type, rule_confidence
+
+        probabilities = self._bayes_probabilities(text)
+        bayes_type = max(probabilities, key=probabilities.get)
+        bayes_confidence = probabilities[bayes_type]
+
+        if not rule_confidence:
+            return bayes_type, bayes_confidence
+        if rule_type == bayes_type:
+            # Independent agreement: combine as 1 - P(both wrong)
+            return rule_type, 1 - (1 - rule_confidence) * (1 - bayes_confidence)
+        # Disagreement: keep the stronger vote but discount it by the other
+        if rule_confidence >= bayes_confidence:
+            return rule_type, rule_confidence * (1 - bayes_confidence)
+        return bayes_type, bayes_confidence * (1 - rule_confidence)
+
+# Global instance
+classifier = LocalClassifier()
@@ -1,5 +1,33 @@
-from telegram.ext import Application, CommandHandler, MessageHandler, filters
-from config import TELEGRAM_BOT_TOKEN
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+from telegram.ext import Application, CallbackQueryHandler, CommandHandler, MessageHandler, filters
+from config import (
+    TELEGRAM_BOT_TOKEN,
+    MAX_CONCURRENT_UPDATES,
+    BOT_MODE,
+    WEBHOOK_URL,
+    WEBHOOK_LISTEN,
+    WEBHOOK_PORT,
+    WEBHOOK_PATH,
+    WEBHOOK_SECRET_TOKEN,
+    METRICS_LISTEN,
+    METRICS_PORT,
+    ARCHIVE_INTERVAL_HOURS,
+    ALLOWED_USERS,
+    CLASSIFIER_MODEL_PATH,
+    validate_config
+)
+from archive import retention_job
+from data_storage import data_manager
+from gemini_service import analysis_cache
+from local_classifier import classifier
+from metrics import MetricsServer
+from reminders import reminder_scheduler
+from update_processor import PerUserUpdateProcessor
 from handlers import (
     start,
     handle_message,
@@ -8,13 +36,142 @@ from handlers import (
     list_command,
     add_event,
     add_todo,
-    todone_command
+    todone_command,
+    eventdone_command,
+    ideadone_command,
+    page_callback,
+    archive_command,
+    stats_command
 )
 
+metrics_server = MetricsServer(METRICS_LISTEN, METRICS_PORT) if METRICS_PORT else None
+
+def _learn_added_item(action, collection, item):
+    """DataManager listener: keep the local classifier learning from new items"""
+    if action == "add":
+        classifier.learn(item.text, item.type)
+
+def _load_classifier():
+    """Restore the saved classifier model, or train it once from every stored item"""
+    if classifier.load(CLASSIFIER_MODEL_PATH):
+        return
+    print("🧠 Training the local classifier from stored items (one time)")
+    classifier.train((item.text, item.type) for item in data_manager.iter_all_items())
+    classifier.save(CLASSIFIER_MODEL_PATH)
+
+async def _start_classifier():
+    """
+    Load or train the model off the event loop, then learn from new items
+    The listener is added afterwards: load() replaces the model and train()
+    may already see items added meanwhile, so learning earlier would be lost
+    or counted twice. Until then the rules still classify.
+    """
+    try:
+        await asyncio.to_thread(_load_classifier)
+    finally:
+        data_manager.add_listener(_learn_added_item)
+
+async def post_init(application: Application):
+    """Start background storage tasks, reminders and archiving once the event loop is running"""
+    await data_manager.load_async()
+    data_manager.start_write_behind()
+    # Updates are served while the model and the analysis cache load
+    application.create_task(_start_classifier())
+    application.create_task(analysis_cache.open_async())
+    if application.job_queue is None:
+        print("⚠️ Reminders and archiving disabled: install python-telegram-bot[job-queue]")
+    else:
+        await reminder_scheduler.start(application.job_queue)
+        if ARCHIVE_INTERVAL_HOURS > 0:
+            # First sweep shortly after startup, then every ARCHIVE_INTERVAL_HOURS
+            application.job_queue.run_repeating(
+                retention_job, interval=ARCHIVE_INTERVAL_HOURS * 3600, first=60, name="archive"
+            )
+    if metrics_server is not None:
+        await metrics_server.start()
+
+async def post_shutdown(application: Application):
+    """Stop the metrics endpoint, save learned state and flush buffered writes"""
+    if metrics_server is not None:
+        await metrics_server.stop()
+    reminder_scheduler.save()
+    classifier.save(CLASSIFIER_MODEL_PATH)
+    await data_manager.stop_write_behind()
+
+def _import_times() -> list:
+    """(module, cumulative ms) for main's direct imports, from python -X importtime in a fresh process"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True
+    )
+    children = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if not cumulative.strip().isdigit():
+            continue  # Header line
+        # Nested imports are indented by two spaces per level and listed before their parent
+        depth = (len(name) - len(name.lstrip())) // 2
+        entry = (name.strip(), int(cumulative) / 1000)
+        if depth == 1:
+            children.append(entry)
+        elif depth == 0:
+            if entry[0] == "main":
+                return [entry] + children
+            children = []
+    return []
+
+def profile_startup():
+    """Report import and load timings, then exit without starting the bot"""
+    print("⏱️ Startup profile")
+    print("\n📦 Imports (cumulative, fresh process):")
+    for name, ms in sorted(_import_times(), key=lambda entry: -entry[1])[:15]:
+        print(f"  {ms:9.1f} ms  {name}")
+    
+    def stage(label, func):
+        start = time.perf_counter()
+        result = func()
+        print(f"  {(time.perf_counter() - start) * 1000:9.1f} ms  {label}")
+        return result
+    
+    print("\n🚀 Stages:")
+    stage("storage backend load", data_manager.load)
+    stage("reminder state load", reminder_scheduler.load)
+    if not stage("classifier model load", lambda: classifier.load(CLASSIFIER_MODEL_PATH)):
+        print("             (no saved model: the bot trains it in the background on first start)")
+    user_ids = [int(user) for user in ALLOWED_USERS if user.strip().isdigit()]
+    if user_ids:
+        stage("index first allowed user", lambda: data_manager.get_user_timeline(user_ids[0], "todos"))
+    import gemini_service
+    stage("Gemini client (import + configure)", gemini_service.get_model)
+    print(f"\n📊 {len(reminder_scheduler)} pending reminders, {classifier.samples} classifier samples")
+
 def main():
     """Main function to run the todolist bot"""
+    parser = argparse.ArgumentParser(description="Smart Todolist & Calendar Bot")
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="report import and load timings instead of starting the bot")
+    args = parser.parse_args()
+    if args.profile_startup:
+        profile_startup()
+        return
+    
+    validate_config()
+    
     # Create application
-    application = Application.builder().token(TELEGRAM_BOT_TOKEN).build()
+    builder = (
+        Application.builder()
+        .token(TELEGRAM_BOT_TOKEN)
+        # Different users are served concurrently, each user's updates in order
+        .concurrent_updates(PerUserUpdateProcessor(MAX_CONCURRENT_UPDATES))
+        .post_init(post_init)
+        .post_shutdown(post_shutdown)
+    )
+    if BOT_MODE == "webhook":
+        # Updates come in through webhook_server instead of the polling Updater
+        builder = builder.updater(None)
+    application = builder.build()
     
     # Add command handlers
     application.add_handler(CommandHandler("start", start))
@@ -22,6 +179,12 @@ def main():
     application.add_handler(CommandHandler("idea", idea_command))
     application.add_handler(CommandHandler("list", list_command))
     application.add_handler(CommandHandler("todone", todone_command))
+    application.add_handler(CommandHandler("eventdone", eventdone_command))
+    application.add_handler(CommandHandler("ideadone", ideadone_command))
+    application.add_handler(CommandHandler("archive", archive_command))
+    application.add_handler(CommandHandler("stats", stats_command))
+    # Prev/next buttons under /list and /idea
+    application.add_handler(CallbackQueryHandler(page_callback, pattern=r"^(list|idea):\d+$"))
     
     # Message handler for natural language processing (should be last)
     application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_message))
@@ -31,7 +194,21 @@ def main():
     print("📅 Supports Vietnamese time formats: 'thứ 6', 'ngày 19/10', etc.")
     print("📝 Features: Events, Ideas, Todos with AI parsing")
     print("🧠 Powered by Gemini AI for intelligent time parsing")
-    application.run_polling()
+    if BOT_MODE == "webhook":
+        from webhook_server import serve_webhook
+        asyncio.run(serve_webhook(
+            application,
+            WEBHOOK_URL,
+            WEBHOOK_LISTEN,
+            WEBHOOK_PORT,
+            WEBHOOK_PATH,
+            WEBHOOK_SECRET_TOKEN
+        ))
+    else:
+        application.run_polling()
+    
+    # Fold the storage journal into the snapshot files before exiting
+    data_manager.close()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
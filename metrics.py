@@ -0,0 +1,258 @@
+"""
+Latency and call metrics
+
+Counters and fixed-bucket histograms kept in memory. Recording is a bisect
+and a few additions under an uncontended lock, so it is cheap enough to
+wrap every handler and every Gemini call. The collected data is exposed as
+Prometheus text (render_prometheus, served by MetricsServer on the same
+Starlette/uvicorn stack as the webhook) and as a short
+summary for the admin /stats command (format_stats).
+"""
+
+import asyncio
+import threading
+import time
+from bisect import bisect_left
+from functools import wraps
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Upper bounds in seconds, from a dict lookup to a slow Gemini round trip
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def _label_text(label_names: Tuple[str, ...], labels: Tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{name}="{value}"' for name, value in zip(label_names, labels)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+class Counter:
+    def __init__(self, name: str, help_text: str, label_names: Tuple[str, ...] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels: str, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def values(self) -> Dict[Tuple[str, ...], float]:
+        with self._lock:
+            return dict(self._values)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        for labels, value in sorted(self.values().items()):
+            lines.append(f"{self.name}{_label_text(self.label_names, labels)} {value:g}")
+        return lines
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, label_names: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        # labels -> [count per bucket (last one is +Inf)..., sum]
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    def time(self, *labels: str):
+        """Context manager observing the duration of its block"""
+        return _Timer(self, labels)
+
+    def snapshot(self) -> Dict[Tuple[str, ...], List[float]]:
+        with self._lock:
+            return {labels: list(series) for labels, series in self._series.items()}
+
+    def quantile(self, series: List[float], q: float) -> float:
+        """Estimate a quantile from bucket counts (linear within a bucket)"""
+        counts = series[:-1]
+        total = sum(counts)
+        if not total:
+            return 0.0
+        rank = q * total
+        seen = 0
+        for index, count in enumerate(counts):
+            if count and seen + count >= rank:
+                lower = self.buckets[index - 1] if index else 0.0
+                if index >= len(self.buckets):
+                    return lower  # Beyond the last bucket; its lower bound is all we know
+                return lower + (self.buckets[index] - lower) * (rank - seen) / count
+            seen += count
+        return self.buckets[-1]
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for labels, series in sorted(self.snapshot().items()):
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), series[:-1]):
+                cumulative += count
+                le = f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{_label_text(self.label_names, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_label_text(self.label_names, labels)} {series[-1]:.6f}")
+            lines.append(f"{self.name}_count{_label_text(self.label_names, labels)} {cumulative}")
+        return lines
+
+class _Timer:
+    __slots__ = ("histogram", "labels", "start")
+
+    def __init__(self, histogram: Histogram, labels: Tuple[str, ...]):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.start, *self.labels)
+        return False
+
+HANDLER_LATENCY = Histogram("todolist_handler_seconds", "Time spent handling an update", ("command",))
+HANDLER_ERRORS = Counter("todolist_handler_errors_total", "Handlers that raised", ("command",))
+GEMINI_LATENCY = Histogram("todolist_gemini_seconds", "Gemini request latency", ("call",))
+GEMINI_ERRORS = Counter("todolist_gemini_errors_total", "Failed Gemini requests", ("call",))
+# How a message was analyzed: local classifier, cache, gemini, or the keyword fallback after a Gemini error
+ANALYSIS_SOURCE = Counter("todolist_analysis_total", "Message analyses by source", ("source",))
+# Where a message's time came from: the local parser, the analysis cache, or Gemini
+TIME_PARSE = Counter("todolist_time_parse_total", "Time parses by outcome", ("outcome",))
+STORAGE_FLUSH = Histogram("todolist_storage_flush_seconds", "Time to flush buffered storage writes", ("backend",))
+ARCHIVED = Counter("todolist_archived_total", "Items moved to the cold archive", ("collection",))
+
+ALL_METRICS = (HANDLER_LATENCY, HANDLER_ERRORS, GEMINI_LATENCY, GEMINI_ERRORS,
+               ANALYSIS_SOURCE, TIME_PARSE, STORAGE_FLUSH, ARCHIVED)
+
+# Gauges read at scrape time, e.g. item counts: name -> (help, callback returning {labels: value})
+_gauges: Dict[str, Tuple[str, Tuple[str, ...], Callable[[], Dict[Tuple[str, ...], float]]]] = {}
+
+def register_gauge(name: str, help_text: str, label_names: Tuple[str, ...],
+                   callback: Callable[[], Dict[Tuple[str, ...], float]]):
+    """Add a gauge whose values are computed when metrics are rendered"""
+    _gauges[name] = (help_text, label_names, callback)
+
+def track_handler(command: str):
+    """Decorator recording a handler's latency and errors under command"""
+    def decorator(func):
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            except Exception:
+                HANDLER_ERRORS.inc(command)
+                raise
+            finally:
+                HANDLER_LATENCY.observe(time.perf_counter() - start, command)
+        return wrapper
+    return decorator
+
+def render_prometheus() -> str:
+    """All metrics in the Prometheus text exposition format"""
+    lines = []
+    for metric in ALL_METRICS:
+        lines.extend(metric.render())
+    for name, (help_text, label_names, callback) in _gauges.items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} gauge")
+        try:
+            values = callback()
+        except Exception as e:
+            print(f"Metrics gauge {name} error: {e}")
+            continue
+        for labels, value in sorted(values.items()):
+            lines.append(f"{name}{_label_text(label_names, labels)} {value:g}")
+    return "\n".join(lines) + "\n"
+
+def _latency_lines(histogram: Histogram) -> List[str]:
+    lines = []
+    for labels, series in sorted(histogram.snapshot().items()):
+        count = sum(series[:-1])
+        p50 = histogram.quantile(series, 0.5) * 1000
+        p95 = histogram.quantile(series, 0.95) * 1000
+        lines.append(f"• {_code('/'.join(labels))}: {count} lần, p50 {p50:.1f}ms, p95 {p95:.1f}ms")
+    return lines
+
+def _count_line(counter: Counter) -> str:
+    values = counter.values()
+    return ", ".join(f"{_code('/'.join(labels))} {value:g}" for labels, value in sorted(values.items())) or "chưa có"
+
+def _code(text: str) -> str:
+    """Markdown code span, so underscores in metric names and labels are not read as italics"""
+    return f"`{text.replace('`', '')}`"
+
+def format_stats() -> str:
+    """Short human-readable summary for the /stats command"""
+    lines = ["📊 **Thống kê bot**", "", "⏱️ *Handlers:*"]
+    lines.extend(_latency_lines(HANDLER_LATENCY) or ["• chưa có"])
+    errors = HANDLER_ERRORS.values()
+    if errors:
+        lines.append(f"❌ Lỗi handler: {_count_line(HANDLER_ERRORS)}")
+    lines += ["", "🧠 *Gemini:*"]
+    lines.extend(_latency_lines(GEMINI_LATENCY) or ["• chưa gọi"])
+    if GEMINI_ERRORS.values():
+        lines.append(f"❌ Lỗi Gemini: {_count_line(GEMINI_ERRORS)}")
+    lines.append(f"🔎 Phân tích: {_count_line(ANALYSIS_SOURCE)}")
+    lines.append(f"🕐 Parse thời gian: {_count_line(TIME_PARSE)}")
+    lines += ["", "💾 *Storage:*"]
+    lines.extend(_latency_lines(STORAGE_FLUSH) or ["• chưa flush"])
+    if ARCHIVED.values():
+        lines.append(f"🗄️ Đã lưu trữ: {_count_line(ARCHIVED)}")
+    for name, (_, _, callback) in _gauges.items():
+        try:
+            values = callback()
+        except Exception:
+            continue
+        if values:
+            lines.append(f"📦 {_code(name)}: " + ", ".join(f"{_code('/'.join(labels))} {value:g}"
+                                                         for labels, value in sorted(values.items())))
+    return "\n".join(lines)
+
+class MetricsServer:
+    """GET /metrics as a Starlette app served by uvicorn on the bot's event loop"""
+
+    def __init__(self, listen: str, port: int):
+        self.listen = listen
+        self.port = port
+        self._server = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        # Imported here so that importing metrics stays cheap
+        import uvicorn
+        from starlette.applications import Starlette
+        from starlette.requests import Request
+        from starlette.responses import PlainTextResponse
+        from starlette.routing import Route
+        from webhook_server import EmbeddedServer
+
+        async def metrics(request: Request) -> PlainTextResponse:
+            return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+        app = Starlette(routes=[Route("/metrics", metrics, methods=["GET"])])
+        config = uvicorn.Config(app, host=self.listen, port=self.port, log_level="warning", lifespan="off")
+        self._server = EmbeddedServer(config)
+        self._task = asyncio.create_task(self._server.serve())
+        while not self._server.started:
+            if self._task.done():
+                self._task.result()  # Raises why startup failed (e.g. the port is taken)
+                return
+            await asyncio.sleep(0.01)
+        self.port = self._server.servers[0].sockets[0].getsockname()[1]
+        print(f"📈 Metrics on http://{self.listen}:{self.port}/metrics")
+
+    async def stop(self):
+        if self._task is not None:
+            self._server.should_exit = True
+            await self._task
+            self._task = None
@@ -0,0 +1,66 @@
+"""
+Copy all items from one storage backend to another
+
+Usage:
+    python migrate_storage.py --to sqlite                  # data/*.json + journal -> SQLite
+    python migrate_storage.py --from json --to sqlite
+    python migrate_storage.py --to sharded                 # data/*.json + journal -> data/users/<shard>/<user_id>.json
+    python migrate_storage.py --from sqlite --to supabase     # needs SUPABASE_URL/KEY
+
+Re-running is safe: the target's existing items are loaded first and
+migrated items are upserted into them by (collection, id).
+"""
+
+import argparse
+
+from storage_backends import COLLECTIONS
+
+def migrate(source_name: str, target_name: str) -> dict:
+    """Copy every collection from source to target; returns counts per collection"""
+    from data_storage import create_backend
+
+    source = create_backend(source_name)
+    target = create_backend(target_name)
+    try:
+        collections = source.load()
+        if source.supports_queries:
+            collections = {name: [] for name in COLLECTIONS}
+            for item in source.iter_items():
+                collections[item.type + "s"].append(item)
+
+        # In-memory targets rewrite whole files on close; without this, items
+        # already in the target would be dropped
+        target.load()
+        if hasattr(target, "write_behind"):
+            # File backends then write each file once, in close(), not once per save
+            target.write_behind = True
+        counts = {}
+        for name in COLLECTIONS:
+            items = collections.get(name, [])
+            if hasattr(target, "save_many"):
+                target.save_many(name, items)
+            else:
+                for item in items:
+                    target.save(name, item)
+            counts[name] = len(items)
+            # IDs of deleted or archived items stay used in the target too
+            target.skip_ids(name, source.last_id(name))
+        return counts
+    finally:
+        target.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Copy items between storage backends")
+    parser.add_argument("--from", dest="source", default="journal", help="source backend (default: journal)")
+    parser.add_argument("--to", dest="target", required=True, help="target backend, e.g. sqlite")
+    args = parser.parse_args()
+
+    if args.source == args.target:
+        parser.error("source and target backends must differ")
+
+    counts = migrate(args.source, args.target)
+    summary = ", ".join(f"{count} {name}" for name, count in counts.items())
+    print(f"✅ Migrated {summary} from {args.source} to {args.target}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""
+Compact in-memory item model
+
+Items used to be dicts holding a nested time_info dict with several
+redundant strings. Item keeps only what is needed: times are epoch
+seconds, display text is computed when rendering, and the type and
+user_id values are shared between items. to_dict/from_dict keep the
+stored JSON in the original format.
+"""
+
+import re
+import sys
+import time
+from datetime import datetime
+from typing import Dict, Optional
+
+from time_tokenizer import DEFAULT_HOUR, day_table, display_date
+
+# One shared int object per user instead of one per item
+_user_ids: Dict[int, int] = {}
+
+def _shared_user_id(user_id: int) -> int:
+    return _user_ids.setdefault(user_id, user_id)
+
+def due_timestamp(time_info: Optional[Dict]) -> Optional[int]:
+    """Parse an item's time_info into epoch seconds, or None if it has no usable time"""
+    if not time_info or not time_info.get("has_time"):
+        return None
+    value = time_info.get("datetime") or time_info.get("date_only")
+    if not value:
+        return None
+    try:
+        return int(datetime.fromisoformat(value).timestamp())
+    except (TypeError, ValueError):
+        return None
+
+_CLOCK_RE = re.compile(r"\d{1,2}:\d{2}")
+
+def has_clock(time_info: Optional[Dict]) -> bool:
+    """
+    Whether a time_info names a time of day, not just a day
+    Older time_info dicts have no has_clock flag; their display_time shows a
+    clock only when one was given, except that 09:00 (the default hour) was
+    also shown for date-only items for a while, so it is read as date-only
+    """
+    if not time_info:
+        return False
+    if "has_clock" in time_info:
+        return bool(time_info["has_clock"])
+    match = _CLOCK_RE.search(time_info.get("display_time") or "")
+    return match is not None and match.group() not in (f"{DEFAULT_HOUR}:00", f"{DEFAULT_HOUR:02d}:00")
+
+def _epoch(value) -> Optional[int]:
+    """ISO string (legacy) or number -> epoch seconds"""
+    if value is None or isinstance(value, (int, float)):
+        return None if value is None else int(value)
+    try:
+        return int(datetime.fromisoformat(value).timestamp())
+    except (TypeError, ValueError):
+        return None
+
+def _iso(ts: Optional[int]) -> Optional[str]:
+    return None if ts is None else datetime.fromtimestamp(ts).isoformat()
+
+def format_due(due_ts: int, with_clock: bool = True) -> str:
+    """
+    Vietnamese display text for a due time, relative to today, as the time
+    parser words it: "hôm nay", "thứ 7 ngày 18/10 (mai)", "thứ 6 ngày 24/10",
+    followed by the clock time only when one was given
+    """
+    dt = datetime.fromtimestamp(due_ts)
+    table = day_table()
+    day = dt.date()
+    if day == table.day:
+        text = "hôm nay"
+    elif day == table.relative[1][0]:
+        text = table.relative[1][1]
+    else:
+        text = display_date(day)
+    if with_clock:
+        text += f" {dt.strftime('%H:%M')}" if day == table.day else f" lúc {dt.strftime('%H:%M')}"
+    return text
+
+class Item:
+    """An event, todo or idea"""
+
+    __slots__ = ("id", "user_id", "type", "text", "due_ts", "created_at", "completed", "completed_at", "has_clock")
+
+    def __init__(self, id: int, user_id: int, type: str, text: str, due_ts: Optional[int] = None,
+                 created_at: Optional[int] = None, completed: bool = False,
+                 completed_at: Optional[int] = None, has_clock: bool = False):
+        self.id = id
+        self.user_id = _shared_user_id(user_id)
+        self.type = sys.intern(type)
+        self.text = text
+        self.due_ts = due_ts
+        self.created_at = int(time.time()) if created_at is None else created_at
+        self.completed = completed
+        self.completed_at = completed_at
+        # False when only a day was given (due_ts then holds the default hour)
+        self.has_clock = has_clock
+
+    def __repr__(self) -> str:
+        return f"Item({self.type} #{self.id} user={self.user_id} {self.text!r})"
+
+    @property
+    def has_time(self) -> bool:
+        return self.due_ts is not None
+
+    def display_time(self) -> str:
+        """Due time as shown to the user, or "" when untimed"""
+        return format_due(self.due_ts, self.has_clock) if self.due_ts is not None else ""
+
+    def complete(self):
+        self.completed = True
+        self.completed_at = int(time.time())
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "Item":
+        """Build an Item from its stored JSON form (any version)"""
+        time_info = data.get("time_info")
+        due_ts = data.get("due_ts")
+        if due_ts is None and "due_ts" not in data:
+            due_ts = due_timestamp(time_info)
+        return cls(
+            data["id"],
+            data["user_id"],
+            data["type"],
+            data["text"],
+            None if due_ts is None else int(due_ts),
+            _epoch(data.get("created_at")),
+            bool(data.get("completed", False)),
+            _epoch(data.get("completed_at")),
+            due_ts is not None and has_clock(time_info)
+        )
+
+    def to_dict(self) -> Dict:
+        """Stored JSON form, readable by code that predates Item"""
+        time_info = {"has_time": self.due_ts is not None, "parsed_text": self.text}
+        if self.due_ts is not None:
+            time_info["datetime"] = datetime.fromtimestamp(self.due_ts).strftime("%Y-%m-%d %H:%M")
+            time_info["display_time"] = self.display_time()
+            time_info["has_clock"] = self.has_clock
+        data = {
+            "id": self.id,
+            "user_id": self.user_id,
+            "text": self.text,
+            "time_info": time_info,
+            "due_ts": self.due_ts,
+            "created_at": _iso(self.created_at),
+            "type": self.type
+        }
+        if self.type == "todo":
+            data["completed"] = self.completed
+            if self.completed_at is not None:
+                data["completed_at"] = _iso(self.completed_at)
+        return data
@@ -0,0 +1,218 @@
+"""
+Reminders for timed events and open todos
+
+ReminderScheduler keeps one min-heap of (remind_at, collection, item_id)
+across all users and a single job on Application.job_queue set for the
+top of the heap, so it only wakes when the next reminder is due. Completed
+and removed items are dropped lazily: their heap entries are skipped when
+they reach the top.
+
+The state file holds the time up to which reminders have been sent and
+the pending reminders themselves, saved shortly after every change and on
+shutdown. The file is written from a snapshot in a worker thread, so the
+event loop only copies the list of pending items. On startup the heap is rebuilt from that file alone, so startup
+does not read the stored items, reminders survive restarts, and the ones
+missed while the bot was down are sent right away. A state file without
+pending reminders (written by an older version) is rebuilt once from the
+stored items.
+"""
+
+import asyncio
+import heapq
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from telegram.ext import ContextTypes, JobQueue
+
+from config import REMINDER_LEAD_MINUTES
+from data_storage import DATA_DIR, DataManager, data_manager
+from models import Item
+from storage_backends import load_json_file, save_json_file
+
+REMINDER_STATE_FILE = os.path.join(DATA_DIR, "reminders.json")
+
+# Item types that get reminders
+REMINDED_TYPES = ("event", "todo")
+# Seconds after a change before the pending reminders are written out
+STATE_SAVE_DELAY = 1
+
+def format_reminder(item: Item) -> str:
+    emoji = "📅" if item.type == "event" else "✅"
+    return (
+        f"⏰ **Nhắc nhở!**\n\n"
+        f"{emoji} {item.text}\n"
+        f"🕐 {item.display_time()}\n"
+        f"🆔 ID: {item.id}"
+    )
+
+class ReminderScheduler:
+    def __init__(self, data_manager: DataManager, state_path: str, lead_minutes: int = 0):
+        self.data_manager = data_manager
+        self.state_path = state_path
+        self.lead = lead_minutes * 60
+        self._heap: List[Tuple[int, str, int]] = []
+        # (collection, item_id) -> (remind_at, item); heap entries not in here are stale
+        self._pending: Dict[Tuple[str, int], Tuple[int, Item]] = {}
+        self._lock = threading.Lock()
+        self._job_queue: Optional[JobQueue] = None
+        self._job = None
+        self._job_at = None
+        self._loaded = False
+        self._sent_until = None
+        self._save_job = None
+        # Snapshots are numbered so an older one never overwrites a newer one
+        self._snapshots = 0
+        self._written = 0
+        self._write_lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def load(self):
+        """Rebuild the heap from the state file and start following changes"""
+        if self._loaded:
+            return
+        state = load_json_file(self.state_path)
+        if not isinstance(state, dict):
+            state = {}
+        # First run: only remind about what is still ahead
+        self._sent_until = state.get("sent_until") or time.time()
+        if "pending" in state:
+            items = (Item.from_dict(data) for data in state["pending"])
+        else:
+            print("⏰ Building reminder state from stored items (one time)")
+            items = self.data_manager.iter_all_items()
+
+        with self._lock:
+            for item in items:
+                entry = self._track(item, self._sent_until)
+                if entry is not None:
+                    self._heap.append(entry)
+            heapq.heapify(self._heap)
+        self.data_manager.add_listener(self._on_change)
+        self._loaded = True
+
+    async def start(self, job_queue: JobQueue):
+        """Load pending reminders (in a worker thread) and schedule the first one"""
+        self._job_queue = job_queue
+        await asyncio.to_thread(self.load)
+        print(f"⏰ {len(self._pending)} reminders scheduled")
+        self._reschedule()
+
+    def _snapshot(self) -> Tuple[int, Optional[float], List[Item]]:
+        with self._lock:
+            self._save_job = None
+            self._snapshots += 1
+            return self._snapshots, self._sent_until, [item for _, item in self._pending.values()]
+
+    def _write(self, snapshot: Tuple[int, Optional[float], List[Item]]):
+        number, sent_until, items = snapshot
+        with self._write_lock:
+            if number <= self._written:
+                return
+            state = {"sent_until": sent_until, "pending": [item.to_dict() for item in items]}
+            save_json_file(self.state_path, state)
+            self._written = number
+
+    def save(self):
+        """Write sent_until and the pending reminders to the state file"""
+        if not self._loaded:
+            return  # Nothing read yet; don't overwrite the file with an empty state
+        self._write(self._snapshot())
+
+    async def save_async(self):
+        """save() with the serializing and writing done in a worker thread"""
+        if not self._loaded:
+            return
+        await asyncio.to_thread(self._write, self._snapshot())
+
+    def _save_soon(self):
+        """Coalesce the state writes of a burst of changes"""
+        with self._lock:
+            if self._save_job is not None or self._job_queue is None:
+                return
+            self._save_job = self._job_queue.run_once(self._save_later, when=STATE_SAVE_DELAY, name="reminder-state")
+
+    async def _save_later(self, context: ContextTypes.DEFAULT_TYPE):
+        await self.save_async()
+
+    def _track(self, item: Item, after: float) -> Optional[Tuple[int, str, int]]:
+        """
+        Register item's reminder if it is due after `after`; returns its heap entry
+        Must be called with the lock held
+        """
+        if item.due_ts is None or item.type not in REMINDED_TYPES or item.completed:
+            return None
+        remind_at = item.due_ts - self.lead
+        if remind_at <= after:
+            return None
+        collection = item.type + "s"
+        self._pending[(collection, item.id)] = (remind_at, item)
+        return (remind_at, collection, item.id)
+
+    def _on_change(self, action: str, collection: str, item: Item):
+        """DataManager listener: schedule new items, cancel completed or removed ones"""
+        with self._lock:
+            if action != "add":
+                if self._pending.pop((collection, item.id), None) is None:
+                    return
+                entry = None
+            else:
+                # Items due within the lead time are reminded about immediately
+                entry = self._track(item, time.time() - self.lead)
+                if entry is None:
+                    return
+                heapq.heappush(self._heap, entry)
+            earlier = entry is not None and (self._job_at is None or entry[0] < self._job_at)
+        self._save_soon()
+        if earlier:
+            self._reschedule()
+
+    def _reschedule(self):
+        """Point the single job at the earliest live reminder"""
+        with self._lock:
+            # Drop cancelled entries so the job never wakes for nothing
+            while self._heap:
+                remind_at, collection, item_id = self._heap[0]
+                pending = self._pending.get((collection, item_id))
+                if pending is not None and pending[0] == remind_at:
+                    break
+                heapq.heappop(self._heap)
+            next_at = self._heap[0][0] if self._heap else None
+            if self._job is not None and self._job_at == next_at:
+                return
+            if self._job is not None:
+                self._job.schedule_removal()
+            self._job = None
+            self._job_at = next_at
+        if next_at is not None:
+            self._job = self._job_queue.run_once(self._fire, when=max(0, next_at - time.time()), name="reminders")
+
+    async def _fire(self, context: ContextTypes.DEFAULT_TYPE):
+        """Send every reminder that is due, then sleep until the next one"""
+        now = time.time()
+        due = []
+        with self._lock:
+            self._job = None
+            self._job_at = None
+            while self._heap and self._heap[0][0] <= now:
+                remind_at, collection, item_id = heapq.heappop(self._heap)
+                pending = self._pending.get((collection, item_id))
+                if pending is not None and pending[0] == remind_at:
+                    del self._pending[(collection, item_id)]
+                    due.append(pending[1])
+
+        for item in due:
+            try:
+                await context.bot.send_message(chat_id=item.user_id, text=format_reminder(item), parse_mode='Markdown')
+            except Exception as e:
+                print(f"Reminder error for user {item.user_id}: {e}")
+
+        self._sent_until = now
+        self._reschedule()
+        await self.save_async()
+
+# Global instance
+reminder_scheduler = ReminderScheduler(data_manager, REMINDER_STATE_FILE, REMINDER_LEAD_MINUTES)
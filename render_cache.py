@@ -0,0 +1,46 @@
+"""
+Cache of rendered read-command responses
+
+Entries are keyed on (user, command, page, data version, day). DataManager
+bumps a user's version on every mutation, so a changed view simply misses;
+the day is part of the key because display strings such as "hôm nay" and
+"(mai)" change at midnight. Outdated entries are never looked up again and
+age out of the LRU.
+"""
+
+import threading
+from collections import OrderedDict
+from datetime import date
+from typing import Any, Callable, Hashable, Tuple
+
+class RenderCache:
+    """Size-bounded LRU of rendered responses"""
+
+    def __init__(self, max_size: int = 1000):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Tuple, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_render(self, user_id: int, command: str, page: Hashable, version: int, day: date,
+                      render: Callable[[], Any]) -> Any:
+        """The cached response for this key, or render() stored under it"""
+        key = (user_id, command, page, version, day)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+        value = render()
+        if self.max_size > 0:
+            with self._lock:
+                self._entries[key] = value
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
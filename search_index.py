@@ -0,0 +1,149 @@
+"""
+Per-user inverted index for finding items by description
+
+Text is folded (lowercase, Vietnamese diacritics removed, đ -> d) so that
+"don nha" finds "dọn nhà". A lookup intersects the posting lists of the
+query's words, smallest first, and only checks the few remaining
+candidates against the full description. A one-word query is matched
+inside words through an index of every word's substrings of up to GRAM
+letters: a short query is looked up directly, a longer one intersects the
+words holding each of its GRAM-letter pieces. The cost is memory: up to
+three entries per letter of each distinct word (about 10 per word for
+Vietnamese syllables), in exchange for lookups that touch only the
+matching words instead of the whole vocabulary.
+"""
+
+import re
+import unicodedata
+from bisect import bisect_left
+from typing import Dict, List, Optional, Set
+
+from models import Item
+
+_WORD_RE = re.compile(r'\w+')
+_SPACES_RE = re.compile(r'\s+')
+# Longest substrings indexed for matching inside words
+GRAM = 3
+
+def fold(text: str) -> str:
+    """Lowercase and strip diacritics: "Dọn NHÀ" -> "don nha" """
+    decomposed = unicodedata.normalize("NFD", text.lower().replace("đ", "d"))
+    stripped = "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return _SPACES_RE.sub(" ", stripped).strip()
+
+def words(text: str) -> List[str]:
+    """Folded words of text"""
+    return _WORD_RE.findall(fold(text))
+
+def grams(word: str) -> Set[str]:
+    """Substrings of word of 1 to GRAM letters"""
+    return {word[i:i + n] for n in range(1, GRAM + 1) for i in range(len(word) - n + 1)}
+
+class SearchIndex:
+    """Items of one collection, indexed by folded word"""
+
+    __slots__ = ("_items", "_postings", "_vocabulary", "_grams")
+
+    def __init__(self):
+        self._items: Dict[int, Item] = {}
+        self._postings: Dict[str, Set[int]] = {}
+        # Sorted words, for prefix lookups of a partially typed last word
+        self._vocabulary: List[str] = []
+        # Substring of up to GRAM letters -> words containing it
+        self._grams: Dict[str, Set[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def add(self, item: Item):
+        self._items[item.id] = item
+        for word in set(words(item.text)):
+            posting = self._postings.get(word)
+            if posting is None:
+                posting = self._postings[word] = set()
+                self._vocabulary.insert(bisect_left(self._vocabulary, word), word)
+                for gram in grams(word):
+                    self._grams.setdefault(gram, set()).add(word)
+            posting.add(item.id)
+
+    def remove(self, item: Item):
+        if self._items.pop(item.id, None) is None:
+            return
+        for word in set(words(item.text)):
+            posting = self._postings.get(word)
+            if posting is None:
+                continue
+            posting.discard(item.id)
+            if not posting:
+                del self._postings[word]
+                del self._vocabulary[bisect_left(self._vocabulary, word)]
+                for gram in grams(word):
+                    holders = self._grams[gram]
+                    holders.discard(word)
+                    if not holders:
+                        del self._grams[gram]
+
+    def _prefix_ids(self, prefix: str) -> Set[int]:
+        """IDs of items containing a word that starts with prefix"""
+        ids = set()
+        position = bisect_left(self._vocabulary, prefix)
+        while position < len(self._vocabulary) and self._vocabulary[position].startswith(prefix):
+            ids |= self._postings[self._vocabulary[position]]
+            position += 1
+        return ids
+
+    def _infix_ids(self, part: str) -> Set[int]:
+        """IDs of items containing a word that contains part"""
+        if len(part) <= GRAM:
+            candidates = self._grams.get(part, set())
+        else:
+            pieces = [self._grams.get(part[i:i + GRAM], set()) for i in range(len(part) - GRAM + 1)]
+            pieces.sort(key=len)
+            candidates = {word for word in pieces[0].intersection(*pieces[1:]) if part in word}
+        ids = set()
+        for word in candidates:
+            ids |= self._postings[word]
+        return ids
+
+    def find(self, description: str) -> Optional[Item]:
+        """
+        Oldest item whose text contains the description as typed, else the
+        oldest whose folded text contains the folded description, or None
+        Since the description is a substring, a single word may sit anywhere
+        inside a word ("ua" finds "dọn nhà cửa"); with several words the first
+        may be a word's end and the last a word's start, and the ones in
+        between must be whole words.
+        """
+        query = fold(description)
+        query_words = _WORD_RE.findall(query)
+        if not query_words:
+            return None
+
+        if len(query_words) == 1:
+            postings = [self._infix_ids(query_words[0])]
+        else:
+            # The first word only narrows by suffix; the others filter and the
+            # final substring check settles it
+            postings = [self._prefix_ids(query_words[-1])]
+            for word in query_words[1:-1]:
+                posting = self._postings.get(word)
+                if posting is None:
+                    return None
+                postings.append(posting)
+
+        postings.sort(key=len)
+        candidates = postings[0].intersection(*postings[1:])
+
+        # A match with the diacritics as typed beats one that only matches folded
+        # ("ửa" means "cửa", not "sữa"); oldest first, so the first one wins
+        typed = _SPACES_RE.sub(" ", unicodedata.normalize("NFC", description.lower())).strip()
+        folded_match = None
+        for item_id in sorted(candidates):
+            item = self._items[item_id]
+            if query not in fold(item.text):
+                continue
+            if typed in unicodedata.normalize("NFC", item.text.lower()):
+                return item
+            if folded_match is None:
+                folded_match = item
+        return folded_match
@@ -0,0 +1,121 @@
+"""
+Per-user sharded JSON storage
+
+Each user's events, todos and ideas live in one small file,
+<root>/<shard>/<user_id>.json, where shard is user_id modulo shard_count
+(keeps directories small). A save rewrites only that user's file, so its
+cost depends on that user's item count, not on the number of users, and a
+user's file is read the first time DataManager asks for that user.
+
+IDs stay unique across users: the allocator reserves blocks of ID_BLOCK IDs
+in <root>/ids.json, so the file is written once per block, not per item.
+After a restart IDs continue from the reserved mark (unused ones are skipped).
+
+Migrate existing data with: python migrate_storage.py --from journal --to sharded
+"""
+
+import os
+import threading
+from typing import Dict, Iterator, List
+
+from models import Item
+from storage_backends import (
+    COLLECTIONS, IdAllocator, JsonIdMarks, StorageBackend, WriteBehindMixin, load_json_file, save_json_file
+)
+
+# Per-user file rewrites are serialized through this many striped locks
+LOCK_STRIPES = 64
+
+class ShardedJsonBackend(WriteBehindMixin, StorageBackend):
+    supports_queries = True
+
+    def __init__(self, root: str, shard_count: int = 256, write_behind: bool = False):
+        self.root = root
+        self.shard_count = max(1, shard_count)
+        # Dirty keys are user IDs; _lock also guards _users
+        self._init_write_behind(write_behind)
+        # user_id -> collection -> {id: item}, for users read or written so far
+        self._users: Dict[int, Dict[str, Dict[int, Item]]] = {}
+        self._file_locks = [threading.Lock() for _ in range(LOCK_STRIPES)]
+
+        self._ids = IdAllocator(JsonIdMarks(os.path.join(root, "ids.json")))
+
+    def user_path(self, user_id: int) -> str:
+        shard = f"{user_id % self.shard_count:03d}"
+        return os.path.join(self.root, shard, f"{user_id}.json")
+
+    def load(self) -> Dict[str, List[Item]]:
+        # Users are read on demand
+        return {name: [] for name in COLLECTIONS}
+
+    def _read_user(self, user_id: int) -> Dict[str, Dict[int, Item]]:
+        data = load_json_file(self.user_path(user_id))
+        if not isinstance(data, dict):
+            data = {}
+        return {name: {entry["id"]: Item.from_dict(entry) for entry in data.get(name, [])} for name in COLLECTIONS}
+
+    def _user(self, user_id: int) -> Dict[str, Dict[int, Item]]:
+        user = self._users.get(user_id)
+        if user is None:
+            loaded = self._read_user(user_id)
+            with self._lock:
+                user = self._users.setdefault(user_id, loaded)
+        return user
+
+    def next_id(self, collection: str) -> int:
+        return self._ids.next(collection)
+
+    def save(self, collection: str, item: Item):
+        self.save_many(collection, [item])
+
+    def save_many(self, collection: str, items: List[Item]):
+        """Upsert several items, rewriting each affected user's file once"""
+        user_ids = set()
+        for item in items:
+            self._user(item.user_id)[collection][item.id] = item
+            self._ids.observe(collection, item.id)
+            user_ids.add(item.user_id)
+        for user_id in user_ids:
+            self._changed(user_id)
+
+    def delete(self, collection: str, item: Item):
+        self._user(item.user_id)[collection].pop(item.id, None)
+        self._changed(item.user_id)
+
+    def _write(self, user_id: int, data: Dict[str, List[Dict]] = None):
+        with self._file_locks[user_id % LOCK_STRIPES]:
+            if data is None:
+                data = self._serialize(user_id)
+            save_json_file(self.user_path(user_id), data)
+
+    def _serialize(self, user_id: int) -> Dict[str, List[Dict]]:
+        user = self._users[user_id]
+        return {name: [item.to_dict() for item in list(user[name].values())] for name in COLLECTIONS}
+
+    def _user_ids(self) -> Iterator[int]:
+        """Every user with a file or with items in memory"""
+        seen = set(self._users)
+        yield from list(seen)
+        if not os.path.isdir(self.root):
+            return
+        for shard in sorted(os.listdir(self.root)):
+            directory = os.path.join(self.root, shard)
+            if not os.path.isdir(directory):
+                continue
+            for filename in os.listdir(directory):
+                name, extension = os.path.splitext(filename)
+                if extension == ".json" and name.lstrip("-").isdigit() and int(name) not in seen:
+                    yield int(name)
+
+    def iter_items(self) -> Iterator[Item]:
+        for user_id in self._user_ids():
+            # Users not loaded yet are read without keeping them in memory
+            user = self._users.get(user_id) or self._read_user(user_id)
+            for name in COLLECTIONS:
+                yield from list(user[name].values())
+
+    def query_user_items(self, collection: str, user_id: int, include_completed: bool = True) -> List[Item]:
+        items = sorted(self._user(user_id)[collection].values(), key=lambda item: item.id)
+        if not include_completed:
+            items = [item for item in items if not item.completed]
+        return items
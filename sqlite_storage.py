@@ -0,0 +1,128 @@
+"""
+SQLite storage backend
+
+Items live in a single table with the full item as JSON plus the columns
+needed for indexed lookups. The database runs in WAL mode so reads don't
+block on writes. The id_marks table holds the reserved ID mark per
+collection, so IDs of deleted or archived items are not reused.
+"""
+
+import json
+import sqlite3
+import threading
+from typing import Dict, Iterator, List
+
+from models import Item
+from storage_backends import COLLECTIONS, IdAllocator, StorageBackend, ensure_parent_dir
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS items (
+    collection TEXT NOT NULL,
+    id INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    completed INTEGER NOT NULL DEFAULT 0,
+    datetime TEXT,
+    data TEXT NOT NULL,
+    PRIMARY KEY (collection, id)
+);
+CREATE INDEX IF NOT EXISTS idx_items_user
+    ON items (user_id, collection, completed, datetime);
+CREATE TABLE IF NOT EXISTS id_marks (
+    collection TEXT PRIMARY KEY,
+    reserved INTEGER NOT NULL
+);
+"""
+
+class SQLiteBackend(StorageBackend):
+    supports_queries = True
+
+    def __init__(self, path: str):
+        self.path = path
+        ensure_parent_dir(path)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+        self._db.commit()
+        self._ids = IdAllocator(_SQLiteIdMarks(self))
+        for name in COLLECTIONS:
+            row = self._db.execute("SELECT MAX(id) FROM items WHERE collection = ?", (name,)).fetchone()
+            self._ids.observe(name, row[0] or 0)
+
+    def load(self) -> Dict[str, List[Item]]:
+        # Items are queried on demand instead of loaded up front
+        return {name: [] for name in COLLECTIONS}
+
+    def next_id(self, collection: str) -> int:
+        return self._ids.next(collection)
+
+    def save(self, collection: str, item: Item):
+        self.save_many(collection, [item])
+
+    def save_many(self, collection: str, items: List[Item]):
+        """Upsert several items in one transaction"""
+        rows = [_to_row(collection, item) for item in items]
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO items "
+                "(collection, id, user_id, completed, datetime, data) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                rows
+            )
+            self._db.commit()
+        for item in items:
+            self._ids.observe(collection, item.id)
+
+    def delete(self, collection: str, item: Item):
+        with self._lock:
+            self._db.execute("DELETE FROM items WHERE collection = ? AND id = ?", (collection, item.id))
+            self._db.commit()
+
+    def iter_items(self) -> Iterator[Item]:
+        with self._lock:
+            rows = self._db.execute("SELECT data FROM items ORDER BY collection, id").fetchall()
+        for (data,) in rows:
+            yield Item.from_dict(json.loads(data))
+
+    def query_user_items(self, collection: str, user_id: int, include_completed: bool = True) -> List[Item]:
+        sql = "SELECT data FROM items WHERE user_id = ? AND collection = ?"
+        params = [user_id, collection]
+        if not include_completed:
+            sql += " AND completed = 0"
+        with self._lock:
+            rows = self._db.execute(sql + " ORDER BY id", params).fetchall()
+        return [Item.from_dict(json.loads(data)) for (data,) in rows]
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+class _SQLiteIdMarks:
+    """ID marks kept in the id_marks table"""
+
+    def __init__(self, backend: SQLiteBackend):
+        self.backend = backend
+
+    def load(self) -> Dict[str, int]:
+        with self.backend._lock:
+            return dict(self.backend._db.execute("SELECT collection, reserved FROM id_marks").fetchall())
+
+    def save(self, marks: Dict[str, int]):
+        with self.backend._lock:
+            self.backend._db.executemany(
+                "INSERT OR REPLACE INTO id_marks (collection, reserved) VALUES (?, ?)",
+                list(marks.items())
+            )
+            self.backend._db.commit()
+
+def _to_row(collection: str, item: Item):
+    data = item.to_dict()
+    return (
+        collection,
+        item.id,
+        item.user_id,
+        1 if item.completed else 0,
+        data["time_info"].get("datetime"),
+        json.dumps(data, ensure_ascii=False)
+    )
@@ -0,0 +1,319 @@
+"""
+Storage backends for DataManager
+
+A backend owns persistence and ID allocation. In-memory backends (json,
+journal) hand DataManager the full collections at load time; backends
+with supports_queries=True (sqlite) are asked for one user's items the
+first time that user is accessed. Backends hold models.Item objects and
+convert to and from the JSON dict format only when reading or writing.
+"""
+
+import asyncio
+import json
+import os
+import threading
+from typing import Dict, Iterator, List, Optional
+
+from metrics import STORAGE_FLUSH
+from models import Item
+
+COLLECTIONS = ("events", "todos", "ideas")
+# IDs reserved per write of a persisted ID mark
+ID_BLOCK = 1000
+
+def ensure_parent_dir(path: str):
+    """Create the directory containing path if it doesn't exist"""
+    directory = os.path.dirname(path)
+    if directory and not os.path.exists(directory):
+        os.makedirs(directory)
+
+def load_json_file(filepath: str) -> List[Dict]:
+    """Load JSON file or return empty list"""
+    if not os.path.exists(filepath):
+        return []
+    try:
+        with open(filepath, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except:
+        return []
+
+def save_json_file(filepath: str, data: List[Dict]):
+    """
+    Save data to JSON file atomically
+    Writes a temp file, fsyncs it and renames it over filepath
+    """
+    ensure_parent_dir(filepath)
+    tmp_path = filepath + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, filepath)
+
+class JsonIdMarks:
+    """ID marks kept in a small JSON file ({"events": 2000, ...})"""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def load(self) -> Dict[str, int]:
+        marks = load_json_file(self.path)
+        return marks if isinstance(marks, dict) else {}
+
+    def save(self, marks: Dict[str, int]):
+        save_json_file(self.path, marks)
+
+class IdAllocator:
+    """
+    Thread-safe, monotonically increasing item IDs per collection
+    With a marks store, IDs are reserved in blocks of ID_BLOCK and the mark is
+    persisted before any ID below it is handed out, so IDs of deleted or
+    archived items are never reused after a restart
+    """
+
+    def __init__(self, marks=None):
+        self._next = {name: 1 for name in COLLECTIONS}
+        self._marks = marks
+        self._reserved = {name: 0 for name in COLLECTIONS}
+        self._lock = threading.Lock()
+        if marks is not None:
+            stored = marks.load()
+            for name in COLLECTIONS:
+                self._reserved[name] = int(stored.get(name, 0))
+                self._next[name] = self._reserved[name] + 1
+
+    def next(self, collection: str) -> int:
+        with self._lock:
+            item_id = self._next[collection]
+            self._next[collection] = item_id + 1
+            self._reserve(collection, item_id)
+            return item_id
+
+    def observe(self, collection: str, item_id: int):
+        """Make sure future IDs stay above an existing one"""
+        with self._lock:
+            if item_id >= self._next[collection]:
+                self._next[collection] = item_id + 1
+                self._reserve(collection, item_id)
+
+    def last(self, collection: str) -> int:
+        """Highest ID handed out, seen or reserved so far"""
+        with self._lock:
+            return self._next[collection] - 1
+
+    def _reserve(self, collection: str, item_id: int):
+        # Caller holds _lock; the marks are written once per ID_BLOCK IDs
+        if self._marks is None or item_id <= self._reserved[collection]:
+            return
+        self._reserved[collection] = (item_id // ID_BLOCK + 1) * ID_BLOCK
+        self._marks.save(dict(self._reserved))
+
+class StorageBackend:
+    """Interface between DataManager and where items are persisted"""
+
+    # True when the backend answers the query methods below itself
+    supports_queries = False
+
+    def load(self) -> Dict[str, List[Item]]:
+        """Return every collection (in-memory backends only)"""
+        raise NotImplementedError
+
+    def next_id(self, collection: str) -> int:
+        """Allocate the next item ID for a collection"""
+        raise NotImplementedError
+
+    def last_id(self, collection: str) -> int:
+        """Highest ID used so far, including IDs of deleted items"""
+        return self._ids.last(collection)
+
+    def skip_ids(self, collection: str, last_id: int):
+        """Never hand out IDs up to last_id (e.g. ones used by another backend)"""
+        self._ids.observe(collection, last_id)
+
+    def save(self, collection: str, item: Item):
+        """Persist a new or changed item"""
+        raise NotImplementedError
+
+    def delete(self, collection: str, item: Item):
+        """Remove an item from storage"""
+        raise NotImplementedError
+
+    def iter_items(self) -> Iterator[Item]:
+        """Iterate over every stored item"""
+        raise NotImplementedError
+
+    def query_user_items(self, collection: str, user_id: int, include_completed: bool = True) -> List[Item]:
+        """Items of one user in one collection (query backends only)"""
+        raise NotImplementedError
+
+    def flush(self):
+        """Write out anything buffered by write-behind mode"""
+        pass
+
+    def close(self):
+        """Flush and release resources"""
+        self.flush()
+
+class InMemoryBackend(StorageBackend):
+    """Base for backends that keep every item in memory, keyed by ID"""
+
+    def __init__(self, ids_file: Optional[str] = None):
+        """ids_file persists the ID marks; without it IDs restart above the highest stored one"""
+        self._items = {name: {} for name in COLLECTIONS}
+        self._ids = IdAllocator(JsonIdMarks(ids_file) if ids_file else None)
+
+    def _set_loaded(self, collections: Dict[str, List[Dict]]) -> Dict[str, List[Item]]:
+        """Take over collections of stored dicts as Items"""
+        for name in COLLECTIONS:
+            items = collections.get(name, [])
+            self._items[name] = {item["id"]: Item.from_dict(item) for item in items}
+            self._ids.observe(name, max(self._items[name], default=0))
+        return {name: list(self._items[name].values()) for name in COLLECTIONS}
+
+    def next_id(self, collection: str) -> int:
+        return self._ids.next(collection)
+
+    def iter_items(self) -> Iterator[Item]:
+        for name in COLLECTIONS:
+            yield from list(self._items[name].values())
+
+    def snapshot(self) -> Dict[str, List[Item]]:
+        """Current collections as lists"""
+        return {name: list(self._items[name].values()) for name in COLLECTIONS}
+
+class WriteBehindMixin:
+    """
+    Dirty tracking for backends that rewrite whole files
+
+    A subclass keeps one file per key (a collection, a user, ...) and
+    defines _serialize(key) and _write(key, data=None). Without write-behind
+    every change rewrites its file at once; with it, a change only marks
+    the key dirty and flush() (run by a WriteBehindFlusher) rewrites each
+    dirty file once.
+    """
+
+    def _init_write_behind(self, write_behind: bool):
+        self.write_behind = write_behind
+        self.pending_writes = 0
+        # Called with no arguments whenever pending_writes grows
+        self.on_pending = None
+        self._dirty = set()
+        self._lock = threading.Lock()
+
+    def _changed(self, key):
+        if not self.write_behind:
+            self._write(key)
+            return
+        with self._lock:
+            self._dirty.add(key)
+            self.pending_writes += 1
+        if self.on_pending:
+            self.on_pending()
+
+    def flush(self):
+        """Rewrite every dirty file (safe to call from a worker thread)"""
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+            self.pending_writes = 0
+            # Serialize now so the event loop can keep mutating items meanwhile
+            snapshot = {key: self._serialize(key) for key in dirty}
+        for key, data in snapshot.items():
+            self._write(key, data)
+
+class JsonFileBackend(WriteBehindMixin, InMemoryBackend):
+    """
+    Plain JSON files, one per collection
+
+    By default every save rewrites the affected collection. In write-behind
+    mode a save only marks the collection dirty and a WriteBehindFlusher
+    rewrites dirty collections in the background.
+    """
+
+    def __init__(self, files: Dict[str, str], write_behind: bool = False, ids_file: Optional[str] = None):
+        super().__init__(ids_file)
+        self.files = files
+        self._init_write_behind(write_behind)
+        # Serializes rewrites of the same file
+        self._file_locks = {name: threading.Lock() for name in files}
+
+    def load(self) -> Dict[str, List[Item]]:
+        return self._set_loaded({name: load_json_file(path) for name, path in self.files.items()})
+
+    def save(self, collection: str, item: Item):
+        self._items[collection][item.id] = item
+        self._changed(collection)
+
+    def delete(self, collection: str, item: Item):
+        self._items[collection].pop(item.id, None)
+        self._changed(collection)
+
+    def _serialize(self, collection: str) -> List[Dict]:
+        # list() copies the values in one step; iterating the live dict while
+        # another thread inserts raises "dictionary changed size during iteration"
+        return [item.to_dict() for item in list(self._items[collection].values())]
+
+    def _write(self, collection: str, data: List[Dict] = None):
+        with self._file_locks[collection]:
+            if data is None:
+                data = self._serialize(collection)
+            save_json_file(self.files[collection], data)
+
+class WriteBehindFlusher:
+    """
+    Background asyncio task that coalesces backend writes
+
+    Flushes when max_delay_ms has passed since the previous flush and
+    something is pending, or immediately once max_pending mutations have
+    accumulated. A crash loses at most the mutations made since the last
+    completed flush: under max_delay_ms (plus the flush itself) and under
+    max_pending mutations.
+    """
+
+    def __init__(self, backend: StorageBackend, max_delay_ms: int, max_pending: int):
+        self.backend = backend
+        self.max_delay = max_delay_ms / 1000
+        self.max_pending = max_pending
+        self._wake = None
+        self._loop = None
+        self._task = None
+
+    def start(self):
+        """Start flushing; must be called from inside the running event loop"""
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        self.backend.on_pending = self._on_pending
+        self._task = asyncio.create_task(self._run())
+
+    def _on_pending(self):
+        if self.backend.pending_writes >= self.max_pending:
+            # May be called from a worker thread
+            self._loop.call_soon_threadsafe(self._wake.set)
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.max_delay)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            if self.backend.pending_writes:
+                try:
+                    await asyncio.to_thread(self._flush)
+                except Exception as e:
+                    print(f"Write-behind flush error: {e}")
+
+    async def stop(self):
+        """Stop the task and run a final flush"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self.backend.on_pending = None
+        self._flush()
+
+    def _flush(self):
+        with STORAGE_FLUSH.time(type(self.backend).__name__):
+            self.backend.flush()
@@ -0,0 +1,262 @@
+"""
+Supabase (PostgREST) storage backend
+
+Items live in one table with the same layout as the SQLite backend, the
+full item in a jsonb "data" column:
+
+    create table items (
+        collection text not null,
+        id bigint not null,
+        user_id bigint not null,
+        completed boolean not null default false,
+        datetime text,
+        data jsonb not null,
+        primary key (collection, id)
+    );
+    create index idx_items_user on items (user_id, collection, completed);
+    create table item_ids (
+        collection text primary key,
+        reserved bigint not null
+    );
+
+item_ids holds the reserved ID mark per collection, so IDs of deleted or
+archived items are not reused (it is written once per ID_BLOCK new IDs).
+
+All HTTP goes through one pooled httpx.AsyncClient (keep-alive) running on
+a private event loop thread. Saves, deletes and new ID marks are buffered
+and sent in bulk by that loop (marks first), so they never wait on the
+network. Reads do wait: load the backend and each user's items off the
+bot's loop (DataManager.load_async / load_user_async). DataManager keeps
+every user's items once read, so the backend keeps no read cache.
+
+Any PostgREST-compatible server works; benchmarks/postgrest_standin.py is
+a small local stand-in for development.
+"""
+
+import asyncio
+import threading
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import httpx
+
+from metrics import STORAGE_FLUSH
+from models import Item
+from storage_backends import COLLECTIONS, IdAllocator, StorageBackend
+
+# Rows fetched per request when reading a whole table
+PAGE_SIZE = 1000
+
+class SupabaseBackend(StorageBackend):
+    supports_queries = True
+
+    def __init__(self, url: str, key: str, table: str = "items", batch_size: int = 500,
+                 flush_interval_ms: int = 200, max_connections: int = 10, ids_table: str = "item_ids"):
+        self.endpoint = f"{url.rstrip('/')}/rest/v1/{table}"
+        self.ids_endpoint = f"{url.rstrip('/')}/rest/v1/{ids_table}"
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval_ms / 1000
+        self._headers = {"apikey": key, "Authorization": f"Bearer {key}"}
+        self._limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+
+        # (collection, id) -> row to upsert, or None to delete; the newest write wins
+        self._pending: Dict[Tuple[str, int], Optional[Dict]] = {}
+        # Newest ID marks not sent yet; guarded by _pending_lock too
+        self._pending_marks: Optional[Dict[str, int]] = None
+        self._pending_lock = threading.Lock()
+
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="supabase-io", daemon=True)
+        self._thread.start()
+        self._run(self._setup())
+
+        self._ids = IdAllocator(_SupabaseIdMarks(self))
+        for name in COLLECTIONS:
+            self._ids.observe(name, self._run(self._max_id(name)))
+
+    def _run(self, coroutine):
+        """Run a coroutine on the I/O loop and wait for its result"""
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result()
+
+    async def _setup(self):
+        self._client = httpx.AsyncClient(headers=self._headers, limits=self._limits, timeout=30)
+        self._wake = asyncio.Event()
+        self._send_lock = asyncio.Lock()
+        self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def _max_id(self, collection: str) -> int:
+        response = await self._client.get(self.endpoint, params={
+            "select": "id", "collection": f"eq.{collection}", "order": "id.desc", "limit": "1"
+        })
+        response.raise_for_status()
+        rows = response.json()
+        return rows[0]["id"] if rows else 0
+
+    def load(self) -> Dict[str, List[Item]]:
+        # Items are queried per user on demand
+        return {name: [] for name in COLLECTIONS}
+
+    def next_id(self, collection: str) -> int:
+        return self._ids.next(collection)
+
+    def save(self, collection: str, item: Item):
+        self._ids.observe(collection, item.id)
+        self._queue(collection, item.id, _to_row(collection, item))
+
+    def save_many(self, collection: str, items: List[Item]):
+        """Upsert several items, sent in bulk"""
+        for item in items:
+            self.save(collection, item)
+
+    def delete(self, collection: str, item: Item):
+        self._queue(collection, item.id, None)
+
+    def _queue(self, collection: str, item_id: int, row: Optional[Dict]):
+        with self._pending_lock:
+            self._pending[(collection, item_id)] = row
+            full = len(self._pending) >= self.batch_size
+        if full:
+            self._loop.call_soon_threadsafe(self._wake.set)
+
+    def _queue_marks(self, marks: Dict[str, int]):
+        with self._pending_lock:
+            self._pending_marks = marks
+        self._loop.call_soon_threadsafe(self._wake.set)
+
+    async def _flush_loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                await self._send_pending()
+            except httpx.HTTPError as e:
+                print(f"Supabase write error (will retry): {e}")
+
+    async def _send_pending(self):
+        """Send buffered writes as bulk upserts and deletes"""
+        async with self._send_lock:
+            with self._pending_lock:
+                batch, self._pending = self._pending, {}
+                marks, self._pending_marks = self._pending_marks, None
+            if not batch and marks is None:
+                return
+            upserts = [row for row in batch.values() if row is not None]
+            deletes: Dict[str, List[int]] = {}
+            for (collection, item_id), row in batch.items():
+                if row is None:
+                    deletes.setdefault(collection, []).append(item_id)
+            started = time.perf_counter()
+            try:
+                # Marks go first: no item above the stored mark may be stored before it
+                if marks is not None:
+                    response = await self._client.post(
+                        self.ids_endpoint,
+                        params={"on_conflict": "collection"},
+                        headers={"Prefer": "resolution=merge-duplicates,return=minimal"},
+                        json=[{"collection": name, "reserved": reserved} for name, reserved in marks.items()]
+                    )
+                    response.raise_for_status()
+                    marks = None
+                for start in range(0, len(upserts), self.batch_size):
+                    response = await self._client.post(
+                        self.endpoint,
+                        params={"on_conflict": "collection,id"},
+                        headers={"Prefer": "resolution=merge-duplicates,return=minimal"},
+                        json=upserts[start:start + self.batch_size]
+                    )
+                    response.raise_for_status()
+                for collection, ids in deletes.items():
+                    for start in range(0, len(ids), self.batch_size):
+                        chunk = ",".join(str(item_id) for item_id in ids[start:start + self.batch_size])
+                        response = await self._client.delete(self.endpoint, params={
+                            "collection": f"eq.{collection}", "id": f"in.({chunk})"
+                        })
+                        response.raise_for_status()
+            except httpx.HTTPError:
+                # Put the batch back unless something newer was queued meanwhile
+                with self._pending_lock:
+                    for key, row in batch.items():
+                        self._pending.setdefault(key, row)
+                    if marks is not None and self._pending_marks is None:
+                        self._pending_marks = marks
+                raise
+            STORAGE_FLUSH.observe(time.perf_counter() - started, "SupabaseBackend")
+
+    async def _get_rows(self, params: Dict[str, str]) -> List[Dict]:
+        rows = []
+        while True:
+            page = dict(params, limit=str(PAGE_SIZE), offset=str(len(rows)))
+            response = await self._client.get(self.endpoint, params=page)
+            response.raise_for_status()
+            batch = response.json()
+            rows.extend(batch)
+            if len(batch) < PAGE_SIZE:
+                return rows
+
+    def iter_items(self) -> Iterator[Item]:
+        """Every item; waits on the network, so call it off the bot's event loop"""
+        self.flush()
+        rows = self._run(self._get_rows({"select": "data", "order": "collection.asc,id.asc"}))
+        for row in rows:
+            yield Item.from_dict(row["data"])
+
+    def query_user_items(self, collection: str, user_id: int, include_completed: bool = True) -> List[Item]:
+        """One user's items; waits on the network, so call it off the bot's event loop"""
+        # Unsent writes must be visible to the read
+        self.flush()
+        params = {"select": "data", "user_id": f"eq.{user_id}", "collection": f"eq.{collection}", "order": "id.asc"}
+        if not include_completed:
+            params["completed"] = "eq.false"
+        return [Item.from_dict(row["data"]) for row in self._run(self._get_rows(params))]
+
+    def flush(self):
+        """Send every buffered write now"""
+        self._run(self._send_pending())
+
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            self._run(self._shutdown())
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._loop.close()
+
+    async def _shutdown(self):
+        self._flush_task.cancel()
+        try:
+            await self._flush_task
+        except asyncio.CancelledError:
+            pass
+        await self._client.aclose()
+
+class _SupabaseIdMarks:
+    """ID marks kept in the item_ids table, sent with the buffered writes"""
+
+    def __init__(self, backend: SupabaseBackend):
+        self.backend = backend
+
+    def load(self) -> Dict[str, int]:
+        return self.backend._run(self._load())
+
+    def save(self, marks: Dict[str, int]):
+        self.backend._queue_marks(marks)
+
+    async def _load(self) -> Dict[str, int]:
+        response = await self.backend._client.get(self.backend.ids_endpoint, params={"select": "collection,reserved"})
+        response.raise_for_status()
+        return {row["collection"]: row["reserved"] for row in response.json()}
+
+def _to_row(collection: str, item: Item) -> Dict:
+    data = item.to_dict()
+    return {
+        "collection": collection,
+        "id": item.id,
+        "user_id": item.user_id,
+        "completed": item.completed,
+        "datetime": data["time_info"].get("datetime"),
+        "data": data
+    }
@@ -0,0 +1,79 @@
+"""
+Due-time ordering for items
+
+Items carry a pre-parsed due_ts (epoch seconds, or None when untimed)
+computed once at insert, and TimeIndex keeps them ordered by it so views
+never parse or sort on read.
+"""
+
+from bisect import bisect_left, bisect_right
+from typing import List, Tuple
+
+from models import Item
+
+class TimeIndex:
+    """
+    Items ordered by due time (ties by ID), with untimed items kept
+    separately by ID, i.e. in insertion order
+
+    Both are plain lists so any page of the timeline (timed, then untimed)
+    is a slice.
+    """
+
+    __slots__ = ("_keys", "_timed", "_untimed_ids", "_untimed")
+
+    def __init__(self):
+        self._keys: List[Tuple[int, int]] = []
+        self._timed: List[Item] = []
+        self._untimed_ids: List[int] = []
+        self._untimed: List[Item] = []
+
+    def __len__(self) -> int:
+        return len(self._timed) + len(self._untimed)
+
+    def add(self, item: Item):
+        if item.due_ts is None:
+            # New items have the highest ID, so this is normally an append
+            position = bisect_right(self._untimed_ids, item.id)
+            self._untimed_ids.insert(position, item.id)
+            self._untimed.insert(position, item)
+            return
+        key = (item.due_ts, item.id)
+        position = bisect_right(self._keys, key)
+        self._keys.insert(position, key)
+        self._timed.insert(position, item)
+
+    def remove(self, item: Item):
+        if item.due_ts is None:
+            position = bisect_left(self._untimed_ids, item.id)
+            if position < len(self._untimed_ids) and self._untimed_ids[position] == item.id:
+                del self._untimed_ids[position]
+                del self._untimed[position]
+            return
+        key = (item.due_ts, item.id)
+        position = bisect_left(self._keys, key)
+        if position < len(self._keys) and self._keys[position] == key:
+            del self._keys[position]
+            del self._timed[position]
+
+    def timed(self) -> List[Item]:
+        """Timed items, earliest first"""
+        return list(self._timed)
+
+    def untimed(self) -> List[Item]:
+        """Items without a due time, oldest first"""
+        return list(self._untimed)
+
+    def page(self, offset: int, limit: int) -> List[Item]:
+        """Items offset..offset+limit of the timeline: timed first, then untimed"""
+        items = self._timed[offset:offset + limit]
+        if len(items) < limit:
+            start = max(0, offset - len(self._timed))
+            items += self._untimed[start:start + limit - len(items)]
+        return items
+
+    def between(self, start_ts: float, end_ts: float) -> List[Item]:
+        """Timed items due in [start_ts, end_ts], earliest first"""
+        low = bisect_left(self._keys, (start_ts, -1))
+        high = bisect_right(self._keys, (end_ts, float("inf")))
+        return self._timed[low:high]
@@ -0,0 +1,222 @@
+"""
+Single-pass tokenizer for Vietnamese time expressions
+
+One precompiled regex finds every weekday, date, clock time and relative
+day ("mai", "hôm nay") in a single scan of the original text. parse_time
+combines the tokens into one datetime, so "ngày 19/10 lúc 14h30" keeps
+both the date and the hour, and removes exactly the matched spans from
+the text.
+
+Relative days (today, tomorrow, the next of each weekday) and their display
+strings are resolved once per calendar day in a DayTable, rebuilt lazily
+after midnight. A parse only depends on the day and the text, so results
+are memoized per (day table, normalized text).
+"""
+
+import re
+import time
+import unicodedata
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from typing import Dict, List, NamedTuple, Optional
+
+# Hour used when only a day is given
+DEFAULT_HOUR = 9
+# Distinct messages remembered by the parse cache
+PARSE_CACHE_SIZE = 4096
+
+WEEKDAY_NAMES = ("thứ 2", "thứ 3", "thứ 4", "thứ 5", "thứ 6", "thứ 7", "chủ nhật")
+
+# Spelled-out weekdays ("thứ sáu") -> 0=Monday
+_WEEKDAY_WORDS = {"hai": 0, "ba": 1, "tư": 2, "năm": 3, "sáu": 4, "bảy": 5}
+
+# The lookahead lets the scan skip positions that can't start a token cheaply
+_TOKEN_RE = re.compile(r"""
+    (?=[\dnltchm])(?<!\w)(?:
+        (?P<date>(?:ngày\s+)?(?P<day>\d{1,2})/(?P<month>\d{1,2})(?:/(?P<year>\d{4}))?)
+      | (?P<time>(?:lúc\s+)?(?P<hour>\d{1,2})h(?P<minute>\d{2})?(?:\s*(?P<period>sáng|trưa|chiều|tối|đêm))?)
+      | (?P<weekday>thứ\s+(?P<weekday_num>[2-7]|hai|ba|tư|năm|sáu|bảy)|chủ\s*nhật)
+      | (?P<relative>hôm\s+nay|(?:ngày\s+)?mai)
+    )(?!\w)
+""", re.IGNORECASE | re.VERBOSE)
+
+_SPACES_RE = re.compile(r'\s+')
+
+class TimeToken(NamedTuple):
+    kind: str  # "date", "time", "weekday" or "relative"
+    text: str  # matched text, as written
+    start: int
+    end: int
+    value: tuple  # date: (day, month, year|None); time: (hour, minute); weekday: (0-6,); relative: (days from today,)
+
+def weekday_name(weekday: int) -> str:
+    """Vietnamese name of a weekday (0=Monday)"""
+    return WEEKDAY_NAMES[weekday] if 0 <= weekday < 7 else f"thứ {weekday + 2}"
+
+def display_date(day: date) -> str:
+    """ "thứ 6 ngày 23/10" """
+    return f"{weekday_name(day.weekday())} ngày {day.day:02d}/{day.month:02d}"
+
+class DayTable:
+    """Every relative expression resolved for one calendar day"""
+
+    __slots__ = ("day", "expires", "today_display", "relative", "weekdays")
+
+    def __init__(self, day: date):
+        self.day = day
+        midnight = datetime.combine(day + timedelta(days=1), datetime.min.time())
+        self.expires = midnight.timestamp()
+        self.today_display = f"{weekday_name(day.weekday())} ngày {day.day:02d}/{day.month:02d}/{day.year}"
+        tomorrow = day + timedelta(days=1)
+        # days from today -> (date, display)
+        self.relative = {
+            0: (day, "hôm nay"),
+            1: (tomorrow, display_date(tomorrow) + " (mai)")
+        }
+        # weekday (0=Monday) -> (next occurrence after today, display)
+        self.weekdays = []
+        for weekday in range(7):
+            days_ahead = (weekday - day.weekday()) % 7 or 7
+            target = day + timedelta(days=days_ahead)
+            self.weekdays.append((target, display_date(target)))
+
+_table: Optional[DayTable] = None
+
+def day_table() -> DayTable:
+    """Today's table, rebuilt on the first call after midnight"""
+    global _table
+    table = _table
+    if table is None or time.time() >= table.expires:
+        table = _table = DayTable(date.today())
+    return table
+
+def next_weekday(weekday: int) -> date:
+    """Next occurrence of a weekday (0=Monday), never today"""
+    return day_table().weekdays[weekday][0]
+
+def _to_hour(hour: int, period: Optional[str]) -> int:
+    if period in ("chiều", "tối") and hour < 12:
+        return hour + 12
+    if period == "đêm" and 6 <= hour < 12:
+        return hour + 12
+    if period == "trưa" and hour < 6:
+        return hour + 12
+    return hour
+
+def tokenize(text: str) -> List[TimeToken]:
+    """Every time expression in text, in order"""
+    tokens = []
+    for match in _TOKEN_RE.finditer(text):
+        kind = match.lastgroup  # the outer group closes last
+        if kind == "date":
+            year = match.group("year")
+            value = (int(match.group("day")), int(match.group("month")), int(year) if year else None)
+        elif kind == "time":
+            period = match.group("period")
+            hour = _to_hour(int(match.group("hour")), period.lower() if period else None)
+            minute = int(match.group("minute") or 0)
+            if hour > 23 or minute > 59:
+                continue
+            value = (hour, minute)
+        elif kind == "weekday":
+            number = match.group("weekday_num")
+            if number is None:
+                value = (6,)  # chủ nhật
+            elif number.isdigit():
+                value = (int(number) - 2,)
+            else:
+                value = (_WEEKDAY_WORDS[number.lower()],)
+        else:
+            value = (0 if match.group("relative").lower().startswith("hôm") else 1,)
+        tokens.append(TimeToken(kind, match.group(0), match.start(), match.end(), value))
+    return tokens
+
+def remove_tokens(text: str, tokens: List[TimeToken]) -> str:
+    """text without the tokens' spans, whitespace collapsed"""
+    parts = []
+    position = 0
+    for token in tokens:
+        parts.append(text[position:token.start])
+        position = token.end
+    parts.append(text[position:])
+    return _SPACES_RE.sub(" ", " ".join(parts)).strip()
+
+def _no_time(parsed_text: str) -> Dict:
+    return {
+        "has_time": False,
+        "has_clock": False,
+        "datetime": None,
+        "display_time": "",
+        "parsed_text": _SPACES_RE.sub(" ", parsed_text).strip(),
+        "original_time_expression": ""
+    }
+
+def normalize(text: str) -> str:
+    """NFC and collapsed whitespace, so equivalent messages share a cache entry"""
+    return _SPACES_RE.sub(" ", unicodedata.normalize("NFC", text)).strip()
+
+def parse_time(text: str, now: Optional[datetime] = None) -> Dict:
+    """
+    Parse the time in a message
+    Returns the time_info dict used throughout the bot: has_time,
+    has_clock (a time of day was given), datetime ("YYYY-MM-DD HH:MM"),
+    display_time, parsed_text and original_time_expression. Pass now to parse relative to another day.
+    """
+    text = normalize(text)
+    if now is not None:
+        return _parse(DayTable(now.date()), text)
+    # Callers may modify the result; the cached dict must stay intact
+    return dict(_parse_cached(day_table(), text))
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def _parse_cached(table: DayTable, text: str) -> Dict:
+    return _parse(table, text)
+
+def _parse(table: DayTable, text: str) -> Dict:
+    tokens = tokenize(text)
+    if not tokens:
+        return _no_time(text)
+
+    today = table.day
+    day = None
+    display_time = None
+    clock = None
+    first = {}
+    for token in tokens:
+        first.setdefault(token.kind, token)
+    # The most specific day wins: explicit date, then weekday, then mai/hôm nay
+    if "date" in first:
+        day_of_month, month, year = first["date"].value
+        try:
+            day = date(year or today.year, month, day_of_month)
+            # A date already past this year means next year
+            if year is None and day < today:
+                day = date(today.year + 1, month, day_of_month)
+            display_time = display_date(day)
+        except ValueError:
+            day = None  # Invalid date like 31/2
+            tokens = [token for token in tokens if token is not first["date"]]
+    if day is None and "weekday" in first:
+        day, display_time = table.weekdays[first["weekday"].value[0]]
+    if day is None and "relative" in first:
+        day, display_time = table.relative[first["relative"].value[0]]
+    if "time" in first:
+        clock = first["time"].value
+        if day is None:
+            day, display_time = table.relative[0]
+
+    if day is None:
+        return _no_time(remove_tokens(text, tokens))
+
+    hour, minute = clock if clock else (DEFAULT_HOUR, 0)
+    if clock:
+        display_time += f" {hour:02d}:{minute:02d}" if display_time == "hôm nay" else f" lúc {hour:02d}:{minute:02d}"
+
+    return {
+        "has_time": True,
+        "has_clock": clock is not None,
+        "datetime": f"{day.year:04d}-{day.month:02d}-{day.day:02d} {hour:02d}:{minute:02d}",
+        "display_time": display_time,
+        "parsed_text": remove_tokens(text, tokens),
+        "original_time_expression": " ".join(token.text for token in tokens)
+    }
@@ -0,0 +1,53 @@
+"""
+Update processor that runs different users' updates concurrently
+while keeping each user's own updates in arrival order
+"""
+
+import asyncio
+from typing import Any, Awaitable, Dict, List
+
+from telegram.ext import BaseUpdateProcessor
+
+# Limit handed to BaseUpdateProcessor, whose own slot is taken before the
+# user's lock; it only has to be out of the way of the real limit below
+_BASE_LIMIT = 1 << 16
+
+class PerUserUpdateProcessor(BaseUpdateProcessor):
+    """
+    At most max_concurrent_updates updates run at once; updates from the
+    same user wait for that user's previous update to finish
+
+    A concurrency slot is taken only once the user's lock is held, so a
+    user with a backlog of queued updates occupies one slot, not all of them.
+    """
+
+    def __init__(self, max_concurrent_updates: int):
+        super().__init__(_BASE_LIMIT)
+        self._slots = asyncio.Semaphore(max_concurrent_updates)
+        # user_id -> [lock, number of updates holding or waiting on it]
+        self._user_locks: Dict[int, List[Any]] = {}
+
+    async def do_process_update(self, update: object, coroutine: Awaitable[Any]) -> None:
+        user = getattr(update, "effective_user", None)
+        if user is None:
+            async with self._slots:
+                await coroutine
+            return
+
+        entry = self._user_locks.setdefault(user.id, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            # asyncio.Lock wakes waiters in FIFO order, preserving arrival order
+            async with entry[0]:
+                async with self._slots:
+                    await coroutine
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._user_locks[user.id]
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
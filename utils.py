@@ -2,9 +2,19 @@
 Utility functions for the todolist bot
 """
 
-from datetime import datetime, timedelta
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+from operator import attrgetter
 import re
-from typing import Dict, List, Optional, Tuple
+import time
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+from time_tokenizer import tokenize
+
+if TYPE_CHECKING:
+    from models import Item
+
+_due_ts = attrgetter("due_ts")
 
 def format_time_display(time_info: Dict) -> str:
     """Format time information for display"""
@@ -59,70 +69,47 @@ def parse_weekday_vietnamese(weekday_str: str) -> Optional[int]:
     return mappings.get(weekday_str)
 
 def extract_time_patterns(text: str) -> List[Dict]:
-    """Extract time patterns from text using regex"""
-    patterns = []
-    
-    # Time patterns (5h, 14h30, 9h sáng)
-    time_pattern = r'(\d{1,2}h(?:\d{2})?(?:\s*(?:sáng|chiều|tối|đêm))?)'
-    times = re.findall(time_pattern, text.lower())
-    for time_match in times:
-        patterns.append({
-            "type": "time",
-            "match": time_match,
-            "pattern": "time"
-        })
-    
-    # Weekday patterns (thứ 2, thứ 6)
-    weekday_pattern = r'(thứ\s+[2-7]|chủ\s+nhật)'
-    weekdays = re.findall(weekday_pattern, text.lower())
-    for weekday_match in weekdays:
-        patterns.append({
-            "type": "weekday", 
-            "match": weekday_match,
-            "pattern": "weekday"
-        })
-    
-    # Date patterns (ngày 19/10, 25/12)
-    date_pattern = r'(?:ngày\s+)?(\d{1,2}/\d{1,2}(?:/\d{4})?)'
-    dates = re.findall(date_pattern, text)
-    for date_match in dates:
-        patterns.append({
-            "type": "date",
-            "match": date_match,
-            "pattern": "date"
-        })
-    
-    # Relative time (hôm nay, mai, ngày mai)
-    relative_pattern = r'(hôm\s+nay|ngày\s+mai|mai(?:\s+này)?)'
-    relatives = re.findall(relative_pattern, text.lower())
-    for relative_match in relatives:
-        patterns.append({
-            "type": "relative",
-            "match": relative_match,
-            "pattern": "relative"
-        })
-    
-    return patterns
+    """Extract time patterns from text (one scan, see time_tokenizer.py)"""
+    return [
+        {
+            "type": token.kind,
+            "match": token.text,
+            "pattern": token.kind,
+            "start": token.start,
+            "end": token.end
+        }
+        for token in tokenize(text)
+    ]
 
 def clean_text_from_time(text: str, time_patterns: List[Dict]) -> str:
     """Remove time expressions from text"""
-    clean_text = text
-    
-    for pattern in time_patterns:
-        # Remove the matched pattern from text
-        clean_text = re.sub(
-            re.escape(pattern["match"]), 
-            "", 
-            clean_text, 
-            flags=re.IGNORECASE
-        ).strip()
+    if all("start" in pattern for pattern in time_patterns):
+        # Patterns from extract_time_patterns: cut their spans directly
+        spans = sorted((pattern["start"], pattern["end"]) for pattern in time_patterns)
+        parts = []
+        position = 0
+        for start, end in spans:
+            parts.append(text[position:start])
+            position = max(position, end)
+        parts.append(text[position:])
+        clean_text = " ".join(parts)
+    else:
+        clean_text = text
+        for pattern in time_patterns:
+            # Remove the matched pattern from text
+            clean_text = re.sub(
+                re.escape(pattern["match"]), 
+                "", 
+                clean_text, 
+                flags=re.IGNORECASE
+            ).strip()
     
     # Clean up extra spaces
     clean_text = re.sub(r'\s+', ' ', clean_text).strip()
     
     return clean_text
 
-def format_item_list(items: List[Dict], item_type: str) -> str:
+def format_item_list(items: List["Item"], item_type: str) -> str:
     """Format list of items for display"""
     if not items:
         return f"Không có {item_type} nào."
@@ -139,16 +126,15 @@ def format_item_list(items: List[Dict], item_type: str) -> str:
     for item in items[-10:]:  # Show last 10 items
         status = ""
         if item_type == "todo":
-            status = "☑️ " if item.get("completed") else "⬜ "
+            status = "☑️ " if item.completed else "⬜ "
         
-        result += f"{status}• {item['text']}"
+        result += f"{status}• {item.text}"
         
         # Add time info if available
-        time_display = format_time_display(item.get("time_info", {}))
-        if time_display:
-            result += f" {time_display}"
+        if item.has_time:
+            result += f" ⏰ {item.display_time()}"
         
-        result += f" (ID: {item['id']})\n"
+        result += f" (ID: {item.id})\n"
     
     return result
 
@@ -166,52 +152,52 @@ def validate_environment() -> Tuple[bool, List[str]]:
     
     return len(errors) == 0, errors
 
-def get_upcoming_items(items: List[Dict], days_ahead: int = 7) -> List[Dict]:
-    """Get items with upcoming deadlines"""
-    upcoming = []
-    now = datetime.now()
-    future_limit = now + timedelta(days=days_ahead)
-    
-    for item in items:
-        time_info = item.get("time_info", {})
-        if not time_info.get("has_time"):
-            continue
-        
-        try:
-            if time_info.get("datetime"):
-                item_time = datetime.fromisoformat(time_info["datetime"])
-                if now <= item_time <= future_limit:
-                    upcoming.append(item)
-            elif time_info.get("date_only"):
-                item_date = datetime.fromisoformat(time_info["date_only"])
-                if now.date() <= item_date.date() <= future_limit.date():
-                    upcoming.append(item)
-        except:
-            continue  # Skip items with invalid time info
-    
-    return sorted(upcoming, key=lambda x: x.get("time_info", {}).get("datetime", ""))
+def get_upcoming_items(items: List["Item"], days_ahead: int = 7) -> List["Item"]:
+    """
+    Get items with upcoming deadlines, earliest first
+    items may be in any order and include untimed items; for a list already
+    ordered by due time use upcoming_in_timeline
+    """
+    now = time.time()
+    end = now + days_ahead * 86400
+    upcoming = [item for item in items if item.due_ts is not None and now <= item.due_ts <= end]
+    upcoming.sort(key=_due_ts)
+    return upcoming
+
+def upcoming_in_timeline(timed: List["Item"], days_ahead: int = 7) -> List["Item"]:
+    """
+    get_upcoming_items for timed items already ordered by due time, e.g. the
+    timed list from DataManager.get_user_timeline: two bisects, no scan
+    """
+    now = time.time()
+    low = bisect_left(timed, now, key=_due_ts)
+    high = bisect_right(timed, now + days_ahead * 86400, lo=low, key=_due_ts)
+    return timed[low:high]
 
-def generate_summary_stats(all_items: Dict[str, List[Dict]]) -> str:
+def generate_summary_stats(all_items: Dict[str, List["Item"]]) -> str:
     """Generate summary statistics"""
     stats = []
     
     # Count by type
     events_count = len(all_items.get("events", []))
     todos_total = len(all_items.get("todos", []))
-    todos_pending = len([t for t in all_items.get("todos", []) if not t.get("completed")])
+    todos_pending = len([t for t in all_items.get("todos", []) if not t.completed])
     ideas_count = len(all_items.get("ideas", []))
     
     stats.append(f"📅 Events: {events_count}")
     stats.append(f"✅ Todos: {todos_pending}/{todos_total}")
     stats.append(f"💡 Ideas: {ideas_count}")
     
-    # Upcoming items
-    all_timed_items = []
+    # Upcoming items (due_ts is pre-parsed, so no sorting needed just to count)
+    now = time.time()
+    future_limit = now + 7 * 86400
+    upcoming = 0
     for item_list in all_items.values():
-        all_timed_items.extend(item_list)
-    
-    upcoming = get_upcoming_items(all_timed_items)
+        for item in item_list:
+            due_ts = item.due_ts
+            if due_ts is not None and now <= due_ts <= future_limit:
+                upcoming += 1
     if upcoming:
-        stats.append(f"⏰ Upcoming: {len(upcoming)}")
+        stats.append(f"⏰ Upcoming: {upcoming}")
     
     return " | ".join(stats)
\ No newline at end of file
@@ -0,0 +1,134 @@
+"""
+Webhook serving mode
+
+A small ASGI app (Starlette, served by uvicorn) that receives updates from
+Telegram and feeds them to the Application, as an alternative to long
+polling that can sit behind a load balancer. This is python-telegram-bot's
+custom webhook setup; Application.run_webhook offers no way to add routes
+such as a health check.
+
+    POST /<WEBHOOK_PATH>   Telegram updates; the X-Telegram-Bot-Api-Secret-Token
+                           header must match WEBHOOK_SECRET_TOKEN
+    GET  /healthz          200 while the bot is running, 503 otherwise
+
+On SIGINT/SIGTERM the server stops accepting connections and lets requests
+in flight finish, then the Application processes every queued update before
+shutting down.
+"""
+
+import asyncio
+import contextlib
+import hmac
+import json
+import signal
+from typing import Optional
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+from telegram import Update
+from telegram.ext import Application
+
+# Telegram updates are small; anything bigger is not from Telegram
+MAX_BODY_BYTES = 1 << 20
+# How long in-flight requests get to finish on shutdown
+SHUTDOWN_GRACE_SECONDS = 10
+
+async def _read_body(request: Request) -> Optional[bytes]:
+    """The request body, or None once it exceeds MAX_BODY_BYTES (chunked bodies included)"""
+    if int(request.headers.get("content-length") or 0) > MAX_BODY_BYTES:
+        return None
+    body = bytearray()
+    async for chunk in request.stream():
+        body += chunk
+        if len(body) > MAX_BODY_BYTES:
+            return None
+    return bytes(body)
+
+def create_app(application: Application, url_path: str, secret_token: str,
+               server: Optional[uvicorn.Server] = None) -> Starlette:
+    """ASGI app queueing Telegram updates on application and answering /healthz"""
+
+    async def telegram(request: Request) -> JSONResponse:
+        token = request.headers.get("x-telegram-bot-api-secret-token", "")
+        if not hmac.compare_digest(token.encode(), secret_token.encode()):
+            return JSONResponse({"ok": False}, status_code=403)
+        body = await _read_body(request)
+        if body is None:
+            return JSONResponse({"ok": False}, status_code=413)
+        try:
+            update = Update.de_json(json.loads(body), application.bot)
+        except (ValueError, TypeError, KeyError):
+            update = None
+        if update is None:
+            return JSONResponse({"ok": False}, status_code=400)
+        await application.update_queue.put(update)
+        return JSONResponse({"ok": True})
+
+    async def healthz(request: Request) -> JSONResponse:
+        running = application.running and not (server is not None and server.should_exit)
+        return JSONResponse(
+            {"ok": running, "queued_updates": application.update_queue.qsize()},
+            status_code=200 if running else 503
+        )
+
+    return Starlette(routes=[
+        Route("/" + url_path.strip("/"), telegram, methods=["POST"]),
+        Route("/healthz", healthz, methods=["GET"])
+    ])
+
+class EmbeddedServer(uvicorn.Server):
+    """uvicorn server that leaves SIGINT/SIGTERM to the caller (serve_webhook, or the bot itself)"""
+
+    def capture_signals(self):
+        # uvicorn re-raises a captured signal after serving, which would end the
+        # process before the Application has drained its queue
+        return contextlib.nullcontext()
+
+async def serve_webhook(application: Application, webhook_url: str, listen: str, port: int,
+                        url_path: str, secret_token: str, stop_event: Optional[asyncio.Event] = None):
+    """
+    Run the bot in webhook mode until SIGINT/SIGTERM (or stop_event is set)
+    Mirrors Application.run_polling: initialize, post_init, start, ... post_shutdown
+    """
+    if stop_event is None:
+        stop_event = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop_event.set)
+
+    config = uvicorn.Config(None, host=listen, port=port, log_level="warning", lifespan="off",
+                            timeout_graceful_shutdown=SHUTDOWN_GRACE_SECONDS)
+    server = EmbeddedServer(config)
+    config.app = create_app(application, url_path, secret_token, server)
+
+    async def stop_on_event():
+        await stop_event.wait()
+        server.should_exit = True
+    stopper = asyncio.create_task(stop_on_event())
+
+    await application.initialize()
+    try:
+        if application.post_init:
+            await application.post_init(application)
+        await application.bot.set_webhook(
+            url=webhook_url.rstrip("/") + "/" + url_path.strip("/"),
+            secret_token=secret_token,
+            allowed_updates=Update.ALL_TYPES
+        )
+        await application.start()
+        print(f"🌐 Webhook server listening on {listen}:{port}/{url_path.strip('/')}")
+        # Returns after a signal (or stop_event) once in-flight requests are done
+        await server.serve()
+    finally:
+        stopper.cancel()
+        if application.running:
+            # Processes the updates still in the queue before returning
+            await application.stop()
+        if application.post_stop:
+            await application.post_stop(application)
+        await application.shutdown()
+        if application.post_shutdown:
+            await application.post_shutdown(application)